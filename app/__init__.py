@@ -5,7 +5,11 @@ def create_app():
     app.secret_key = "super-secret-key"
 
     # Import routes
-    from app.routes import bp
+    from app.routes import bp, CONFIG
     app.register_blueprint(bp)
 
+    # Runs are queued by /run-bot; unless disabled, this process also works the queue
+    from app.worker import start_embedded_worker
+    start_embedded_worker(CONFIG)
+
     return app
@@ -2,15 +2,26 @@ import json
 import os
 import tempfile
 import threading
+import time
 import traceback
 import uuid
 import zipfile
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file, Response, \
+    stream_with_context
 from flask_login import login_required, login_user, logout_user, current_user, UserMixin
 
 import utils
-from constants.Constants import COUNTRY_CODES_AND_CAMPAIGNS
+from constants.Constants import COUNTRY_CODES_AND_CAMPAIGNS, RUN_RETENTION, SSE_POLL_INTERVAL, SSE_KEEPALIVE, \
+    SSE_MAX_STREAMS
+from helpers.ActionLedger import ActionLedger
+from helpers.CheckpointStore import CheckpointStore
+from helpers.JobQueue import get_job_queue, QUEUED, ACTIVE_STATES, MarketsBusyError
+from helpers.RunRegistry import RunRegistry, STATUS_FIELDS
+from helpers.MarketRunner import run_markets, market_workers, worker_share
+from helpers.Pipeline import PipelineCancelled
+from helpers.PlanFile import PlanWriter, plan_path, plan_summary
+from helpers.WatermarkStore import get_watermark_store
 from main import main, logger
 from utils import CommonUtils
 from utils.CommonUtils import common_utils
@@ -18,8 +29,6 @@ from google.cloud import secretmanager
 from flask import current_app
 
 bp = Blueprint('bp', __name__)
-from threading import Lock
-bot_status_lock = Lock()
 
 
 def load_config_from_secret(secret_name: str = "impact_secret_json"):
@@ -68,15 +77,10 @@ class User(UserMixin):
         self.id = id
 
 
-# Global bot status
-bot_status = {"running": False,
-              "message": "Idle",
-              "status": "idle",
-              "current_market": None,
-              "market_stats": {},
-              "zip_path": None,
-              "csv_paths": {}
-              }
+# Runs executed by this process, keyed by run_id
+runs = RunRegistry(int(CONFIG.get("run_retention", RUN_RETENTION)))
+# Each open SSE stream holds a server thread for the whole run
+sse_streams = threading.BoundedSemaphore(int(CONFIG.get("sse_max_streams", SSE_MAX_STREAMS)))
 
 
 from google.cloud import storage
@@ -84,7 +88,7 @@ from google.cloud import storage
 
 @bp.route("/get-zip-url")
 def get_zip_url():
-    blob_name = bot_status.get("zip_blob_name")
+    blob_name = (_job_status(request.args.get("run_id")) or {}).get("zip_blob_name")
     if not blob_name:
         return jsonify({"error": "ZIP not ready"}), 404
 
@@ -115,32 +119,158 @@ import uuid
 # -----------------------------
 # RUN BOT THREAD
 # -----------------------------
-def run_bot_thread(start_date=None, end_date=None, markets=None, run_id=None):
+def status_snapshot(run_id):
+    """JSON-serializable status of one of this process' runs, as published by the job worker."""
+    run = runs.get(run_id)
+    return run.snapshot() if run is not None else {}
+
+
+def _job_status(run_id=None):
+    """Status of a run (default: the latest one) as published by its worker to the job queue."""
+    queue = get_job_queue(CONFIG)
+    job = queue.get(run_id) if run_id else queue.latest()
+    if job is None:
+        return None
+    if not job["status"] or job["state"] == QUEUED:
+        params = job["params"]
+        return {
+            "status": "queued", "message": "Waiting for a worker...", "running_markets": [], "market_stats": {},
+            "not_processed": [], "run_id": params.get("run_id"),
+            "mode": params.get("mode", "apply" if job["kind"] == "apply_plan" else "run"),
+        }
+    return job["status"]
+
+
+def _publish_market_result(run, market, result, not_processed_all):
+    """Write the market's CSVs and put its stats / not processed actions into the run's status."""
+    stats = result["stats"]
+    not_processed = result["not_processed"]
+    actions_by_state = result.get("actions_by_state", {})
+
+    # Create CSVs
+    # Each run writes its CSVs to its own directory, so concurrent runs never share a file
+    output_dir = os.path.join(tempfile.gettempdir(), "runs", run.run_id)
+    processed_csv_path = CommonUtils.common_utils.create_market_csv(
+        market, actions_by_state, {"OTHER", "ORDER_UPDATE", "ITEM_RETURNED"}, "processed", output_dir
+    )
+    not_processed_csv_path = CommonUtils.common_utils.create_market_csv(
+        market, actions_by_state, {"Not_Processed"}, "not_processed", output_dir
+    )
+
+    with run.lock:
+        status = run.status
+        status["csv_paths"][f"{market}_processed"] = processed_csv_path
+        status["csv_paths"][f"{market}_not_processed"] = not_processed_csv_path
+
+        # Save stats; a market whose action stream broke off shows its fetch error next to the partial stats
+        status["market_stats"][market] = {k: v or 0 for k, v in stats.items()}
+        if result.get("error"):
+            status["market_stats"][market]["error"] = result["error"]
+        not_processed_all.extend(not_processed)
+        status["not_processed"] = not_processed_all
+    run.emit("market_finished", market=market, stats=status["market_stats"][market],
+             not_processed=len(not_processed))
+
+
+def _market_started(run, market, message):
+    with run.lock:
+        status = run.status
+        status["running_markets"].append(market)
+        status["current_market"] = market
+        status["message"] = f"{message} {', '.join(status['running_markets'])}..."
+        status["status"] = "running"
+    run.emit("market_started", market=market, message=status["message"])
+
+
+def _market_progress(run, market):
+    """progress callback of process_single_market / apply_plan_market: per-state counters as they grow."""
+    return lambda stats: run.emit("progress", market=market, stats=stats)
+
+
+def _market_finished(run, market):
+    with run.lock:
+        running = run.status["running_markets"]
+        if market in running:
+            running.remove(market)
+        run.status["current_market"] = running[-1] if running else None
+
+
+def _publish_market_error(run, market, e, not_processed_all):
+    with run.lock:
+        run.status["market_stats"][market] = {
+            "total_actions": 0,
+            "OTHER": 0,
+            "ITEM_RETURNED": 0,
+            "ORDER_UPDATE": 0,
+            "Not_Processed": 0,
+            "error": str(e),
+        }
+        not_processed_all.append({"market": market, "action_id": "N/A", "error": str(e)})
+        run.status["actions_by_state"][market] = {}
+        run.status["not_processed"] = not_processed_all
+    run.emit("market_finished", market=market, stats=run.status["market_stats"][market], not_processed=1)
+
+
+def _publish_zip(run):
+    """Zip the CSVs of the run and upload the archive to GCS."""
+    with run.lock:
+        csv_paths = dict(run.status["csv_paths"])
+    if csv_paths:
+        zip_fd, zip_path = tempfile.mkstemp(prefix=f"{run.run_id}-", suffix=".zip")
+        os.close(zip_fd)
+
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
+            for key, csv_path in csv_paths.items():
+                if csv_path and os.path.exists(csv_path):
+                    zipf.write(csv_path, arcname=os.path.basename(csv_path))
+
+        blob_name = utils.CommonUtils.common_utils.upload_zip_to_gcs(zip_path)
+        run.update(zip_blob_name=blob_name, zip_path=None)
+        run.emit("zip_ready", zip_blob_name=blob_name)
+
+
+def _fail_run(run, e):
+    run.update(status="error", current_market=None, running_markets=[], message=str(e), market_stats={},
+               not_processed=[])
+
+
+def _check_cancelled(run_id, cancel):
+    if cancel is not None and cancel.is_set():
+        raise PipelineCancelled(f"Run {run_id} cancelled: its job is no longer owned by this worker")
+
+
+def run_bot_thread(start_date=None, end_date=None, markets=None, run_id=None, incremental=False, resume=False,
+                   mode="run", shard=None, cancel=None):
     """
     Thread function that runs the bot for selected markets.
     run_id is unique for this run to avoid conflicts with previous runs.
+    incremental: only fetch actions newer than each campaign's watermark.
+    resume: run_id is an interrupted run; actions checkpointed as completed are skipped.
+    mode: "run" applies modifications right away; "plan" only writes them to the plan file
+    of run_id, to be executed later by apply_plan_thread.
+    shard: "day" or "week" splits each market's window into date shards fetched in parallel.
+    cancel: threading.Event set by the job worker when it lost the job; the markets stop and
+    the run is left to the worker that took it over.
     """
-    global bot_status
-
-    with bot_status_lock:
-        # Initialize bot_status for this run
-        bot_status.update({
-            "running": True,
-            "status": "running",
-            "message": "Bot started...",
-            "current_market": None,
-            "market_stats": {},
-            "not_processed": [],
-            "actions_by_state": {},
-            "csv_paths": {},
-            "zip_blob_name": None,
-            "zip_path": None,
-            "run_id": run_id,
-            "last_run_markets": markets or []
-        })
+    run = runs.start(run_id, markets, mode, cancel=cancel)
 
+    checkpoint_store = None
+    ledger = None
+    plan = None
     try:
         bot = main()
+        checkpoint_store = CheckpointStore()
+        params = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "markets": markets or [],
+            "incremental": incremental,
+            "mode": mode,
+            "shard": shard,
+        }
+        checkpoint_store.start_run(run_id, params)
+        if mode == "plan":
+            plan = PlanWriter(plan_path(run_id), params)
         data = common_utils.load_config()
         all_campaign_ids = data.get("campaign_ids", [])
 
@@ -154,92 +284,121 @@ def run_bot_thread(start_date=None, end_date=None, markets=None, run_id=None):
             campaign_ids = all_campaign_ids
 
         not_processed_all = []
-
-        for campaign_id in campaign_ids:
-            market = COUNTRY_CODES_AND_CAMPAIGNS.get(campaign_id, f"Unknown-{campaign_id}")
-
-            with bot_status_lock:
-                bot_status["current_market"] = market
-                bot_status["message"] = f"Processing market: {market}..."
-                bot_status["status"] = "running"
-
+        markets_by_campaign = {
+            campaign_id: COUNTRY_CODES_AND_CAMPAIGNS.get(campaign_id, f"Unknown-{campaign_id}")
+            for campaign_id in campaign_ids
+        }
+        # Markets run concurrently; file/SQLite backed stores are shared so their writes stay serialized
+        workers = market_workers(data, len(campaign_ids))
+        share = worker_share(data, workers)
+        ledger = ActionLedger()
+        watermark_store = get_watermark_store()
+
+        def process(campaign_id):
+            market = markets_by_campaign[campaign_id]
             try:
-                # Process one market
-                result = bot.process_single_market(campaign_id, market, start_date, end_date)
-                stats = result["stats"]
-                not_processed = result["not_processed"]
-                actions_by_state = result.get("actions_by_state", {})
-
-                # Create CSVs
-                processed_csv_path = CommonUtils.common_utils.create_market_csv(
-                    market, actions_by_state, {"OTHER", "ORDER_UPDATE", "ITEM_RETURNED"}, "processed"
-                )
-                not_processed_csv_path = CommonUtils.common_utils.create_market_csv(
-                    market, actions_by_state, {"Not_Processed"}, "not_processed"
-                )
-
-                with bot_status_lock:
-                    bot_status.setdefault("csv_paths", {})
-                    bot_status["csv_paths"][f"{market}_processed"] = processed_csv_path
-                    bot_status["csv_paths"][f"{market}_not_processed"] = not_processed_csv_path
-
-                    # Save stats
-                    bot_status["market_stats"][market] = {k: v or 0 for k, v in stats.items()}
-                    not_processed_all.extend(not_processed)
-                    bot_status["not_processed"] = not_processed_all
-
-            except Exception as e:
-                logger.exception(f"Error processing market {market}: {e}")
-                with bot_status_lock:
-                    bot_status["market_stats"][market] = {
-                        "total_actions": 0,
-                        "OTHER": 0,
-                        "ITEM_RETURNED": 0,
-                        "ORDER_UPDATE": 0,
-                        "Not_Processed": 0,
-                        "error": str(e),
-                    }
-                    not_processed_all.append({"market": market, "action_id": "N/A", "error": str(e)})
-                    bot_status["actions_by_state"][market] = {}
-                    bot_status["not_processed"] = not_processed_all
+                return bot.process_single_market(campaign_id, market, start_date, end_date,
+                                                 incremental=incremental, run_id=run_id, resume=resume,
+                                                 checkpoint_store=checkpoint_store, plan=plan, ledger=ledger,
+                                                 watermark_store=watermark_store, worker_share=share,
+                                                 shard=shard, progress=_market_progress(run, market),
+                                                 cancel=cancel)
+            finally:
+                _market_finished(run, market)
+
+        run_markets(
+            campaign_ids, process, workers,
+            on_start=lambda cid: _market_started(run, markets_by_campaign[cid], "Processing market(s):"),
+            on_result=lambda cid, result: _publish_market_result(run, markets_by_campaign[cid], result,
+                                                                 not_processed_all),
+            on_error=lambda cid, e: _publish_market_error(run, markets_by_campaign[cid], e, not_processed_all),
+            cancel=cancel,
+        )
+        _check_cancelled(run_id, cancel)
 
         # After all markets, generate ZIP
-        csv_paths = bot_status.get("csv_paths", {})
-        if csv_paths:
-            zip_fd, zip_path = tempfile.mkstemp(suffix=".zip")
-            os.close(zip_fd)
+        _publish_zip(run)
 
-            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-                for key, csv_path in csv_paths.items():
-                    if csv_path and os.path.exists(csv_path):
-                        zipf.write(csv_path, arcname=os.path.basename(csv_path))
-
-            blob_name = utils.CommonUtils.common_utils.upload_zip_to_gcs(zip_path)
-            with bot_status_lock:
-                bot_status["zip_blob_name"] = blob_name
-                bot_status["zip_path"] = None
+        if plan is not None:
+            plan.close()
+            run.update(plan_id=run_id, plan_totals=plan.totals)
 
         # Mark finished
-        with bot_status_lock:
-            bot_status.update({
-                "status": "finished",
-                "running": False,
-                "current_market": None,
-                "message": f"✅ Bot finished. {len(campaign_ids)} market(s) processed."
-            })
-
+        checkpoint_store.finish_run(run_id)
+        run.update(
+            status="finished",
+            current_market=None,
+            message=f"✅ Bot finished. {len(campaign_ids)} market(s) processed." if plan is None else
+                    f"✅ Plan {run_id} written for {len(campaign_ids)} market(s). Review and apply it."
+        )
+
+    except PipelineCancelled as e:
+        # The checkpoints stay open and the run publishes nothing more (see RunState.emit):
+        # the worker that took the job over resumes it
+        logger.warning(f"Run {run_id} cancelled: {e}")
     except Exception as e:
         logger.exception("Global bot error")
-        with bot_status_lock:
-            bot_status.update({
-                "status": "error",
-                "running": False,
-                "current_market": None,
-                "message": str(e),
-                "market_stats": {},
-                "not_processed": [],
-            })
+        if checkpoint_store is not None:
+            checkpoint_store.finish_run(run_id, "error")
+        _fail_run(run, e)
+    finally:
+        if checkpoint_store is not None:
+            checkpoint_store.close()
+        if ledger is not None:
+            ledger.close()
+        runs.finish(run_id)
+
+
+def apply_plan_thread(plan_id, markets, run_id=None, cancel=None):
+    """
+    Thread function that executes the modifications of a finished plan run, market by market.
+    run_id identifies the apply run (default: the plan ID); cancel works like in run_bot_thread.
+    """
+    run_id = run_id or plan_id
+    run = runs.start(run_id, markets, "apply", cancel=cancel)
+    ledger = None
+    try:
+        bot = main()
+        path = plan_path(plan_id)
+        not_processed_all = []
+        data = common_utils.load_config()
+        workers = market_workers(data, len(markets))
+        share = worker_share(data, workers)
+        ledger = ActionLedger()
 
+        def process(market):
+            try:
+                return bot.apply_plan_market(path, market, ledger=ledger, worker_share=share,
+                                             progress=_market_progress(run, market), cancel=cancel)
+            finally:
+                _market_finished(run, market)
+
+        run_markets(
+            markets, process, workers,
+            on_start=lambda market: _market_started(run, market, "Applying plan for market(s):"),
+            on_result=lambda market, result: _publish_market_result(run, market, result, not_processed_all),
+            on_error=lambda market, e: _publish_market_error(run, market, e, not_processed_all),
+            cancel=cancel,
+        )
+        _check_cancelled(run_id, cancel)
+
+        _publish_zip(run)
+        run.update(
+            status="finished",
+            current_market=None,
+            plan_id=plan_id,
+            message=f"✅ Plan applied. {len(markets)} market(s) processed."
+        )
+
+    except PipelineCancelled as e:
+        logger.warning(f"Run {run_id} cancelled: {e}")
+    except Exception as e:
+        logger.exception("Global bot error")
+        _fail_run(run, e)
+    finally:
+        if ledger is not None:
+            ledger.close()
+        runs.finish(run_id)
 
 
 # Routes
@@ -274,51 +433,183 @@ def logout():
 def dashboard():
     return render_template("dashboard.html", markets=COUNTRY_CODES_AND_CAMPAIGNS)
 
+def _markets_busy(e):
+    return jsonify({
+        "status": "running",
+        "message": f"Bot is already running for {', '.join(sorted(e.markets))} (run {', '.join(e.jobs)})",
+        "runs": e.jobs,
+    })
+
+
 @bp.route("/run-bot", methods=["POST"])
 @login_required
 def run_bot():
-    global bot_status
-
     data = request.get_json()
     start_date = data.get("start_date")
     end_date = data.get("end_date")
     markets = data.get("markets", [])
+    incremental = bool(data.get("incremental", False))
+    resume = bool(data.get("resume", False))
+    mode = "plan" if data.get("mode") == "plan" else "run"
+    shard = data.get("shard") or None
+    if shard not in (None, "day", "week"):
+        return jsonify({"status": "error", "message": f"Unknown shard size: {shard}"}), 400
+
+    run_id = None
+    if resume:
+        # Pick up the last run that was interrupted (e.g. instance restart) with its original parameters;
+        # runs whose job is still queued or executing are not interrupted
+        active = [job["job_id"] for job in get_job_queue(CONFIG).active()]
+        checkpoint_store = CheckpointStore()
+        try:
+            unfinished = checkpoint_store.last_unfinished_run(skip=active)
+        finally:
+            checkpoint_store.close()
+        if not unfinished:
+            return jsonify({"status": "error", "message": "No interrupted run to resume"}), 404
+        run_id, params = unfinished
+        start_date, end_date = params.get("start_date"), params.get("end_date")
+        markets, incremental = params.get("markets", []), params.get("incremental", False)
+        mode = params.get("mode", "run")
+        shard = params.get("shard")
 
     if not markets:
         return jsonify({"status": "error", "message": "No markets selected"}), 400
 
-    with bot_status_lock:
-        if bot_status.get("running"):
-            return jsonify({"status": "running", "message": "Bot is already running"})
+    # Generate a unique run_id for this run; it is also the ID of its job
+    run_id = run_id or str(uuid.uuid4())
+
+    # Queue the run; a worker (embedded or standalone, see app.worker) claims and executes it.
+    # Runs for other markets may be active at the same time.
+    try:
+        get_job_queue(CONFIG).enqueue("run", {
+            "start_date": start_date, "end_date": end_date, "markets": markets, "run_id": run_id,
+            "incremental": incremental, "resume": resume, "mode": mode, "shard": shard,
+        }, job_id=run_id)
+    except MarketsBusyError as e:
+        return _markets_busy(e)
 
-        # Generate a unique run_id for this run
-        run_id = str(uuid.uuid4())
+    return jsonify({
+        "status": "started",
+        "message": f"{'Resuming' if resume else 'Running'} bot{' (plan only)' if mode == 'plan' else ''} "
+                   f"for markets: {markets}",
+        "run_id": run_id
+    })
 
-    # Start bot thread
-    thread = threading.Thread(
-        target=run_bot_thread,
-        args=(start_date, end_date, markets, run_id),
-        daemon=True
-    )
-    thread.start()
+
+@bp.route("/plans/<plan_id>")
+@login_required
+def plan_details(plan_id):
+    """Totals per market and reason of a plan, for review before it is applied."""
+    try:
+        return jsonify({"plan_id": plan_id, **plan_summary(plan_path(plan_id))})
+    except FileNotFoundError:
+        return jsonify({"status": "error", "message": f"Plan {plan_id} not found"}), 404
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+
+
+@bp.route("/apply-plan", methods=["POST"])
+@login_required
+def apply_plan():
+    data = request.get_json() or {}
+    plan_id = data.get("plan_id")
+    try:
+        summary = plan_summary(plan_path(plan_id)) if plan_id else None
+    except FileNotFoundError:
+        summary = None
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+    if summary is None:
+        return jsonify({"status": "error", "message": f"Plan {plan_id} not found"}), 404
+
+    # Markets of the plan, optionally narrowed down by the request
+    markets = [m for m in summary["totals"] if not data.get("markets") or m in data["markets"]]
+
+    run_id = f"apply-{plan_id}"
+    try:
+        get_job_queue(CONFIG).enqueue("apply_plan", {"plan_id": plan_id, "markets": markets, "run_id": run_id},
+                                      job_id=run_id)
+    except MarketsBusyError as e:
+        return _markets_busy(e)
 
     return jsonify({
         "status": "started",
-        "message": f"Running bot for markets: {markets}",
+        "message": f"Applying plan {plan_id} for markets: {markets}",
         "run_id": run_id
     })
 
 
+@bp.route("/runs")
+@login_required
+def runs_endpoint():
+    """Active (queued or running) runs with the markets they hold."""
+    return jsonify([
+        {"run_id": job["job_id"], "kind": job["kind"], "state": job["state"], "markets": job["params"].get("markets"),
+         "status": (job["status"] or {}).get("status")}
+        for job in get_job_queue(CONFIG).active()
+    ])
+
+
+def _sse(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@bp.route("/runs/<run_id>/events")
+@login_required
+def run_events(run_id):
+    """
+    Server-Sent Events stream of a run's progress: run_started, market_started, progress (per-state counters),
+    market_finished, zip_ready and run_finished, read from the job queue's event log. A reconnecting client
+    continues after its Last-Event-ID; the stream ends after run_finished.
+    Beyond sse_max_streams open streams it answers 503 and the dashboard polls /bot-status instead.
+    """
+    queue = get_job_queue(CONFIG)
+    if queue.get(run_id) is None:
+        return jsonify({"status": "error", "message": f"Run {run_id} not found"}), 404
+    after = int(request.headers.get("Last-Event-ID") or request.args.get("after") or 0)
+    poll_interval = float(CONFIG.get("sse_poll_interval", SSE_POLL_INTERVAL))
+    keepalive = float(CONFIG.get("sse_keepalive", SSE_KEEPALIVE))
+
+    def stream():
+        last, idle = after, 0.0
+        while True:
+            events = queue.events(run_id, last)
+            for event_id, event, data in events:
+                last = event_id
+                yield _sse(event_id, event, data)
+                if event == "run_finished":
+                    return
+            if not events:
+                job = queue.get(run_id)
+                if job is None or job["state"] not in ACTIVE_STATES:
+                    if queue.events(run_id, last):
+                        continue
+                    # The run ended without a run_finished event (e.g. its worker died): close with its last status
+                    status = (job or {}).get("status") or {}
+                    yield _sse(last + 1, "run_finished", {"status": status.get("status", "error"),
+                                                          "message": status.get("message", "Run ended")})
+                    return
+                idle += poll_interval
+                if idle >= keepalive:
+                    idle = 0.0
+                    yield ": keepalive\n\n"
+            time.sleep(poll_interval)
+
+    if not sse_streams.acquire(blocking=False):
+        return jsonify({"status": "error", "message": "Too many open event streams, poll /bot-status"}), 503
+    response = Response(stream_with_context(stream()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Released when the stream ends or the client disconnects
+    response.call_on_close(sse_streams.release)
+    return response
+
+
 @bp.route("/bot-status")
 @login_required
 def bot_status_endpoint():
-    with bot_status_lock:
-        return jsonify({
-            "status": bot_status.get("status"),
-            "message": bot_status.get("message"),
-            "current_market": bot_status.get("current_market"),
-            "market_stats": bot_status.get("market_stats"),
-            "not_processed": bot_status.get("not_processed"),
-            "zip_blob_name": bot_status.get("zip_blob_name"),
-            "run_id": bot_status.get("run_id")
-        })
+    """Status of the latest run (or of ?run_id=), read from the job queue so any web process can answer."""
+    status = _job_status(request.args.get("run_id"))
+    if status is None:
+        return jsonify({"status": "idle", "message": "Idle", "market_stats": {}, "not_processed": []})
+    return jsonify({field: status.get(field) for field in STATUS_FIELDS})
@@ -0,0 +1,151 @@
+import json
+import os
+import socket
+import threading
+
+from constants.Constants import JOB_HEARTBEAT_SECONDS, JOB_POLL_INTERVAL, EMBEDDED_WORKER, WORKER_JOBS, \
+    JOB_HEARTBEAT_NOT_PROCESSED
+from helpers.JobQueue import get_job_queue, FINISHED, ERROR
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class JobWorker:
+    """
+    Claims bot runs from the job queue and executes up to `max_jobs` of them at once
+    (the queue only holds concurrent jobs for disjoint markets).
+    While a job runs, the queue's lease is renewed every `heartbeat_seconds` and its status
+    published when it changed, with only the last `heartbeat_not_processed` not processed actions
+    (the full status is published when the job completes); a job handed back after an expired lease is resumed
+    from its checkpoints. A worker whose heartbeat finds the job no longer its own cancels
+    the run and leaves the job to its new owner.
+    Any number of workers can share a queue, in one or many processes.
+    """
+
+    def __init__(self, queue, worker_id=None, poll_interval=JOB_POLL_INTERVAL,
+                 heartbeat_seconds=JOB_HEARTBEAT_SECONDS, max_jobs=WORKER_JOBS,
+                 heartbeat_not_processed=JOB_HEARTBEAT_NOT_PROCESSED):
+        self.queue = queue
+        self.max_jobs = max(1, int(max_jobs))
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+        self.poll_interval = poll_interval
+        self.heartbeat_seconds = heartbeat_seconds
+        self.heartbeat_not_processed = heartbeat_not_processed
+        self.stop = threading.Event()
+
+    @staticmethod
+    def _runners():
+        """(runner per job kind, status snapshot function, run registry) of the web app."""
+        from app import routes
+        runners = {"run": routes.run_bot_thread, "apply_plan": routes.apply_plan_thread}
+        return runners, routes.status_snapshot, routes.runs
+
+    def run_job(self, job):
+        runners, status_snapshot, runs = self._runners()
+        # Events of this process' runs go to the queue's event log, read by the SSE stream
+        runs.on_event = self.queue.publish_event
+        params = dict(job["params"])
+        if job["kind"] == "run" and job["attempts"] > 1:
+            # Claimed again after a worker died: skip what the previous attempt completed
+            params["resume"] = True
+        runner = runners[job["kind"]]
+        job_id = job["job_id"]
+
+        done = threading.Event()
+        # Set when the lease is lost: the run stops its pipelines and makes no further writes
+        cancel = threading.Event()
+
+        def heartbeat():
+            published = None
+            while not done.wait(self.heartbeat_seconds):
+                status = self._heartbeat_status(status_snapshot(job_id))
+                key = json.dumps(status, sort_keys=True) if status else None
+                if not self.queue.heartbeat(job_id, self.worker_id, status if key != published else None):
+                    logger.warning(f"Job {job_id}: lease lost by {self.worker_id}, cancelling the run")
+                    cancel.set()
+                    return
+                published = key
+
+        beat = threading.Thread(target=heartbeat, name=f"heartbeat-{job['job_id']}", daemon=True)
+        beat.start()
+        try:
+            runner(cancel=cancel, **params)
+        except Exception as e:
+            logger.exception(f"Job {job['job_id']} failed: {e}")
+        finally:
+            done.set()
+            beat.join()
+        if cancel.is_set():
+            return
+        status = status_snapshot(job_id)
+        if not self.queue.complete(job_id, self.worker_id, ERROR if status.get("status") == "error" else FINISHED,
+                                   status):
+            logger.warning(f"Job {job_id}: finished by {self.worker_id} after another worker took it over")
+
+    def _heartbeat_status(self, status):
+        """The run's status without the bulk of its (growing) not processed list."""
+        not_processed = (status or {}).get("not_processed") or []
+        extra = len(not_processed) - self.heartbeat_not_processed
+        if extra > 0:
+            status = dict(status, not_processed=not_processed[extra:])
+        return status
+
+    def run_once(self):
+        """Run one queued job; False when there was none."""
+        self.queue.requeue_expired()
+        job = self.queue.claim(self.worker_id)
+        if job is None:
+            return False
+        self.run_job(job)
+        return True
+
+    def run_forever(self):
+        logger.info(f"Worker {self.worker_id} waiting for jobs ({self.max_jobs} at once)")
+        slots = threading.Semaphore(self.max_jobs)
+
+        def run(job):
+            try:
+                self.run_job(job)
+            finally:
+                slots.release()
+
+        while not self.stop.is_set():
+            if not slots.acquire(timeout=self.poll_interval):
+                continue
+            try:
+                self.queue.requeue_expired()
+                job = self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.exception(f"Worker {self.worker_id}: {e}")
+                job = None
+            if job is None:
+                slots.release()
+                self.stop.wait(self.poll_interval)
+                continue
+            threading.Thread(target=run, args=(job,), name=f"job-{job['job_id']}", daemon=True).start()
+
+
+_embedded_worker = None
+_embedded_worker_lock = threading.Lock()
+
+
+def start_embedded_worker(config):
+    """
+    Start a JobWorker thread inside the web process (config.json: embedded_worker, default true),
+    so a single-process deployment runs its own jobs. Set it to false when workers run separately.
+    """
+    global _embedded_worker
+    if not config.get("embedded_worker", EMBEDDED_WORKER):
+        return None
+    with _embedded_worker_lock:
+        if _embedded_worker is None:
+            _embedded_worker = JobWorker(get_job_queue(config), max_jobs=config.get("worker_jobs", WORKER_JOBS))
+            threading.Thread(target=_embedded_worker.run_forever, name="embedded-worker", daemon=True).start()
+        return _embedded_worker
+
+
+def run_worker():
+    """Entry point of a standalone worker process: `python worker.py`."""
+    from app import routes
+    JobWorker(get_job_queue(routes.CONFIG), max_jobs=routes.CONFIG.get("worker_jobs", WORKER_JOBS)).run_forever()
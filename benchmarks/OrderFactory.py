@@ -0,0 +1,45 @@
+import random
+
+STATUSES = ["pending", "accepted", "sent", "rejected", "returned", " Sent ", "PENDING", "", None]
+AMOUNTS = [0, 1, 1, 2, "1", "0", "x", None]
+PRICES = [None, 0, 3900, "5000", 12345, 99, "bad"]
+NOTES = [
+    ("internal note", "Customer asked for an update"),
+    ("internal note", "FRAUD RISK - hold"),
+    ("internal note", "Please do not refund this one"),
+    ("customer note", "fraud order"),
+    ("Internal Note", "lost parcels process started"),
+    (None, None),
+]
+
+
+def random_position(rng):
+    position = {"status": rng.choice(STATUSES), "amount": rng.choice(AMOUNTS)}
+    price = rng.choice(PRICES)
+    if price is not None or rng.random() < 0.5:
+        position["price"] = {"amount": price} if price is not None else None
+    return position
+
+
+def random_order(rng=None):
+    """Random PATA order response covering the shapes the rules have to handle."""
+    rng = rng or random
+    data = {"orderId": rng.randint(1, 10 ** 6)}
+    roll = rng.random()
+    if roll < 0.05:
+        return {}
+    if roll < 0.15:
+        data["voucher"] = {"code": rng.choice(["V123", "  ", "", None])}
+    if rng.random() < 0.9:
+        data["positions"] = [random_position(rng) for _ in range(rng.randint(0, 5))]
+    if rng.random() < 0.3:
+        data["history"] = [
+            {"type": note_type, "message": message}
+            for note_type, message in rng.sample(NOTES, rng.randint(0, 3))
+        ]
+    return {"data": data}
+
+
+def random_orders(count, seed=0):
+    rng = random.Random(seed)
+    return [random_order(rng) for _ in range(count)]
@@ -0,0 +1,61 @@
+"""
+Orders/sec of PATARules.evaluate_many and the compiled default rule set
+against calculate_action_reason_and_amount.
+
+    python -m benchmarks.PATARulesBenchmark [orders] [repeats]
+"""
+import contextlib
+import io
+import sys
+import time
+
+from helpers.PATARules import PATARules
+from helpers.RulesEngine import RulesEngine, load_rules_definition
+from benchmarks.OrderFactory import random_orders
+
+
+def best_of(repeats, fn):
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(count=20000, repeats=3):
+    orders = random_orders(count, seed=1)
+
+    def current():
+        # calculate_action_reason_and_amount prints every order; keep that cost but not the noise
+        with contextlib.redirect_stdout(io.StringIO()):
+            return [PATARules.calculate_action_reason_and_amount(order) for order in orders]
+
+    def batched():
+        reasons, amounts = PATARules.evaluate_many(orders)
+        return list(zip(reasons, amounts))
+
+    rule_set = RulesEngine(load_rules_definition()).for_market(None)
+
+    def compiled():
+        return [rule_set.evaluate(order) for order in orders]
+
+    current_time, expected = best_of(repeats, current)
+    batched_time, actual = best_of(repeats, batched)
+    compiled_time, compiled_actual = best_of(repeats, compiled)
+    if actual != expected:
+        raise SystemExit("evaluate_many results differ from calculate_action_reason_and_amount")
+    if compiled_actual != expected:
+        raise SystemExit("compiled default rule set differs from calculate_action_reason_and_amount")
+
+    print(f"orders: {count}")
+    print(f"calculate_action_reason_and_amount: {count / current_time:,.0f} orders/sec")
+    print(f"evaluate_many:                      {count / batched_time:,.0f} orders/sec")
+    print(f"compiled default rule set:          {count / compiled_time:,.0f} orders/sec")
+    print(f"speed-up: {current_time / batched_time:.1f}x (evaluate_many), {current_time / compiled_time:.1f}x (rule set)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
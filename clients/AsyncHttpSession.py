@@ -0,0 +1,108 @@
+import asyncio
+
+import aiohttp
+from multidict import CIMultiDict
+
+from constants.Constants import (
+    ASYNC_CONNECTOR_LIMIT,
+    ASYNC_CONNECTOR_LIMIT_PER_HOST,
+    ASYNC_MAX_IN_FLIGHT,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_FACTOR,
+    HTTP_RETRY_STATUSES,
+    HTTP_RETRY_METHODS,
+    HTTP_TIMEOUT,
+)
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+# One aiohttp session + in-flight semaphore per event loop (aiohttp objects are loop-bound)
+_shared = {}
+
+
+def async_settings_from_config(config):
+    """
+    Read the async pool settings from the app config (config.json / secret),
+    falling back to the defaults in constants.Constants.
+    """
+    config = config or {}
+    return {
+        "limit": int(config.get("async_connector_limit", ASYNC_CONNECTOR_LIMIT)),
+        "limit_per_host": int(config.get("async_connector_limit_per_host", ASYNC_CONNECTOR_LIMIT_PER_HOST)),
+        "max_in_flight": int(config.get("async_max_in_flight", ASYNC_MAX_IN_FLIGHT)),
+    }
+
+
+class AsyncHttpSession:
+    """
+    Shared aiohttp.ClientSession with a keep-alive TCPConnector pool,
+    a semaphore capping requests in flight, and retry/backoff on 5xx.
+    """
+
+    def __init__(self, limit=ASYNC_CONNECTOR_LIMIT, limit_per_host=ASYNC_CONNECTOR_LIMIT_PER_HOST,
+                 max_in_flight=ASYNC_MAX_IN_FLIGHT, max_retries=HTTP_MAX_RETRIES,
+                 backoff_factor=HTTP_BACKOFF_FACTOR):
+        connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        )
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+    async def request(self, method, url, **kwargs):
+        """
+        Send a request and return (status, text, headers). Retries with exponential backoff like the
+        sync adapter does: failed connects for every method, other connection errors, timeouts and
+        HTTP_RETRY_STATUSES only for HTTP_RETRY_METHODS (a write may already have been received).
+        """
+        retry_any = method.upper() in HTTP_RETRY_METHODS
+        attempt = 0
+        while True:
+            try:
+                async with self.semaphore:
+                    async with self.session.request(method, url, **kwargs) as response:
+                        text = await response.text()
+                        status = response.status
+                        headers = CIMultiDict(response.headers)
+                if status not in HTTP_RETRY_STATUSES or not retry_any or attempt >= self.max_retries:
+                    return status, text, headers
+            except aiohttp.ClientConnectorError:
+                # Nothing was sent
+                if attempt >= self.max_retries:
+                    raise
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not retry_any or attempt >= self.max_retries:
+                    raise
+
+            delay = self.backoff_factor * (2 ** attempt)
+            attempt += 1
+            logger.warning(f"Retrying {method} {url} in {delay:.1f}s (attempt {attempt})")
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        await self.session.close()
+
+
+def get_shared_async_session(config=None):
+    """
+    Return the AsyncHttpSession shared by AsyncImpactClient and AsyncPATAClient
+    on the running event loop, creating it (sized from `config`) on first use.
+    """
+    loop = asyncio.get_running_loop()
+    shared = _shared.get(loop)
+    if shared is None or shared.session.closed:
+        settings = async_settings_from_config(config)
+        logger.info(f"Creating shared async HTTP session: {settings}")
+        shared = AsyncHttpSession(**settings)
+        _shared[loop] = shared
+    return shared
+
+
+async def close_shared_async_session():
+    """Close the shared session of the running event loop (call before the loop ends)."""
+    shared = _shared.pop(asyncio.get_running_loop(), None)
+    if shared is not None:
+        await shared.close()
@@ -0,0 +1,189 @@
+import asyncio
+import base64
+import json
+
+import aiohttp
+
+from clients.AsyncHttpSession import get_shared_async_session
+from clients.ImpactActions import project_page
+from clients.ImpactClient import ImpactClientBase
+from constants.Constants import BASE_URL, IMPACT_THROTTLE_RETRIES
+from helpers.RateLimiter import parse_retry_after, READ, WRITE
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AsyncImpactClient(ImpactClientBase):
+    """
+    asyncio counterpart of ImpactClient for get_actions, iter_action_pages, iter_actions,
+    retrieve_action, update_action and reverse_action, all awaitable. Config, timezone and
+    URL helpers come from ImpactClientBase; date sharding and batch jobs are ImpactClient only.
+    """
+
+    def __init__(self, data, market, async_session=None):
+        super().__init__(data, market)
+        self._async_session = async_session
+
+    @property
+    def async_session(self):
+        # Resolved lazily: the shared session is bound to the running event loop
+        return self._async_session or get_shared_async_session(self.config)
+
+    @property
+    def headers(self):
+        credentials = base64.b64encode(f"{self.username}:{self.password}".encode()).decode()
+        return {"Accept": "application/json", "Authorization": f"Basic {credentials}"}
+
+    async def send(self, kind, method, url, **kwargs):
+        """
+        Async counterpart of ImpactClient.send: paced by the account's token bucket,
+        429 responses are retried after Retry-After. Returns (status, text).
+        """
+        attempts = 0
+        while True:
+            await self.rate_limiter.acquire_async(self.username, kind)
+            status, text, headers = await self.async_session.request(
+                method, url, headers=self.headers, **kwargs
+            )
+            if status != 429:
+                if status < 400:
+                    self.rate_limiter.succeeded(self.username, kind)
+                return status, text
+            if attempts >= IMPACT_THROTTLE_RETRIES:
+                logger.error(f"Impact kept throttling {method} {url} after {attempts} retries")
+                return status, text
+
+            attempts += 1
+            retry_after = parse_retry_after(headers.get("Retry-After"))
+            self.rate_limiter.throttled(self.username, kind, retry_after)
+
+    async def fetch_actions_page(self, url, params, page_number):
+        page_params = dict(params, PageNumber=page_number)
+        try:
+            status, text = await self.send(
+                READ,
+                "GET",
+                url,
+                params={k: str(v) for k, v in page_params.items()},
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise ValueError(f"Error fetching actions: {e}")
+
+        if status != 200:
+            logger.error(f"Error {status}: {text}")
+            raise ValueError(f"Error {status}: {text}")
+
+        data = json.loads(text)
+        if self.projection:
+            data = project_page(data)
+        logger.info(
+            f"Campaign {params.get('CampaignId')}: Retrieved {len(data.get('Actions', []))} actions "
+            f"(page {page_number})."
+        )
+        return data
+
+    async def get_actions(self, campaign_id, start_date, end_date, page_size=1000, page_number=1, since=None):
+        """
+        Fetch all actions of a campaign in the window, in page order.
+        Remaining pages are requested together; the shared semaphore caps how many are in flight.
+        """
+        url, params = self.build_actions_request(campaign_id, start_date, end_date, page_size, since)
+
+        first_page = await self.fetch_actions_page(url, params, page_number)
+        all_actions = list(first_page.get("Actions", []))
+
+        num_pages = self.page_count(first_page)
+        if num_pages is None:
+            # No paging metadata: walk serially, stop when less than PageSize returned
+            actions = all_actions
+            while len(actions) >= page_size:
+                page_number += 1
+                actions = (await self.fetch_actions_page(url, params, page_number)).get("Actions", [])
+                all_actions.extend(actions)
+            return all_actions
+
+        pages = await asyncio.gather(*(
+            self.fetch_actions_page(url, params, n) for n in range(page_number + 1, num_pages + 1)
+        ))
+        for data in pages:
+            all_actions.extend(data.get("Actions", []))
+        return all_actions
+
+    async def iter_action_pages(self, campaign_id, start_date, end_date, page_size=1000, prefetch=True,
+                                since=None):
+        """
+        Async generator counterpart of ImpactClient.iter_action_pages: yields the actions one page
+        at a time, in page order; with prefetch=True the next page is requested while the caller
+        works on the current one.
+        """
+        url, params = self.build_actions_request(campaign_id, start_date, end_date, page_size, since)
+        page_number = 1
+        data = await self.fetch_actions_page(url, params, page_number)
+        num_pages = self.page_count(data)
+
+        while True:
+            actions = data.get("Actions", [])
+            if num_pages is not None:
+                has_next = page_number < num_pages
+            else:
+                has_next = len(actions) >= page_size
+
+            next_page = None
+            if has_next and prefetch:
+                next_page = asyncio.ensure_future(self.fetch_actions_page(url, params, page_number + 1))
+            try:
+                yield actions
+            except BaseException:
+                if next_page is not None:
+                    next_page.cancel()
+                raise
+
+            if not has_next:
+                break
+            page_number += 1
+            if next_page is not None:
+                data = await next_page
+            else:
+                data = await self.fetch_actions_page(url, params, page_number)
+
+    async def iter_actions(self, campaign_id, start_date, end_date, page_size=1000, prefetch=True, since=None):
+        """Async generator of single actions, as soon as their page arrives."""
+        async for actions in self.iter_action_pages(campaign_id, start_date, end_date, page_size, prefetch,
+                                                    since):
+            for action in actions:
+                yield action
+
+    async def _send(self, kind, method, url, action_id, body=None):
+        try:
+            status, text = await self.send(kind, method, url, data=body)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error sending {method} for action {action_id}: {e}")
+            return None
+
+        if status not in (200, 201):
+            logger.error(f"Error {status}: {text}")
+            return None
+        return json.loads(text)
+
+    async def retrieve_action(self, action_id):
+        url = BASE_URL + self.username + "/Actions/" + action_id
+        logger.info(f"Retrieving action {action_id}")
+        return await self._send(READ, "GET", url, action_id)
+
+    async def update_action(self, action_id, amount, reason):
+        url = BASE_URL + self.username + "/Actions"
+        body = {"ActionId": action_id, "Amount": str(amount), "Reason": reason}
+        data = await self._send(WRITE, "PUT", url, action_id, body)
+        if data is not None:
+            logger.info(f"Update response: {data}")
+        return data
+
+    async def reverse_action(self, action_id, amount, reason):
+        url = BASE_URL + self.username + "/Actions"
+        body = {"ActionId": action_id, "Amount": str(amount), "Reason": reason}
+        data = await self._send(WRITE, "DELETE", url, action_id, body)
+        if data is not None:
+            logger.info(f"Update response: {data}")
+        return data
+
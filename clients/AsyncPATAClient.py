@@ -0,0 +1,41 @@
+import asyncio
+import json
+
+import aiohttp
+
+from clients.AsyncHttpSession import get_shared_async_session
+from constants.Constants import PATA_BASE_URL
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AsyncPATAClient:
+    """asyncio counterpart of PATAClient; retrieve_order is awaitable."""
+
+    def __init__(self, async_session=None):
+        self._async_session = async_session
+
+    @property
+    def async_session(self):
+        # Resolved lazily: the shared session is bound to the running event loop
+        return self._async_session or get_shared_async_session()
+
+    async def retrieve_order(self, market, order_id):
+        market = market.lower()
+        url = PATA_BASE_URL + market + "/order/" + order_id
+        logger.info(f"Retrieving order {str(order_id)}")
+        try:
+            status, text, _ = await self.async_session.request(
+                "GET",
+                url,
+                headers={"Accept": "application/json"},
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error fetching order {str(order_id)}: {e}")
+            return None
+
+        if status != 200:
+            logger.error(f"Error {status}: {text}")
+            return None
+        return json.loads(text)
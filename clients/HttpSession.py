@@ -0,0 +1,89 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from constants.Constants import (
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_FACTOR,
+    HTTP_RETRY_STATUSES,
+    HTTP_RETRY_METHODS,
+)
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def pool_settings_from_config(config):
+    """
+    Read the connection pool settings from the app config (config.json / secret),
+    falling back to the defaults in constants.Constants.
+    """
+    config = config or {}
+    return {
+        "pool_connections": int(config.get("http_pool_connections", HTTP_POOL_CONNECTIONS)),
+        "pool_maxsize": int(config.get("http_pool_maxsize", HTTP_POOL_MAXSIZE)),
+        "max_retries": int(config.get("http_max_retries", HTTP_MAX_RETRIES)),
+        "backoff_factor": float(config.get("http_backoff_factor", HTTP_BACKOFF_FACTOR)),
+    }
+
+
+def create_session(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                   max_retries=HTTP_MAX_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR):
+    """
+    Build a requests.Session with a keep-alive connection pool and a retry/backoff adapter.
+
+    pool_connections: number of per-host pools kept open
+    pool_maxsize: max connections kept alive per host
+    Connect errors are retried for every method; read errors and HTTP_RETRY_STATUSES only for
+    HTTP_RETRY_METHODS, so a write that reached the server is never sent twice.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=HTTP_RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_shared_session(config=None):
+    """
+    Return the process-wide session shared by ImpactClient and PATAClient.
+    It is created on first use (sized from `config`) and then reused across markets and runs.
+    """
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            settings = pool_settings_from_config(config)
+            logger.info(f"Creating shared HTTP session: {settings}")
+            _shared_session = create_session(**settings)
+        return _shared_session
+
+
+def reset_shared_session():
+    """Close and drop the shared session (next get_shared_session() builds a new one)."""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is not None:
+            _shared_session.close()
+        _shared_session = None
@@ -0,0 +1,95 @@
+try:
+    import ijson
+except ImportError:  # streaming parse is optional, pages are then decoded with response.json()
+    ijson = None
+
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Action fields kept by the projection; everything else in Impact's payload is dropped on decode
+ACTION_FIELDS = ("Id", "Oid", "AdId", "EventDate", "CreationDate", "State",
+                 "Amount", "Payout", "IntendedAmount", "IntendedPayout")
+# Paging metadata of an Actions page
+PAGE_FIELDS = ("@page", "@numpages", "@pagesize", "@total")
+
+_ACTION_PREFIX = "Actions.item"
+_FIELD_PREFIXES = {f"{_ACTION_PREFIX}.{field}": field for field in ACTION_FIELDS}
+_SCALAR_EVENTS = ("string", "number", "boolean", "null")
+
+
+class ImpactAction:
+    """
+    Slim Impact action: only ACTION_FIELDS, stored in __slots__.
+    Reads like the raw action dict (action.get("Oid"), action["Id"]) so callers need no change.
+    """
+
+    __slots__ = ACTION_FIELDS
+
+    def __init__(self, **fields):
+        for field, value in fields.items():
+            setattr(self, field, value)
+
+    @classmethod
+    def from_dict(cls, action):
+        return cls(**{field: action[field] for field in ACTION_FIELDS if field in action})
+
+    def get(self, key, default=None):
+        if key not in _FIELD_SET:
+            return default
+        return getattr(self, key, default)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in _FIELD_SET and hasattr(self, key)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in ACTION_FIELDS if hasattr(self, field)}
+
+    def __eq__(self, other):
+        if isinstance(other, ImpactAction):
+            other = other.to_dict()
+        return self.to_dict() == other if isinstance(other, dict) else NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ImpactAction({self.to_dict()})"
+
+
+_FIELD_SET = frozenset(ACTION_FIELDS)
+
+
+def project_page(data):
+    """Replace the action dicts of a decoded Actions page by ImpactAction records."""
+    page = {field: data[field] for field in PAGE_FIELDS if field in data}
+    page["Actions"] = [ImpactAction.from_dict(action) for action in data.get("Actions") or []]
+    return page
+
+
+def parse_actions_page_stream(stream):
+    """
+    Parse an Actions page from a byte stream with ijson, building ImpactAction records
+    field by field, so the page is never materialized as dicts.
+    """
+    page = {"Actions": []}
+    current = None
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if prefix == _ACTION_PREFIX:
+            if event == "start_map":
+                current = {}
+            elif event == "end_map":
+                page["Actions"].append(ImpactAction(**current))
+                current = None
+        elif current is not None:
+            field = _FIELD_PREFIXES.get(prefix)
+            if field is not None and event in _SCALAR_EVENTS:
+                current[field] = value
+        elif prefix in PAGE_FIELDS and event in _SCALAR_EVENTS:
+            page[prefix] = value
+    return page
@@ -1,4 +1,9 @@
-from datetime import datetime, date, time, timezone
+import csv
+import io
+import time as time_module
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, time, timezone, timedelta
 
 import os
 from zoneinfo import ZoneInfo
@@ -7,14 +12,25 @@ import pytz
 import requests
 from requests.auth import HTTPBasicAuth
 
-from constants.Constants import BASE_URL, COUNTRY_CODES_AND_CAMPAIGNS
+from clients.HttpSession import get_shared_session
+from constants.Constants import BASE_URL, COUNTRY_CODES_AND_CAMPAIGNS, HTTP_TIMEOUT, IMPACT_PAGE_WORKERS, \
+    IMPACT_THROTTLE_RETRIES, IMPACT_ACTION_BATCH_PATH, IMPACT_BATCH_SIZE, IMPACT_BATCH_POLL_INTERVAL, \
+    IMPACT_BATCH_TIMEOUT, IMPACT_JOB_FINAL_STATUSES, IMPACT_ACTION_PROJECTION, IMPACT_STREAMING_JSON, \
+    DATE_SHARD_SIZES, SHARD_WORKERS, SHARD_RETRIES
+from clients.ImpactActions import ijson, project_page, parse_actions_page_stream
+from helpers.RateLimiter import get_rate_limiter, parse_retry_after, READ, WRITE
 from helpers.logger import get_logger
 from utils.CommonUtils import common_utils
 
 logger = get_logger(__name__)
 
-class ImpactClient:
-    def __init__(self,data, market):
+class ImpactClientBase:
+    """
+    Account config, timezone and Actions-request helpers shared by ImpactClient and AsyncImpactClient,
+    which add the blocking and the asyncio transport respectively.
+    """
+
+    def __init__(self,data, market, rate_limiter=None):
         if isinstance(data, str):  # path to config file
             self.config = common_utils.read_json(data)
             print(data)
@@ -28,6 +44,16 @@ class ImpactClient:
 
         self.username = self.config.get(account_SID)
         self.password = self.config.get(token)
+        # Token buckets keyed on this account SID, shared by all clients of the process
+        self.rate_limiter = rate_limiter or get_rate_limiter(self.config)
+        self.page_workers = int(self.config.get("impact_page_workers", IMPACT_PAGE_WORKERS))
+        # Keep only the fields the bot reads, as ImpactAction records, instead of Impact's full action dicts
+        self.projection = bool(self.config.get("impact_action_projection", IMPACT_ACTION_PROJECTION))
+        # Build the records straight from the response stream (needs ijson and projection)
+        self.streaming = bool(self.config.get("impact_streaming_json", IMPACT_STREAMING_JSON)) \
+            and self.projection and ijson is not None
+        self.shard_workers = int(self.config.get("shard_workers", SHARD_WORKERS))
+        self.shard_retries = int(self.config.get("shard_retries", SHARD_RETRIES))
 
     countries = {
         "Germany": "Europe/Berlin",
@@ -117,8 +143,17 @@ class ImpactClient:
         return value.replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
 
-    def get_actions(self,campaign_id, start_date, end_date, page_size=1000, page_number=1):
+    def build_actions_request(self, campaign_id, start_date, end_date, page_size=1000, since=None):
+        """
+        Return (url, params) for the Actions list endpoint of one campaign/date window.
+        PageNumber is filled in per page by fetch_actions_page.
+        since: optional UTC ISO timestamp (incremental watermark); when later than the
+        window start it replaces it, so only newer actions are fetched.
+        """
         start_utc, end_utc = self.local_to_utc_from_campaign(campaign_id, start_date, end_date)
+        if since and datetime.fromisoformat(since) > datetime.fromisoformat(start_utc):
+            logger.info(f"Campaign {campaign_id}: incremental fetch from watermark {since}")
+            start_utc = since
         print(start_utc, end_utc)
 
         url=BASE_URL+self.username+"/Actions?"
@@ -131,55 +166,302 @@ class ImpactClient:
             "ActionDateStart": start_param,
             "ActionDateEnd": end_param,
             "PageSize":page_size,
-            "PageNumber":page_number,
             "CampaignId":campaign_id
         }
+        return url, params
 
-        all_actions = []
+    @staticmethod
+    def page_count(data):
+        """
+        Read the total number of pages from Impact's paging metadata.
+        Returns None when the response carries no usable metadata.
+        """
+        try:
+            num_pages = data.get("@numpages")
+            if num_pages is not None:
+                return int(num_pages)
+
+            total = data.get("@total")
+            page_size = data.get("@pagesize")
+            if total is not None and page_size:
+                return max(1, -(-int(total) // int(page_size)))
+        except (TypeError, ValueError):
+            pass
+        return None
+
+    @staticmethod
+    def date_shards(start_date, end_date, shard="week"):
+        """
+        Split the market-local window [start_date, end_date] ("YYYY-MM-DD", both inclusive)
+        into consecutive day or week windows, returned as ("YYYY-MM-DD", "YYYY-MM-DD") pairs.
+        """
+        if shard not in DATE_SHARD_SIZES:
+            raise ValueError(f"Unknown shard size: {shard}")
+        step = timedelta(days=DATE_SHARD_SIZES[shard])
+        current = datetime.strptime(start_date, "%Y-%m-%d").date()
+        last = datetime.strptime(end_date, "%Y-%m-%d").date()
+        shards = []
+        while current <= last:
+            shard_end = min(current + step - timedelta(days=1), last)
+            shards.append((current.isoformat(), shard_end.isoformat()))
+            current = shard_end + timedelta(days=1)
+        return shards
+
+
+class ImpactClient(ImpactClientBase):
+    def __init__(self,data, market, session=None, rate_limiter=None):
+        super().__init__(data, market, rate_limiter)
+        # Keep-alive pool shared with PATAClient, reused across markets and runs (created on first use)
+        self._session = session
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = get_shared_session(self.config)
+        return self._session
+
+    def send(self, kind, method, url, **kwargs):
+        """
+        Send one Impact request paced by the account's READ/WRITE token bucket.
+        429 responses are retried after Retry-After (up to IMPACT_THROTTLE_RETRIES)
+        and slow the bucket down, so throttling never turns into a lost action.
+        """
+        attempts = 0
         while True:
-            try:
-                response = requests.get(
-                    url,
-                    auth=HTTPBasicAuth(self.username, self.password),
-                    headers={"Accept": "application/json"},
-                    params=params
-                )
-                print(f"url: {url}")
-                if response.status_code != 200:
-                    logger.error(f"Error {response.status_code}: {response.text}")
-                    raise ValueError(f"Error {response.status_code}: {response.text}")
+            self.rate_limiter.acquire(self.username, kind)
+            response = getattr(self.session, method.lower())(
+                url,
+                auth=HTTPBasicAuth(self.username, self.password),
+                headers={"Accept": "application/json"},
+                timeout=HTTP_TIMEOUT,
+                **kwargs
+            )
+            if response.status_code != 429:
+                if response.status_code < 400:
+                    self.rate_limiter.succeeded(self.username, kind)
+                return response
+            if attempts >= IMPACT_THROTTLE_RETRIES:
+                logger.error(f"Impact kept throttling {method} {url} after {attempts} retries")
+                return response
+
+            attempts += 1
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            self.rate_limiter.throttled(self.username, kind, retry_after)
+
+    def fetch_actions_page(self, url, params, page_number):
+        """
+        Fetch one page of the Actions list. Returns the decoded JSON body
+        (Actions plus Impact's @page/@numpages/@total paging metadata).
+        With projection on, the actions are ImpactAction records; with streaming on,
+        they are parsed from the response stream without decoding the page into dicts.
+        """
+        page_params = dict(params, PageNumber=page_number)
+        try:
+            response = self.send(
+                READ,
+                "GET",
+                url,
+                params=page_params,
+                stream=self.streaming
+            )
+            print(f"url: {url}")
+            if response.status_code != 200:
+                logger.error(f"Error {response.status_code}: {response.text}")
+                raise ValueError(f"Error {response.status_code}: {response.text}")
+
+            if self.streaming:
+                try:
+                    response.raw.decode_content = True
+                    data = parse_actions_page_stream(response.raw)
+                finally:
+                    response.close()
+            elif self.projection:
+                data = project_page(response.json())
+            else:
+                data = response.json()
+        except requests.RequestException as e:
+            raise ValueError(f"Error fetching actions: {e}")
 
+        logger.info(
+            f"Campaign {params.get('CampaignId')}: Retrieved {len(data.get('Actions', []))} actions "
+            f"(page {page_number})."
+        )
+        return data
 
-                data = response.json()
-                actions = data.get("Actions", [])
+    def get_actions(self,campaign_id, start_date, end_date, page_size=1000, page_number=1, max_workers=None,
+                    since=None):
+        """
+        Fetch all actions of a campaign in the window, in page order.
+
+        Page 1 is fetched first; when it carries paging metadata the remaining pages
+        are fetched concurrently with at most `max_workers` threads (default from
+        config `impact_page_workers`). Without metadata, pages are walked one after
+        another until a short page comes back.
+        """
+        url, params = self.build_actions_request(campaign_id, start_date, end_date, page_size, since)
+        max_workers = max_workers or self.page_workers
+
+        first_page = self.fetch_actions_page(url, params, page_number)
+        all_actions = list(first_page.get("Actions", []))
+
+        num_pages = self.page_count(first_page)
+        if num_pages is None:
+            # No paging metadata: walk serially, stop when less than PageSize returned
+            actions = all_actions
+            while len(actions) >= page_size:
+                page_number += 1
+                actions = self.fetch_actions_page(url, params, page_number).get("Actions", [])
                 all_actions.extend(actions)
+            return all_actions
 
-                logger.info(
-                    f"Campaign {campaign_id}: Retrieved {len(actions)} actions "
-                    f"(page {params['PageNumber']})."
-                )
+        remaining_pages = range(page_number + 1, num_pages + 1)
+        if not remaining_pages:
+            return all_actions
 
-                # Stop if less than PageSize returned (no more pages)
-                if len(actions) < params["PageSize"]:
-                    break
+        logger.info(
+            f"Campaign {campaign_id}: fetching {len(remaining_pages)} more page(s) "
+            f"with {min(max_workers, len(remaining_pages))} worker(s)."
+        )
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(remaining_pages))) as executor:
+            # executor.map yields in page order, so the result order is stable
+            for data in executor.map(lambda n: self.fetch_actions_page(url, params, n), remaining_pages):
+                all_actions.extend(data.get("Actions", []))
+
+        return all_actions
 
-                params["PageNumber"] += 1
 
-            except requests.RequestException as e:
-                raise ValueError(f"Error fetching actions: {e}")
+    def iter_action_pages(self, campaign_id, start_date, end_date, page_size=1000, prefetch=True, since=None,
+                          max_workers=None):
+        """
+        Yield the actions of a campaign one page (list) at a time, in page order.
+
+        With prefetch=True the next pages are requested in background threads while the caller
+        works on the current one: when page 1 carries paging metadata, up to `max_workers` pages
+        (default from config `impact_page_workers`) are in flight, as in get_actions; without it,
+        one page ahead. Memory stays bounded to those pages however long the window is.
+        """
+        url, params = self.build_actions_request(campaign_id, start_date, end_date, page_size, since)
+        page_number = 1
+        max_workers = max(1, max_workers or self.page_workers)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            data = self.fetch_actions_page(url, params, page_number)
+            num_pages = self.page_count(data)
+
+            if num_pages is not None and prefetch:
+                # Bounded fan-out: refill up to max_workers pages as the caller takes them, in page order
+                in_flight = deque()
+                next_number = page_number + 1
+                try:
+                    while True:
+                        while next_number <= num_pages and len(in_flight) < max_workers:
+                            in_flight.append(executor.submit(self.fetch_actions_page, url, params, next_number))
+                            next_number += 1
+                        yield data.get("Actions", [])
+                        if not in_flight:
+                            break
+                        data = in_flight.popleft().result()
+                finally:
+                    for future in in_flight:
+                        future.cancel()
+                return
+
+            while True:
+                actions = data.get("Actions", [])
+                if num_pages is not None:
+                    has_next = page_number < num_pages
+                else:
+                    # Stop if less than PageSize returned (no more pages)
+                    has_next = len(actions) >= page_size
 
+                next_page = None
+                if has_next and prefetch:
+                    next_page = executor.submit(self.fetch_actions_page, url, params, page_number + 1)
 
-        return all_actions
+                yield actions
 
+                if not has_next:
+                    break
+                page_number += 1
+                if next_page is not None:
+                    data = next_page.result()
+                else:
+                    data = self.fetch_actions_page(url, params, page_number)
+
+    def iter_actions(self, campaign_id, start_date, end_date, page_size=1000, prefetch=True, since=None):
+        """
+        Generator counterpart of get_actions: yields single actions as soon as
+        their page arrives instead of buffering the whole window.
+        """
+        for actions in self.iter_action_pages(campaign_id, start_date, end_date, page_size, prefetch, since):
+            yield from actions
+
+    def fetch_shard(self, campaign_id, shard_start, shard_end, page_size=1000, since=None):
+        """
+        All action pages of one shard. A failed shard is fetched again from its first page
+        (up to shard_retries times), so a failure only costs that slice.
+        """
+        attempt = 0
+        while True:
+            try:
+                # Shards already run on shard_workers threads: one page ahead each
+                return list(self.iter_action_pages(campaign_id, shard_start, shard_end, page_size, since=since,
+                                                   max_workers=1))
+            except ValueError as e:
+                if attempt >= self.shard_retries:
+                    raise
+                attempt += 1
+                logger.warning(f"Campaign {campaign_id}: shard {shard_start}..{shard_end} failed ({e}), "
+                               f"retry {attempt}/{self.shard_retries}")
+
+    def iter_sharded_action_pages(self, campaign_id, start_date, end_date, shard="week", page_size=1000,
+                                  since=None, max_workers=None):
+        """
+        Yield the action pages of a campaign window split into day/week shards.
+
+        Shard boundaries are market-local days converted by local_to_utc_from_campaign, so shards
+        meet at local midnight across DST changes. Up to `max_workers` shards (config
+        `shard_workers`) are fetched concurrently; pages are yielded in shard order and an action
+        already yielded by an earlier shard is dropped, so no action is seen twice. Shards that end
+        before the incremental watermark `since` are skipped.
+        """
+        shards = self.date_shards(start_date, end_date, shard)
+        if since:
+            shards = [(s, e) for s, e in shards
+                      if datetime.fromisoformat(self.local_to_utc_from_campaign(campaign_id, s, e)[1])
+                      > datetime.fromisoformat(since)]
+        max_workers = max(1, min(max_workers or self.shard_workers, len(shards) or 1))
+        logger.info(f"Campaign {campaign_id}: {len(shards)} {shard} shard(s) with {max_workers} worker(s).")
+
+        seen = set()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # At most max_workers shards are fetched ahead of the consumer
+            futures = [executor.submit(self.fetch_shard, campaign_id, s, e, page_size, since)
+                       for s, e in shards[:max_workers]]
+            for index in range(len(shards)):
+                pages = futures[index].result()
+                futures[index] = None
+                if index + max_workers < len(shards):
+                    s, e = shards[index + max_workers]
+                    futures.append(executor.submit(self.fetch_shard, campaign_id, s, e, page_size, since))
+                for actions in pages:
+                    page = []
+                    for action in actions:
+                        action_id = action.get("Id")
+                        if action_id in seen:
+                            continue
+                        seen.add(action_id)
+                        page.append(action)
+                    yield page
 
     def retrieve_action(self,action_id):
         url=BASE_URL+self.username+"/Actions/"+action_id
         logger.info(f"Retrieving action {action_id}")
         try:
-            response = requests.get(
-                url,
-                auth=HTTPBasicAuth(self.username, self.password),
-                headers={"Accept": "application/json"}
+            response = self.send(
+                READ,
+                "GET",
+                url
             )
             if response.status_code not in (200, 201):
                 logger.error(f"Error {response.status_code}: {response.text}")
@@ -206,10 +488,10 @@ class ImpactClient:
         }
         print(f"update action body: {action_id}, {body}")
         try:
-            response = requests.put(
+            response = self.send(
+                WRITE,
+                "PUT",
                 url,
-                auth = HTTPBasicAuth(self.username, self.password),
-                headers = {"Accept": "application/json"},
                 data = body
             )
             print(f"update code response {response}")
@@ -236,10 +518,10 @@ class ImpactClient:
 
         }
         try:
-            response = requests.delete(
+            response = self.send(
+                WRITE,
+                "DELETE",
                 url,
-                auth=HTTPBasicAuth(self.username, self.password),
-                headers={"Accept": "application/json"},
                 data=body
             )
             if response.status_code not in (200, 201):
@@ -255,6 +537,116 @@ class ImpactClient:
             logger.error(f"Error updating action {action_id}: {e}")
             return None
 
+    def submit_action_batch(self, rows):
+        """
+        Upload one batch action-modification file.
+        rows: dicts with action_id, amount, reason. Returns the Impact job id, or None on failure.
+        """
+        url = BASE_URL + self.username + IMPACT_ACTION_BATCH_PATH
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["ActionId", "Amount", "Reason"])
+        for row in rows:
+            writer.writerow([row["action_id"], row["amount"], row["reason"]])
+
+        logger.info(f"Submitting batch of {len(rows)} action modifications")
+        try:
+            response = self.send(
+                WRITE,
+                "POST",
+                url,
+                files={"File": ("action_modifications.csv", output.getvalue().encode("utf-8"), "text/csv")}
+            )
+            if response.status_code not in (200, 201, 202):
+                logger.error(f"Error {response.status_code}: {response.text}")
+                return None
+
+            data = response.json()
+            job_id = data.get("JobId") or data.get("QueueId") or data.get("Id")
+            logger.info(f"Batch submitted, job {job_id}: {data}")
+            return job_id
+
+        except requests.RequestException as e:
+            logger.error(f"Error submitting action batch: {e}")
+            return None
+
+    def get_job(self, job_id):
+        """Return the Impact job record (Status, ...) or None when it can't be read."""
+        url = BASE_URL + self.username + "/Jobs/" + str(job_id)
+        try:
+            response = self.send(READ, "GET", url)
+            if response.status_code != 200:
+                logger.error(f"Error {response.status_code}: {response.text}")
+                return None
+            return response.json()
+        except requests.RequestException as e:
+            logger.error(f"Error reading job {job_id}: {e}")
+            return None
+
+    def wait_for_job(self, job_id, poll_interval=IMPACT_BATCH_POLL_INTERVAL, timeout=IMPACT_BATCH_TIMEOUT):
+        """
+        Poll a batch job until it reaches a final status.
+        Returns the final job record, or None on timeout / unreadable job.
+        """
+        deadline = time_module.monotonic() + timeout
+        while time_module.monotonic() < deadline:
+            job = self.get_job(job_id)
+            if job is None:
+                return None
+            status = (job.get("Status") or "").upper()
+            if status in IMPACT_JOB_FINAL_STATUSES:
+                logger.info(f"Batch job {job_id} finished with status {status}")
+                return job
+            time_module.sleep(poll_interval)
+
+        logger.error(f"Batch job {job_id} did not finish within {timeout}s")
+        return None
+
+    def download_job_results(self, job_id):
+        """
+        Download the per-row result file of a finished job.
+        Returns {action_id: (succeeded, message)}.
+        """
+        url = BASE_URL + self.username + "/Jobs/" + str(job_id) + "/Download"
+        try:
+            response = self.send(READ, "GET", url)
+            if response.status_code != 200:
+                logger.error(f"Error {response.status_code}: {response.text}")
+                return {}
+        except requests.RequestException as e:
+            logger.error(f"Error downloading results of job {job_id}: {e}")
+            return {}
+
+        results = {}
+        for record in csv.DictReader(io.StringIO(response.text)):
+            action_id = record.get("ActionId") or record.get("Action Id")
+            status = (record.get("Status") or record.get("Result") or "").strip().upper()
+            message = record.get("Message") or record.get("Error") or ""
+            if action_id:
+                results[action_id] = (status in ("SUCCESS", "SUCCEEDED", "OK", "PROCESSED"), message)
+        return results
+
+    def modify_actions_batch(self, rows, batch_size=IMPACT_BATCH_SIZE):
+        """
+        Submit ORDER_UPDATE / ITEM_RETURNED / OTHER modifications as batch uploads of
+        up to `batch_size` rows, wait for each job and map the per-row outcome back.
+        Returns {action_id: (succeeded, message)}; rows of a failed upload are all failed.
+        """
+        results = {}
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start:start + batch_size]
+            job_id = self.submit_action_batch(chunk)
+            job = self.wait_for_job(job_id) if job_id else None
+            if job is None or (job.get("Status") or "").upper() != "COMPLETED":
+                message = f"Batch job {job_id} failed" if job_id else "Batch upload failed"
+                results.update({row["action_id"]: (False, message) for row in chunk})
+                continue
+
+            job_results = self.download_job_results(job_id)
+            for row in chunk:
+                results[row["action_id"]] = job_results.get(row["action_id"], (False, "Missing from job results"))
+        return results
+
 
 if __name__=="__main__":
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
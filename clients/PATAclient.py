@@ -1,6 +1,7 @@
 import requests
 
-from constants.Constants import PATA_BASE_URL
+from clients.HttpSession import get_shared_session
+from constants.Constants import PATA_BASE_URL, HTTP_TIMEOUT
 from helpers.PATARules import PATARules
 from helpers.logger import get_logger
 from utils.OrderMiiUUID import OrderMiiUUID
@@ -8,21 +9,35 @@ from utils.OrderMiiUUID import OrderMiiUUID
 logger = get_logger(__name__)
 
 class PATAClient():
+    def __init__(self, session=None, cache=None):
+        # Keep-alive pool shared with ImpactClient, reused across markets and runs
+        self.session = session or get_shared_session()
+        # Optional OrderCache; orders are cached by their OrderMiiUUID string
+        self.cache = cache
 
     def retrieve_order(self,market,order_id):
         market = market.lower()
         url=PATA_BASE_URL + market+ "/order/" + order_id
+        if self.cache is not None:
+            order = self.cache.get(order_id)
+            if order is not None:
+                logger.info(f"Order {str(order_id)} served from cache")
+                return order
         logger.info(f"Retrieving order {str(order_id)}")
         try:
-            response = requests.get(
+            response = self.session.get(
                 url,
-                headers={"Accept": "application/json"}
+                headers={"Accept": "application/json"},
+                timeout=HTTP_TIMEOUT
             )
             if response.status_code != 200:
                 logger.error(f"Error {response.status_code}: {response.text}")
                 return None
 
-            return response.json()
+            order = response.json()
+            if self.cache is not None and order:
+                self.cache.put(order_id, order)
+            return order
 
         except requests.RequestException as e:
             logger.error(f"Error fetching order {str(order_id)}: {e}")
@@ -1,3 +1,5 @@
+import os
+
 BASE_URL = "https://api.impact.com/Advertisers/"
 PATA_BASE_URL= "https://api-process-automation-api.miinto.net/v1/"
 
@@ -22,5 +24,104 @@ VAT = {
     "PL": 23
 }
 
+# Shared HTTP connection pool (overridable from config.json: http_pool_connections, http_pool_maxsize, ...)
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 32
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_RETRY_STATUSES = (500, 502, 503, 504)
+# Methods also retried after a read error / retry status. A write (PUT/DELETE/POST) may already have reached
+# Impact when its response fails, so writes are only retried when the connection could not be opened.
+HTTP_RETRY_METHODS = frozenset(["GET"])
+HTTP_TIMEOUT = 60
+
+# Concurrent page fetches per get_actions call (config.json: impact_page_workers)
+IMPACT_PAGE_WORKERS = 4
+
+# Action pages decoded into slim records / parsed as a stream with ijson
+# (config.json: impact_action_projection, impact_streaming_json)
+IMPACT_ACTION_PROJECTION = True
+IMPACT_STREAMING_JSON = False
+
+# Date-range sharding: days per shard, shards fetched at once and retries of a failed shard
+# (config.json: date_shard, shard_workers, shard_retries)
+DATE_SHARD_SIZES = {"day": 1, "week": 7}
+DATE_SHARD = None
+SHARD_WORKERS = 4
+SHARD_RETRIES = 2
+
+# Parallel PATA order lookups per market (config.json: pata_concurrency_<market> or pata_concurrency)
+PATA_CONCURRENCY = 8
+
+# Staged action pipeline (config.json: pipeline_queue_size, pipeline_max_in_flight, pipeline_decide_workers,
+# impact_write_concurrency_<market> or impact_write_concurrency, pipeline_report_every in seconds)
+PIPELINE_QUEUE_SIZE = 256
+PIPELINE_MAX_IN_FLIGHT = 2000
+PIPELINE_DECIDE_WORKERS = 1
+IMPACT_WRITE_CONCURRENCY = 4
+PIPELINE_REPORT_EVERY = 30
+
+# Markets processed at once by a run, and the pipeline threads all of them may use together
+# (config.json: market_workers, worker_budget)
+MARKET_WORKERS = 4
+WORKER_BUDGET = 48
+
+# Async clients: aiohttp connector pool and max requests in flight per event loop
+ASYNC_CONNECTOR_LIMIT = 1000
+ASYNC_CONNECTOR_LIMIT_PER_HOST = 200
+ASYNC_MAX_IN_FLIGHT = 500
+
+# Impact rate limits per account SID, in requests/second (config.json: impact_read_rate, impact_write_rate)
+IMPACT_READ_RATE = 10
+IMPACT_WRITE_RATE = 5
+IMPACT_MIN_RATE_FACTOR = 0.1
+IMPACT_DEFAULT_RETRY_AFTER = 5
+IMPACT_THROTTLE_RETRIES = 5
+
+# Batch action modifications (config.json: impact_write_mode / impact_write_mode_<market> = "single" | "batch")
+IMPACT_ACTION_BATCH_PATH = "/Actions/Batch"
+IMPACT_BATCH_SIZE = 5000
+IMPACT_BATCH_POLL_INTERVAL = 10
+IMPACT_BATCH_TIMEOUT = 1800
+IMPACT_JOB_FINAL_STATUSES = ("COMPLETED", "FAILED", "CANCELLED")
+
+# Local state (watermarks, checkpoints, ledgers, caches); override with ORDER_SYNC_STATE_DIR
+STATE_DIR = os.getenv("ORDER_SYNC_STATE_DIR", "/tmp/order-status-sync")
+
+# Checkpoint rows buffered before each SQLite commit
+CHECKPOINT_FLUSH_EVERY = 100
+
+# Bot run job queue (config.json: job_queue backend, job_queue_path, job_lease_seconds, job_poll_interval,
+# embedded_worker: also claim jobs inside the web process)
+JOB_QUEUE_BACKEND = "sqlite"
+JOB_LEASE_SECONDS = 120
+JOB_HEARTBEAT_SECONDS = 5
+JOB_POLL_INTERVAL = 2
+EMBEDDED_WORKER = True
+
+# Concurrent jobs per worker, and finished runs kept in the run registry / job queue
+# (config.json: worker_jobs, run_retention)
+WORKER_JOBS = 2
+RUN_RETENTION = 50
+
+# Run progress events: actions between progress counters, and how often the SSE stream polls for new events
+# (config.json: progress_every, sse_poll_interval, sse_keepalive in seconds)
+PROGRESS_EVERY = 250
+SSE_POLL_INTERVAL = 1
+SSE_KEEPALIVE = 15
+# Open SSE streams per web process; each holds a gunicorn thread, so keep it below --threads
+# (config.json: sse_max_streams). Beyond it the stream answers 503 and the dashboard polls instead.
+SSE_MAX_STREAMS = 4
+
+# Not processed actions carried by a job's heartbeat status; the full list is published when the job completes
+JOB_HEARTBEAT_NOT_PROCESSED = 100
 
+# PATA order cache (config.json: pata_cache_max_entries, pata_cache_disk, pata_cache_ttl_*), TTLs in seconds
+ORDER_CACHE_MAX_ENTRIES = 20000
+ORDER_CACHE_TTL_PENDING = 15 * 60
+ORDER_CACHE_TTL_DEFAULT = 6 * 60 * 60
+ORDER_CACHE_TTL_TERMINAL = 7 * 24 * 60 * 60
+ORDER_TERMINAL_STATUSES = ("rejected", "sent", "returned")
 
+# Memoized order decisions (config.json: decision_memo_max_entries, decision_memo_disk)
+DECISION_MEMO_MAX_ENTRIES = 50000
@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from constants.Constants import STATE_DIR
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ActionLedger:
+    """
+    Persistent ledger of Impact modifications already applied (action ID, reason, amount),
+    checked before every write so reruns over overlapping windows don't resend them.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(STATE_DIR, "ledger.sqlite")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS applied_modifications (
+                action_id TEXT PRIMARY KEY,
+                reason TEXT NOT NULL,
+                amount REAL NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def _amount(amount):
+        return round(float(amount or 0), 2)
+
+    def is_applied(self, action_id, reason, amount):
+        """True when exactly this modification (same reason and amount) was already applied."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT reason, amount FROM applied_modifications WHERE action_id = ?", (str(action_id),)
+            ).fetchone()
+        return row is not None and row[0] == reason and row[1] == self._amount(amount)
+
+    def record(self, action_id, reason, amount):
+        """Remember a modification Impact accepted; replaces any older entry of the action."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO applied_modifications (action_id, reason, amount, applied_at) "
+                "VALUES (?, ?, ?, ?)",
+                (str(action_id), reason, self._amount(amount), datetime.now(timezone.utc).isoformat()),
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
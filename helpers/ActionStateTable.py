@@ -0,0 +1,99 @@
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Every state an action can end up in (stats / actions_by_state keys)
+STATES = ("OTHER", "ITEM_RETURNED", "ORDER_UPDATE", "Not_Modified", "Not_Processed", "Already_Applied", "Planned",
+          "NONE")
+
+
+class ActionRecord:
+    """One action of a run. Reads like the {"orderId", "amount", "reason"} entries of actions_by_state."""
+
+    __slots__ = ("action_id", "order_id", "action_date", "state", "amount", "reason")
+
+    _FIELDS = {"orderId": "order_id", "amount": "amount", "reason": "reason"}
+
+    def __init__(self, action_id, order_id, action_date=None):
+        self.action_id = action_id
+        self.order_id = order_id
+        self.action_date = action_date
+        self.state = None
+        self.amount = None
+        self.reason = None
+
+    def get(self, key, default=None):
+        field = self._FIELDS.get(key)
+        return getattr(self, field) if field else default
+
+    def __getitem__(self, key):
+        return getattr(self, self._FIELDS[key])
+
+    def to_dict(self):
+        return {"orderId": self.order_id, "amount": self.amount, "reason": self.reason}
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class ActionStateTable:
+    """
+    Per-run table of ActionRecords indexed by action ID and by state.
+    Each state index is an insertion-ordered dict of action IDs, so moving an action
+    between states, counting a state and listing it are all O(1) per action.
+    """
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_state = {state: {} for state in STATES}
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, action_id):
+        return action_id in self.by_id
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def add(self, action_id, order_id, action_date=None):
+        """Register an action as seen (no state yet); returns its record."""
+        record = self.by_id.get(action_id)
+        if record is None:
+            record = ActionRecord(action_id, order_id, action_date)
+            self.by_id[action_id] = record
+        return record
+
+    def set(self, action_id, state, order_id=None, amount=None, reason=None):
+        """Put an action into `state`, moving it out of the state it was in."""
+        record = self.by_id.get(action_id) or self.add(action_id, order_id)
+        if record.state is not None:
+            self.by_state[record.state].pop(action_id, None)
+        record.state = state
+        if order_id is not None:
+            record.order_id = order_id
+        record.amount = amount
+        record.reason = reason
+        self.by_state.setdefault(state, {})[action_id] = record
+        return record
+
+    def finalize(self):
+        """Actions that never got a state did not need a modification: mark them Not_Modified."""
+        for action_id, record in self.by_id.items():
+            if record.state is None:
+                self.set(action_id, "Not_Modified", amount=None, reason="Not Modified")
+
+    def count(self, state):
+        return len(self.by_state.get(state, ()))
+
+    def records(self, state):
+        return list(self.by_state.get(state, {}).values())
+
+    def stats(self):
+        stats = {"total_actions": len(self.by_id)}
+        stats.update({state: len(index) for state, index in self.by_state.items()})
+        return stats
+
+    def actions_by_state(self):
+        """{state: [records]} in the shape of the classic actions_by_state dict (records read like its entries)."""
+        return {state: list(index.values()) for state, index in self.by_state.items()}
@@ -0,0 +1,145 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from constants.Constants import STATE_DIR, CHECKPOINT_FLUSH_EVERY
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+# States that must be retried on resume
+RETRY_STATES = ("Not_Processed",)
+
+
+class CheckpointStore:
+    """
+    SQLite file recording each action's outcome per (run_id, campaign_id, action_id),
+    plus the parameters of every run so an interrupted run can be resumed as it was started.
+    """
+
+    def __init__(self, path=None, flush_every=CHECKPOINT_FLUSH_EVERY):
+        self.path = path or os.path.join(STATE_DIR, "checkpoints.sqlite")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.pending = []
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                run_id TEXT NOT NULL,
+                campaign_id TEXT NOT NULL,
+                action_id TEXT NOT NULL,
+                state TEXT NOT NULL,
+                order_id TEXT,
+                amount REAL,
+                reason TEXT,
+                not_processed TEXT,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, campaign_id, action_id)
+            );
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc).isoformat()
+
+    # ---- runs ----
+
+    def start_run(self, run_id, params):
+        """Register a run and the parameters it was started with (dates, markets, flags)."""
+        now = self._now()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO runs (run_id, params, status, created_at, updated_at) VALUES (?, ?, 'running', ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET status = 'running', updated_at = excluded.updated_at",
+                (run_id, json.dumps(params), now, now),
+            )
+            self.conn.commit()
+
+    def finish_run(self, run_id, status="finished"):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?", (status, self._now(), run_id)
+            )
+            self.conn.commit()
+
+    def last_unfinished_run(self, skip=()):
+        """
+        Return (run_id, params) of the most recent run that never finished, or None.
+        Runs in `skip` (e.g. still executing) are left out.
+        """
+        skip = list(skip)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT run_id, params FROM runs WHERE status = 'running' "
+                f"AND run_id NOT IN ({','.join('?' * len(skip))}) ORDER BY created_at DESC LIMIT 1",
+                skip,
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    # ---- per-action outcomes ----
+
+    def record(self, run_id, campaign_id, action_id, outcome):
+        """Buffer an action's Outcome; written every `flush_every` records and on flush()."""
+        with self.lock:
+            self.pending.append((
+                run_id, str(campaign_id), str(action_id), outcome.state,
+                None if outcome.order_id is None else str(outcome.order_id),
+                outcome.amount, outcome.reason,
+                json.dumps(outcome.not_processed) if outcome.not_processed else None,
+                self._now(),
+            ))
+            if len(self.pending) >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self.pending:
+            return
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO checkpoints "
+            "(run_id, campaign_id, action_id, state, order_id, amount, reason, not_processed, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self.pending,
+        )
+        self.conn.commit()
+        self.pending = []
+
+    def completed(self, run_id, campaign_id):
+        """
+        Return {action_id: (state, order_id, amount, reason, not_processed)} for the actions
+        of a campaign that already completed in this run (Not_Processed ones are retried).
+        """
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT action_id, state, order_id, amount, reason, not_processed FROM checkpoints "
+                f"WHERE run_id = ? AND campaign_id = ? AND state NOT IN ({','.join('?' * len(RETRY_STATES))})",
+                (run_id, str(campaign_id), *RETRY_STATES),
+            ).fetchall()
+        return {
+            action_id: (state, int(order_id) if order_id and order_id.isdigit() else order_id, amount, reason,
+                        json.loads(not_processed) if not_processed else None)
+            for action_id, state, order_id, amount, reason, not_processed in rows
+        }
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from constants.Constants import STATE_DIR, DECISION_MEMO_MAX_ENTRIES, CHECKPOINT_FLUSH_EVERY, VAT
+from helpers.PATARules import PATARules
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def order_fingerprint(market, order, rules_version):
+    """
+    Hash of everything the decision depends on: voucher code, position status/amount/price,
+    internal notes, the market (VAT rate), the rule set version and the fraud keywords.
+    """
+    data = order.get("data") or {}
+    voucher = (data.get("voucher") or {}).get("code")
+    positions = [
+        (p.get("status"), p.get("amount"), (p.get("price") or {}).get("amount"))
+        for p in data.get("positions") or []
+    ]
+    notes = [
+        note.get("message")
+        for note in data.get("history") or []
+        if (note.get("type") or "").lower() == "internal note"
+    ]
+    content = [
+        market, VAT.get(market), rules_version, PATARules.FRAUD_KEYWORDS,
+        str(voucher).strip() if voucher else "", positions, notes,
+    ]
+    return hashlib.sha256(json.dumps(content, default=str).encode()).hexdigest()
+
+
+class DecisionMemo:
+    """
+    Final (reason, amount_without_vat) per order, stored with the fingerprint of the order content
+    it was computed from. An in-process LRU (bounded to `max_entries`) sits in front of an optional
+    SQLite file so unchanged orders are not re-evaluated on the next run.
+    Orders whose fingerprint differs from the stored one are reported per market as changed.
+    """
+
+    def __init__(self, max_entries=DECISION_MEMO_MAX_ENTRIES, disk_path=None, flush_every=CHECKPOINT_FLUSH_EVERY):
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.pending = []
+        self.changed = {}
+        self.hits = 0
+        self.misses = 0
+
+        self.disk = None
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+            self.disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self.disk.execute("PRAGMA journal_mode=WAL")
+            self.disk.execute(
+                "CREATE TABLE IF NOT EXISTS decisions (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                "reason TEXT, amount REAL, updated_at TEXT NOT NULL)"
+            )
+            self.disk.commit()
+
+    def get(self, market, key, fingerprint):
+        """Return the memoized decision when `key` was decided from the same content, else None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None and self.disk is not None:
+                row = self.disk.execute(
+                    "SELECT fingerprint, reason, amount FROM decisions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], (row[1], row[2]))
+                    self._remember(key, entry)
+
+            if entry is not None and entry[0] == fingerprint:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry is not None:
+                self.changed.setdefault(market, []).append(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, fingerprint, decision):
+        with self.lock:
+            self._remember(key, (fingerprint, tuple(decision)))
+            if self.disk is not None:
+                self.pending.append((key, fingerprint, decision[0], decision[1], datetime.now(timezone.utc).isoformat()))
+                if len(self.pending) >= self.flush_every:
+                    self._flush_locked()
+
+    def take_changed(self, market):
+        """Return and clear the keys of the market's orders that changed since they were last decided."""
+        with self.lock:
+            return self.changed.pop(market, [])
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self.pending:
+            return
+        self.disk.executemany(
+            "INSERT OR REPLACE INTO decisions (key, fingerprint, reason, amount, updated_at) VALUES (?, ?, ?, ?, ?)",
+            self.pending,
+        )
+        self.disk.commit()
+        self.pending = []
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+_shared_memo = None
+_shared_memo_lock = threading.Lock()
+
+
+def get_decision_memo(config=None):
+    """
+    Return the process-wide DecisionMemo, created from config on first use:
+    decision_memo_max_entries, decision_memo_disk (bool, default true).
+    """
+    global _shared_memo
+    with _shared_memo_lock:
+        if _shared_memo is None:
+            config = config or {}
+            disk_path = os.path.join(STATE_DIR, "decisions.sqlite") if config.get("decision_memo_disk", True) else None
+            _shared_memo = DecisionMemo(
+                max_entries=int(config.get("decision_memo_max_entries", DECISION_MEMO_MAX_ENTRIES)),
+                disk_path=disk_path,
+            )
+        return _shared_memo
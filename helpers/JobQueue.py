@@ -0,0 +1,335 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone, timedelta
+
+from constants.Constants import STATE_DIR, JOB_QUEUE_BACKEND, JOB_LEASE_SECONDS, RUN_RETENTION
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Job states; "queued" and "running" jobs are active
+QUEUED, RUNNING, FINISHED, ERROR = "queued", "running", "finished", "error"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+class MarketsBusyError(Exception):
+    """Raised by enqueue when an active job already covers one of the requested markets."""
+
+    def __init__(self, jobs, markets):
+        super().__init__(f"Market(s) {sorted(markets)} already in run(s) {jobs}")
+        self.jobs = jobs
+        self.markets = markets
+
+
+def overlapping_markets(markets, other):
+    """Markets two jobs have in common; an empty market list stands for all markets."""
+    if not markets or not other:
+        return set(markets or other or ["*"])
+    return set(markets) & set(other)
+
+
+class JobQueue(ABC):
+    """
+    Durable queue of bot runs shared by the web processes (which enqueue and read status)
+    and any number of worker processes (which claim, run and report).
+
+    Jobs are dicts: job_id, kind ("run" / "apply_plan"), params, state, worker,
+    status (the run's latest published status dict), created_at, updated_at.
+    A running job whose worker stops heartbeating for `lease_seconds` is handed
+    back to the queue, to be resumed by another worker. Jobs for disjoint markets
+    may be active at the same time; finished jobs beyond the retention are pruned.
+    Backends implement the methods below; SQLiteJobQueue is the local one.
+    """
+
+    @abstractmethod
+    def enqueue(self, kind, params, job_id=None):
+        """
+        Queue a job. Jobs for disjoint markets (params["markets"]) run concurrently; a job whose
+        markets overlap an active job, or whose job_id is an active job's, is refused with MarketsBusyError.
+        A finished job_id is queued again (resume).
+        """
+
+    @abstractmethod
+    def claim(self, worker_id):
+        """Atomically take the oldest queued job for `worker_id`; None when the queue is empty."""
+
+    @abstractmethod
+    def heartbeat(self, job_id, worker_id, status=None):
+        """
+        Extend the worker's lease on the job and publish its current status.
+        Returns False when the worker no longer owns the job (lease expired and re-queued): it must stop.
+        """
+
+    @abstractmethod
+    def complete(self, job_id, worker_id, state, status=None):
+        """Finish the worker's job with `state`; False (nothing written) when it no longer owns the job."""
+
+    @abstractmethod
+    def get(self, job_id):
+        """Job dict by ID, or None."""
+
+    @abstractmethod
+    def latest(self):
+        """Most recently created job, or None."""
+
+    @abstractmethod
+    def active(self):
+        """Queued and running jobs, oldest first."""
+
+    @abstractmethod
+    def requeue_expired(self):
+        """Put running jobs whose lease expired back into the queue; returns their IDs."""
+
+    @abstractmethod
+    def prune(self, keep):
+        """Delete finished jobs (and their events) beyond the `keep` most recent ones."""
+
+    @abstractmethod
+    def publish_event(self, job_id, event, data):
+        """Append a progress event (name + JSON data) to the job's event log."""
+
+    @abstractmethod
+    def events(self, job_id, after=0):
+        """Events of a job with an ID greater than `after`, as (id, event, data) tuples in order."""
+
+
+class SQLiteJobQueue(JobQueue):
+    """JobQueue in a SQLite file (WAL); claims run in IMMEDIATE transactions so they are atomic across processes."""
+
+    def __init__(self, path=None, lease_seconds=JOB_LEASE_SECONDS, retention=RUN_RETENTION):
+        self.path = path or os.path.join(STATE_DIR, "jobs.sqlite")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.retention = retention
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                state TEXT NOT NULL,
+                worker TEXT,
+                status TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_until TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at)")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                event TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, id)")
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc)
+
+    def _lease(self):
+        return (self._now() + timedelta(seconds=self.lease_seconds)).isoformat()
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        job_id, kind, params, state, worker, status, attempts, created_at, updated_at = row
+        return {
+            "job_id": job_id, "kind": kind, "params": json.loads(params), "state": state, "worker": worker,
+            "status": json.loads(status) if status else None, "attempts": attempts,
+            "created_at": created_at, "updated_at": updated_at,
+        }
+
+    _COLUMNS = "job_id, kind, params, state, worker, status, attempts, created_at, updated_at"
+
+    def _transaction(self):
+        """BEGIN IMMEDIATE: takes the write lock up front, so check-then-write is atomic across processes."""
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def enqueue(self, kind, params, job_id=None):
+        job_id = job_id or str(uuid.uuid4())
+        now = self._now().isoformat()
+        with self.lock:
+            self._transaction()
+            try:
+                busy, jobs = set(), []
+                for other_id, other_params in self.conn.execute(
+                        "SELECT job_id, params FROM jobs WHERE state IN (?, ?)", ACTIVE_STATES):
+                    overlap = overlapping_markets(params.get("markets"), json.loads(other_params).get("markets"))
+                    # A job with the same ID still queued or running (e.g. a live run being resumed) is refused too
+                    if overlap or other_id == job_id:
+                        busy |= overlap or set(params.get("markets") or [])
+                        jobs.append(other_id)
+                if jobs:
+                    raise MarketsBusyError(jobs, busy)
+                self.conn.execute(
+                    "INSERT INTO jobs (job_id, kind, params, state, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(job_id) DO UPDATE SET kind = excluded.kind, params = excluded.params, "
+                    "state = excluded.state, worker = NULL, lease_until = NULL, status = NULL, "
+                    "created_at = excluded.created_at, updated_at = excluded.updated_at",
+                    (job_id, kind, json.dumps(params), QUEUED, now, now),
+                )
+                # A re-queued run (resume) starts a fresh event log
+                self.conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        logger.info(f"Job {job_id} ({kind}) queued")
+        return job_id
+
+    def claim(self, worker_id):
+        with self.lock:
+            self._transaction()
+            try:
+                row = self.conn.execute(
+                    f"SELECT {self._COLUMNS} FROM jobs WHERE state = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute(
+                        "UPDATE jobs SET state = ?, worker = ?, attempts = attempts + 1, lease_until = ?, "
+                        "updated_at = ? WHERE job_id = ?",
+                        (RUNNING, worker_id, self._lease(), self._now().isoformat(), row[0]),
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        job = self._row(row)
+        if job is not None:
+            job.update(state=RUNNING, worker=worker_id, attempts=job["attempts"] + 1)
+            logger.info(f"Job {job['job_id']} claimed by {worker_id}")
+        return job
+
+    def heartbeat(self, job_id, worker_id, status=None):
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET lease_until = ?, status = COALESCE(?, status), updated_at = ? "
+                "WHERE job_id = ? AND worker = ? AND state = ?",
+                (self._lease(), json.dumps(status) if status is not None else None, self._now().isoformat(),
+                 job_id, worker_id, RUNNING),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, state, status=None):
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = ?, status = COALESCE(?, status), lease_until = NULL, updated_at = ? "
+                "WHERE job_id = ? AND worker = ? AND state = ?",
+                (state, json.dumps(status) if status is not None else None, self._now().isoformat(),
+                 job_id, worker_id, RUNNING),
+            )
+        if cursor.rowcount != 1:
+            logger.warning(f"Job {job_id}: {worker_id} no longer owns it, {state} not recorded")
+            return False
+        logger.info(f"Job {job_id} {state}")
+        self.prune(self.retention)
+        return True
+
+    def get(self, job_id):
+        with self.lock:
+            return self._row(self.conn.execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone())
+
+    def latest(self):
+        with self.lock:
+            return self._row(self.conn.execute(
+                f"SELECT {self._COLUMNS} FROM jobs ORDER BY created_at DESC LIMIT 1"
+            ).fetchone())
+
+    def active(self):
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE state IN (?, ?) ORDER BY created_at", ACTIVE_STATES
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def requeue_expired(self):
+        now = self._now().isoformat()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT job_id FROM jobs WHERE state = ? AND lease_until < ?", (RUNNING, now)
+            ).fetchall()
+            for (job_id,) in rows:
+                self.conn.execute(
+                    "UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL, updated_at = ? "
+                    "WHERE job_id = ? AND state = ? AND lease_until < ?",
+                    (QUEUED, now, job_id, RUNNING, now),
+                )
+        if rows:
+            logger.warning(f"Lease expired, re-queued job(s): {[job_id for (job_id,) in rows]}")
+        return [job_id for (job_id,) in rows]
+
+    def prune(self, keep):
+        with self.lock:
+            cursor = self.conn.execute(
+                "DELETE FROM jobs WHERE state NOT IN (?, ?) AND job_id NOT IN ("
+                "SELECT job_id FROM jobs WHERE state NOT IN (?, ?) ORDER BY created_at DESC LIMIT ?)",
+                (*ACTIVE_STATES, *ACTIVE_STATES, max(0, int(keep))),
+            )
+            if cursor.rowcount:
+                self.conn.execute("DELETE FROM job_events WHERE job_id NOT IN (SELECT job_id FROM jobs)")
+        if cursor.rowcount:
+            logger.info(f"Pruned {cursor.rowcount} finished job(s)")
+        return cursor.rowcount
+
+    def publish_event(self, job_id, event, data):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO job_events (job_id, event, data, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, event, json.dumps(data, default=str), self._now().isoformat()),
+            )
+
+    def events(self, job_id, after=0):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, event, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id", (job_id, after)
+            ).fetchall()
+        return [(event_id, event, json.loads(data)) for event_id, event, data in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+# Queue backends by config.json `job_queue`; other backends (e.g. a shared database) register here
+JOB_QUEUE_BACKENDS = {"sqlite": SQLiteJobQueue}
+
+_shared_queue = None
+_shared_queue_lock = threading.Lock()
+
+
+def get_job_queue(config=None):
+    """
+    Return the process-wide JobQueue, created from config on first use:
+    job_queue (backend name, default sqlite), job_queue_path, job_lease_seconds, run_retention.
+    """
+    global _shared_queue
+    with _shared_queue_lock:
+        if _shared_queue is None:
+            config = config or {}
+            backend = config.get("job_queue", JOB_QUEUE_BACKEND)
+            if backend not in JOB_QUEUE_BACKENDS:
+                raise ValueError(f"Unknown job queue backend: {backend}")
+            _shared_queue = JOB_QUEUE_BACKENDS[backend](
+                path=config.get("job_queue_path"),
+                lease_seconds=int(config.get("job_lease_seconds", JOB_LEASE_SECONDS)),
+                retention=int(config.get("run_retention", RUN_RETENTION)),
+            )
+        return _shared_queue
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from constants.Constants import MARKET_WORKERS, WORKER_BUDGET
+from helpers.Pipeline import PipelineCancelled
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def market_workers(config, count):
+    """How many of `count` markets run at once (config.json: market_workers)."""
+    return max(1, min(int(config.get("market_workers", MARKET_WORKERS)), count))
+
+
+def worker_share(config, workers):
+    """
+    Pipeline threads each of `workers` concurrent markets may use, so that all markets together
+    stay within the global worker budget (config.json: worker_budget).
+    """
+    return max(2, int(config.get("worker_budget", WORKER_BUDGET)) // max(1, workers))
+
+
+def run_markets(markets, process, workers=MARKET_WORKERS, on_start=None, on_result=None, on_error=None,
+                cancel=None):
+    """
+    Run process(market) for every market on up to `workers` threads.
+
+    Markets are isolated: one that raises is handed to on_error(market, exc) and the others go on.
+    on_start(market) is called on the market's thread before it is processed, on_result(market, result)
+    as soon as it completes, so callers can publish progress market by market.
+    Once cancel (a threading.Event) is set, markets that have not started yet fail with PipelineCancelled.
+    Returns {market: result} of the markets that succeeded.
+    """
+    results = {}
+
+    def run(market):
+        if cancel is not None and cancel.is_set():
+            raise PipelineCancelled(f"Market {market} not started: run cancelled")
+        if on_start is not None:
+            on_start(market)
+        return process(market)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(markets) or 1)),
+                            thread_name_prefix="market") as executor:
+        futures = {executor.submit(run, market): market for market in markets}
+        for future in as_completed(futures):
+            market = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.exception(f"Error processing market {market}: {e}")
+                if on_error is not None:
+                    on_error(market, e)
+                continue
+            results[market] = result
+            if on_result is not None:
+                on_result(market, result)
+    return results
@@ -0,0 +1,126 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from constants.Constants import (
+    STATE_DIR,
+    ORDER_CACHE_MAX_ENTRIES,
+    ORDER_CACHE_TTL_PENDING,
+    ORDER_CACHE_TTL_DEFAULT,
+    ORDER_CACHE_TTL_TERMINAL,
+    ORDER_TERMINAL_STATUSES,
+)
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class OrderCache:
+    """
+    Two-tier cache of PATA order responses keyed by the OrderMiiUUID string:
+    an in-process LRU (bounded to `max_entries`) in front of an optional SQLite file.
+    The TTL of an entry depends on the order's position states (see ttl_for).
+    """
+
+    def __init__(self, max_entries=ORDER_CACHE_MAX_ENTRIES, disk_path=None,
+                 ttl_pending=ORDER_CACHE_TTL_PENDING, ttl_default=ORDER_CACHE_TTL_DEFAULT,
+                 ttl_terminal=ORDER_CACHE_TTL_TERMINAL):
+        self.max_entries = max_entries
+        self.ttl_pending = ttl_pending
+        self.ttl_default = ttl_default
+        self.ttl_terminal = ttl_terminal
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.disk = None
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+            self.disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self.disk.execute("PRAGMA journal_mode=WAL")
+            self.disk.execute(
+                "CREATE TABLE IF NOT EXISTS orders (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, body TEXT NOT NULL)"
+            )
+            self.disk.commit()
+
+    def ttl_for(self, order):
+        """
+        Short TTL while any position is pending, long TTL once every position is in a
+        terminal state (rejected/sent/returned), default otherwise.
+        """
+        positions = (order.get("data") or {}).get("positions") or []
+        statuses = [(p.get("status") or "").strip().lower() for p in positions]
+        if any(status == "pending" for status in statuses):
+            return self.ttl_pending
+        if statuses and all(status in ORDER_TERMINAL_STATUSES for status in statuses):
+            return self.ttl_terminal
+        return self.ttl_default
+
+    def get(self, key):
+        """Return the cached order for `key`, or None when missing or expired."""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, order = entry
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return order
+                del self.entries[key]
+
+            if self.disk is not None:
+                row = self.disk.execute("SELECT expires_at, body FROM orders WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] > now:
+                    order = json.loads(row[1])
+                    self._remember(key, row[0], order)
+                    self.hits += 1
+                    return order
+
+            self.misses += 1
+            return None
+
+    def put(self, key, order):
+        expires_at = time.time() + self.ttl_for(order)
+        with self.lock:
+            self._remember(key, expires_at, order)
+            if self.disk is not None:
+                self.disk.execute(
+                    "INSERT OR REPLACE INTO orders (key, expires_at, body) VALUES (?, ?, ?)",
+                    (key, expires_at, json.dumps(order)),
+                )
+                self.disk.commit()
+
+    def _remember(self, key, expires_at, order):
+        self.entries[key] = (expires_at, order)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_order_cache(config=None):
+    """
+    Return the process-wide OrderCache, created from config on first use:
+    pata_cache_max_entries, pata_cache_disk (bool), pata_cache_ttl_pending/_default/_terminal (seconds).
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            config = config or {}
+            disk_path = os.path.join(STATE_DIR, "orders.sqlite") if config.get("pata_cache_disk") else None
+            _shared_cache = OrderCache(
+                max_entries=int(config.get("pata_cache_max_entries", ORDER_CACHE_MAX_ENTRIES)),
+                disk_path=disk_path,
+                ttl_pending=float(config.get("pata_cache_ttl_pending", ORDER_CACHE_TTL_PENDING)),
+                ttl_default=float(config.get("pata_cache_ttl_default", ORDER_CACHE_TTL_DEFAULT)),
+                ttl_terminal=float(config.get("pata_cache_ttl_terminal", ORDER_CACHE_TTL_TERMINAL)),
+            )
+        return _shared_cache
@@ -1,14 +1,58 @@
-from typing import Tuple, Optional
+import re
+from array import array
+from typing import Tuple, Optional, List, Iterable
+
+# Position classes used by evaluate / evaluate_many
+POSITION_KEPT = 0
+POSITION_RETURNED_OR_REJECTED = 1
+POSITION_PENDING = 2
+
 
 class PATARules:
-    FRAUD_KEYWORDS = [
+    DEFAULT_FRAUD_KEYWORDS = (
         "fraud risk",
         "fraud order",
         "do not refund",
         "do not issue refund",
         "declined rma process",
         "lost parcels process",
-    ]
+    )
+    FRAUD_KEYWORDS = list(DEFAULT_FRAUD_KEYWORDS)
+    # All keywords in one alternation, so each note is scanned once
+    _fraud_pattern = None
+
+    @staticmethod
+    def compile_fraud_keywords(keywords):
+        keywords = [str(k).strip().lower() for k in keywords if k and str(k).strip()]
+        return re.compile("|".join(re.escape(k) for k in keywords)) if keywords else None
+
+    @staticmethod
+    def configure_fraud_keywords(keywords=None):
+        """
+        Set the fraud keywords (config `fraud_keywords`, a list of phrases) and recompile the matcher.
+        None restores the defaults.
+        """
+        if keywords is None:
+            keywords = PATARules.DEFAULT_FRAUD_KEYWORDS
+        keywords = list(keywords)
+        pattern = PATARules.compile_fraud_keywords(keywords)
+        PATARules.FRAUD_KEYWORDS, PATARules._fraud_pattern = keywords, pattern
+
+    @staticmethod
+    def find_fraud_note(response: dict) -> Optional[str]:
+        """Return the first internal-note message (lowercased) matching a fraud keyword, or None."""
+        pattern = PATARules._fraud_pattern
+        if pattern is None:
+            return None
+        history = (response.get("data") or {}).get("history") or []
+        for note in history:
+            if (note.get("type") or "").lower() != "internal note":
+                continue
+            message = (note.get("message") or "").lower()
+            if pattern.search(message):
+                return message
+        return None
+
     @staticmethod
     def has_voucher_code(response: dict) -> bool:
         """
@@ -24,22 +68,11 @@ class PATARules:
         Scan order history for fraud-related messages.
         Returns True if found.
         """
-        data = response.get("data", {})
-        history = data.get("history", [])
-        if not history:
+        message = PATARules.find_fraud_note(response)
+        if message is None:
             return False
-
-        for note in history:
-            message = (note.get("message") or "").lower()
-            note_type = (note.get("type") or "").lower()
-            if note_type == "internal note":
-                for keyword in PATARules.FRAUD_KEYWORDS:
-                    if keyword in message:
-                        print(f"⚠️ Fraud/Do-Not-Refund detected: '{message}'")
-                        return True
-                    else:print(f"⚠️ Fraud not detected: '{message}'")
-
-        return False
+        print(f"⚠️ Fraud/Do-Not-Refund detected: '{message}'")
+        return True
 
     @staticmethod
     def calculate_action_reason_and_amount(response: dict) -> Tuple[Optional[str], Optional[int]]:
@@ -120,3 +153,90 @@ class PATARules:
         # 5) Fully processed (all sent, amount=1)
         print("Order fully processed, returning None")
         return None, None
+
+
+    # -----------------------------
+    # Batched evaluation
+    # -----------------------------
+    @staticmethod
+    def _to_int(v) -> int:
+        try:
+            return int(v)
+        except Exception:
+            return 0
+
+    @staticmethod
+    def classify_positions(positions: list) -> Tuple[array, array]:
+        """
+        Classify every position exactly once.
+        Returns (classes, prices): POSITION_* codes and price amounts (minor units) as compact arrays.
+        """
+        to_int = PATARules._to_int
+        classes = array("b")
+        prices = array("q")
+        for p in positions:
+            amt = to_int(p.get("amount", 0))
+            st = (p.get("status") or "").strip().lower()
+            if amt >= 1 and st == "pending":
+                classes.append(POSITION_PENDING)
+            elif (st == "rejected" and amt == 1) or (amt == 0 and st in ("accepted", "sent")):
+                classes.append(POSITION_RETURNED_OR_REJECTED)
+            else:
+                classes.append(POSITION_KEPT)
+            prices.append(to_int((p.get("price") or {}).get("amount", 0)))
+        return classes, prices
+
+    @staticmethod
+    def decide(classes: array, prices: array) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Reason and amount from classified positions, with the same outcome as
+        calculate_action_reason_and_amount (fraud/voucher are checked by the caller).
+        """
+        count = len(classes)
+        if count == 0:
+            return "OTHER", 0
+        if count == 1 and classes[0] == POSITION_PENDING:
+            return "OTHER", 0
+
+        # Pending in multi-position order treated as returned/rejected
+        returned = 0
+        total_unrefunded = 0
+        for cls, price in zip(classes, prices):
+            if cls == POSITION_KEPT:
+                total_unrefunded += price
+            else:
+                returned += 1
+
+        if returned == count:
+            return "ITEM_RETURNED", 0
+        if returned:
+            return "ORDER_UPDATE", total_unrefunded // 100
+        return None, None
+
+    @staticmethod
+    def evaluate(response: dict) -> Tuple[Optional[str], Optional[int]]:
+        """Quiet single-pass equivalent of calculate_action_reason_and_amount."""
+        order_data = response.get("data", {})
+        if PATARules.find_fraud_note(response) is not None:
+            return "OTHER", 0
+        if PATARules.has_voucher_code(order_data):
+            return "OTHER", 0
+        classes, prices = PATARules.classify_positions(order_data.get("positions") or [])
+        return PATARules.decide(classes, prices)
+
+    @staticmethod
+    def evaluate_many(responses: Iterable[dict]) -> Tuple[List[Optional[str]], List[Optional[int]]]:
+        """
+        Evaluate many PATA order responses.
+        Returns two columns (reasons, amounts) aligned with the input order.
+        """
+        reasons = []
+        amounts = []
+        for response in responses:
+            reason, amount = PATARules.evaluate(response)
+            reasons.append(reason)
+            amounts.append(amount)
+        return reasons, amounts
+
+
+PATARules.configure_fraud_keywords()
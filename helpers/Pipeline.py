@@ -0,0 +1,224 @@
+import queue
+import threading
+import time
+
+from constants.Constants import PIPELINE_QUEUE_SIZE, PIPELINE_MAX_IN_FLIGHT, PIPELINE_REPORT_EVERY
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+# End-of-stream marker passed down the queues, one per worker of the next stage
+_DONE = object()
+# How often blocked threads wake up to check whether the pipeline was stopped
+_POLL_SECONDS = 0.1
+
+
+class PipelineCancelled(Exception):
+    """Raised to the consumer when the pipeline's cancel event was set (e.g. the run lost its job lease)."""
+
+
+class Stage:
+    """One pipeline step: `workers` threads applying `fn(item) -> item` to items of a bounded input queue."""
+
+    def __init__(self, name, fn, workers=1, queue_size=PIPELINE_QUEUE_SIZE):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self.running = self.workers
+
+    def metrics(self, elapsed):
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "per_sec": round(self.processed / elapsed, 1) if elapsed > 0 else 0.0,
+            "busy_seconds": round(self.busy_seconds, 2),
+        }
+
+
+class Pipeline:
+    """
+    Runs items from `source` through `stages` on threads connected by bounded queues
+    and yields the last stage's results in source order (sequence numbers + reorder buffer).
+
+    At most `max_in_flight` items are between the source and the consumer at any time,
+    so memory stays flat however long the source is. An exception raised by the source
+    is re-raised to the consumer after the items read before it; an exception raised by
+    a stage stops the pipeline and is re-raised right away. Setting `cancel` (a threading.Event)
+    stops it too: no further item is read or processed and PipelineCancelled is raised.
+    """
+
+    def __init__(self, name, source, stages, max_in_flight=PIPELINE_MAX_IN_FLIGHT,
+                 report_every=PIPELINE_REPORT_EVERY, source_name="fetch", cancel=None):
+        self.name = name
+        self.source = source
+        self.stages = stages
+        self.source_name = source_name
+        self.in_flight = threading.Semaphore(max(1, int(max_in_flight)))
+        self.report_every = report_every
+        self.output = queue.Queue()
+        self.stop = threading.Event()
+        self.cancel = cancel
+        self.error = None
+        self.source_error = None
+        self.fetched = 0
+        self.fetch_seconds = 0.0
+        self.started = None
+
+    def _stopped(self):
+        if self.cancel is not None and self.cancel.is_set() and not self.stop.is_set():
+            if self.error is None:
+                self.error = PipelineCancelled(f"Pipeline {self.name} cancelled")
+            self.stop.set()
+        return self.stop.is_set()
+
+    def _put(self, q, item, stage=None):
+        while not self._stopped():
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+            except queue.Full:
+                continue
+            if stage is not None:
+                depth = q.qsize()
+                if depth > stage.max_queue_depth:
+                    stage.max_queue_depth = depth
+            return True
+        return False
+
+    def _get(self, q):
+        while not self._stopped():
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _next_input(self, index):
+        """Queue (and its stage, for depth metrics) feeding stage `index`; the output queue after the last one."""
+        if index < len(self.stages):
+            return self.stages[index].queue, self.stages[index]
+        return self.output, None
+
+    def _finish(self, index):
+        q, stage = self._next_input(index)
+        for _ in range(stage.workers if stage is not None else 1):
+            self._put(q, _DONE)
+
+    def _read_source(self):
+        q, stage = self._next_input(0)
+        seq = 0
+        try:
+            iterator = iter(self.source)
+            while not self._stopped():
+                started = time.monotonic()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    self.fetch_seconds += time.monotonic() - started
+                while not self.in_flight.acquire(timeout=_POLL_SECONDS):
+                    if self._stopped():
+                        return
+                if not self._put(q, (seq, item), stage):
+                    return
+                self.fetched += 1
+                seq += 1
+        except Exception as e:
+            self.source_error = e
+        self._finish(0)
+
+    def _work(self, index):
+        stage = self.stages[index]
+        next_queue, next_stage = self._next_input(index + 1)
+        while True:
+            entry = self._get(stage.queue)
+            if entry is _DONE or self._stopped():
+                break
+            seq, item = entry
+            started = time.monotonic()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                logger.error(f"Pipeline {self.name}: stage {stage.name} failed: {e}")
+                self.error = e
+                self.stop.set()
+                break
+            with stage.lock:
+                stage.processed += 1
+                stage.busy_seconds += time.monotonic() - started
+            if not self._put(next_queue, (seq, result), next_stage):
+                break
+        with stage.lock:
+            stage.running -= 1
+            last = stage.running == 0
+        if last:
+            self._finish(index + 1)
+
+    def metrics(self):
+        """Per-stage counters: items processed, current/max queue depth, items per second, busy time."""
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        metrics = {self.source_name: {
+            "workers": 1,
+            "processed": self.fetched,
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "per_sec": round(self.fetched / elapsed, 1) if elapsed > 0 else 0.0,
+            "busy_seconds": round(self.fetch_seconds, 2),
+        }}
+        for stage in self.stages:
+            metrics[stage.name] = stage.metrics(elapsed)
+        return metrics
+
+    def report(self):
+        summary = ", ".join(
+            f"{name}: {m['processed']} done, {m['per_sec']}/s, queue {m['queue_depth']} (max {m['max_queue_depth']})"
+            for name, m in self.metrics().items()
+        )
+        logger.info(f"Pipeline {self.name}: {summary}")
+
+    def __iter__(self):
+        self.started = time.monotonic()
+        threads = [threading.Thread(target=self._read_source, name=f"{self.name}-{self.source_name}", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads += [
+                threading.Thread(target=self._work, args=(index,), name=f"{self.name}-{stage.name}-{n}", daemon=True)
+                for n in range(stage.workers)
+            ]
+        for thread in threads:
+            thread.start()
+
+        pending = {}
+        next_seq = 0
+        last_report = time.monotonic()
+        try:
+            while True:
+                entry = self._get(self.output)
+                if self.error is not None:
+                    raise self.error
+                if entry is _DONE:
+                    break
+                seq, result = entry
+                pending[seq] = result
+                while next_seq in pending:
+                    if self._stopped() and self.error is not None:
+                        raise self.error
+                    yield pending.pop(next_seq)
+                    self.in_flight.release()
+                    next_seq += 1
+                if self.report_every and time.monotonic() - last_report >= self.report_every:
+                    self.report()
+                    last_report = time.monotonic()
+            if self.source_error is not None:
+                raise self.source_error
+        finally:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+            self.report()
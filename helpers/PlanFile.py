@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from constants.Constants import STATE_DIR
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def plan_path(plan_id):
+    """Location of the plan file of a plan run (one JSON object per line)."""
+    return os.path.join(STATE_DIR, "plans", f"{plan_id}.jsonl")
+
+
+class PlanWriter:
+    """
+    Writes the modifications a plan run intends to make, one JSON line per action:
+    a "header" line with the run parameters, "action" lines
+    (market, campaign_id, action_id, order_id, reason, amount) and a closing "summary"
+    line with count and net amount totals per market and reason.
+    """
+
+    def __init__(self, path, params=None):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.file = open(path, "w", encoding="utf-8")
+        self._write({"type": "header", "created_at": datetime.now(timezone.utc).isoformat(), "params": params or {}})
+
+    def _write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+
+    def add(self, market, campaign_id, action_id, order_id, reason, amount):
+        with self.lock:
+            self._write({
+                "type": "action", "market": market, "campaign_id": campaign_id, "action_id": action_id,
+                "order_id": order_id, "reason": reason, "amount": amount,
+            })
+            total = self.totals.setdefault(market, {}).setdefault(reason, {"count": 0, "amount": 0.0})
+            total["count"] += 1
+            total["amount"] = round(total["amount"] + (amount or 0), 2)
+
+    def close(self):
+        with self.lock:
+            self._write({"type": "summary", "totals": self.totals})
+            self.file.close()
+        logger.info(f"Plan written to {self.path}: {self.totals}")
+
+
+def _records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_plan(path, market=None):
+    """Yield the plan's action rows (optionally of one market), streaming the file."""
+    for record in _records(path):
+        if record.get("type") == "action" and (market is None or record.get("market") == market):
+            yield record
+
+
+def plan_summary(path):
+    """
+    Return {"params", "created_at", "totals"} of a finished plan.
+    Raises ValueError if the plan run did not complete (no summary line).
+    """
+    header, summary = None, None
+    for record in _records(path):
+        if record.get("type") == "header":
+            header = record
+        elif record.get("type") == "summary":
+            summary = record
+    if header is None or summary is None:
+        raise ValueError(f"Plan {path} is incomplete")
+    return {"params": header.get("params", {}), "created_at": header.get("created_at"), "totals": summary["totals"]}
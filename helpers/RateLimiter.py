@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+from constants.Constants import (
+    IMPACT_READ_RATE,
+    IMPACT_WRITE_RATE,
+    IMPACT_MIN_RATE_FACTOR,
+    IMPACT_DEFAULT_RETRY_AFTER,
+)
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+READ = "read"
+WRITE = "write"
+
+
+def parse_retry_after(value, default=IMPACT_DEFAULT_RETRY_AFTER):
+    """
+    Parse a Retry-After header (delay in seconds or an HTTP date) into seconds.
+    Falls back to `default` when the header is missing or unreadable.
+    """
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(str(value))
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with AIMD rate adaptation:
+    a throttle halves the rate and blocks until Retry-After has passed,
+    every success adds back a small fraction of the configured rate.
+    """
+
+    def __init__(self, rate, capacity=None, min_rate=None):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = float(min_rate or rate * IMPACT_MIN_RATE_FACTOR)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take one token and return how many seconds the caller must wait before sending."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.blocked_until - now)
+
+    def throttled(self, retry_after):
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def succeeded(self):
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class RateLimiter:
+    """
+    Registry of token buckets keyed by (account SID, kind), so every market's
+    Impact account is paced on its own and reads never starve writes.
+    """
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.rates = {
+            READ: float(config.get("impact_read_rate", IMPACT_READ_RATE)),
+            WRITE: float(config.get("impact_write_rate", IMPACT_WRITE_RATE)),
+        }
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, account_sid, kind):
+        key = (account_sid, kind)
+        with self.lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(self.rates[kind])
+            return self.buckets[key]
+
+    def acquire(self, account_sid, kind):
+        wait = self.bucket(account_sid, kind).reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, account_sid, kind):
+        wait = self.bucket(account_sid, kind).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttled(self, account_sid, kind, retry_after):
+        bucket = self.bucket(account_sid, kind)
+        bucket.throttled(retry_after)
+        logger.warning(
+            f"Impact throttled {kind}s for account {account_sid}: "
+            f"waiting {retry_after:.1f}s, rate now {bucket.rate:.2f}/s"
+        )
+
+    def succeeded(self, account_sid, kind):
+        self.bucket(account_sid, kind).succeeded()
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(config=None):
+    """Return the process-wide RateLimiter (created from `config` on first use)."""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(config)
+        return _shared_limiter
+
+
+def reset_rate_limiter():
+    global _shared_limiter
+    with _shared_limiter_lock:
+        _shared_limiter = None
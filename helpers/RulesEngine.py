@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import threading
+
+from helpers.PATARules import PATARules
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "constants", "pata_rules.json")
+DEFAULT_RULE_SET = "default"
+CLASS_CACHE_SIZE = 1024
+_MISSING = object()
+
+
+def _to_int(v):
+    try:
+        return int(v)
+    except Exception:
+        return 0
+
+
+class CompiledRuleSet:
+    """
+    One rule set compiled into plain Python predicates.
+
+    Definition (see constants/pata_rules.json):
+      position_classes: {name: [{"status": [...], "amount": n | "min_amount": n}, ...]}
+          a position gets the first class with a matching entry, otherwise it is "kept"
+      rules: [{"name", "when": {condition: value, ...}, "reason", "amount"}, ...]
+          first rule whose conditions all hold decides; conditions are
+          fraud_note (bool), voucher (bool), position_count (int),
+          all_positions / any_position (list of class names)
+      amount: "zero", null, or {"price_total_excluding": [class names]} (price sum // 100)
+      default: {"reason", "amount"} when no rule matches
+    """
+
+    def __init__(self, name, definition):
+        self.name = name
+        self.definition = definition
+        self.version = hashlib.sha256(json.dumps(definition, sort_keys=True).encode()).hexdigest()[:12]
+
+        self.class_cache = {}
+        self.class_names = list((definition.get("position_classes") or {}).keys())
+        self.class_matchers = []
+        for class_name, entries in (definition.get("position_classes") or {}).items():
+            for entry in entries:
+                unknown = set(entry) - {"status", "amount", "min_amount"}
+                if unknown:
+                    raise ValueError(f"Rule set '{name}' uses unknown position class fields {sorted(unknown)}")
+                statuses = entry.get("status")
+                self.class_matchers.append((
+                    class_name,
+                    frozenset(s.strip().lower() for s in statuses) if statuses is not None else None,
+                    entry.get("amount"),
+                    entry.get("min_amount"),
+                ))
+
+        self.rules = [self._compile_rule(rule) for rule in definition.get("rules") or []]
+        default = definition.get("default") or {}
+        self.default = (default.get("reason"), self._compile_amount(default.get("amount"))(None, None))
+
+    def _class_set(self, names):
+        unknown = [n for n in names if n not in self.class_names]
+        if unknown:
+            raise ValueError(f"Rule set '{self.name}' uses unknown position classes {unknown}")
+        return frozenset(names)
+
+    def _compile_condition(self, key, value):
+        if key == "fraud_note":
+            expected = bool(value)
+            return lambda response, order_data, classes: (PATARules.find_fraud_note(response) is not None) is expected
+        if key == "voucher":
+            expected = bool(value)
+            return lambda response, order_data, classes: PATARules.has_voucher_code(order_data) is expected
+        if key == "position_count":
+            count = int(value)
+            return lambda response, order_data, classes: len(classes) == count
+        if key == "all_positions":
+            wanted = self._class_set(value)
+            return lambda response, order_data, classes: all(c in wanted for c in classes)
+        if key == "any_position":
+            wanted = self._class_set(value)
+            return lambda response, order_data, classes: any(c in wanted for c in classes)
+        raise ValueError(f"Rule set '{self.name}' uses unknown condition '{key}'")
+
+    def _compile_amount(self, amount):
+        if amount is None:
+            return lambda classes, prices: None
+        if amount == "zero":
+            return lambda classes, prices: 0
+        if isinstance(amount, dict) and set(amount) == {"price_total_excluding"}:
+            excluded = self._class_set(amount["price_total_excluding"])
+            return lambda classes, prices: sum(
+                price for cls, price in zip(classes, prices) if cls not in excluded
+            ) // 100
+        raise ValueError(f"Rule set '{self.name}' uses unknown amount {amount!r}")
+
+    def _compile_rule(self, rule):
+        predicates = tuple(self._compile_condition(k, v) for k, v in (rule.get("when") or {}).items())
+        return rule.get("name"), predicates, rule.get("reason"), self._compile_amount(rule.get("amount"))
+
+    def _class_of(self, st, amt):
+        for class_name, statuses, amount, min_amount in self.class_matchers:
+            if statuses is not None and st not in statuses:
+                continue
+            if amount is not None and amt != amount:
+                continue
+            if min_amount is not None and amt < min_amount:
+                continue
+            return class_name
+        return None
+
+    def classify(self, positions):
+        """Return ([class name or None per position], [price amount per position])."""
+        # A class depends only on (status, amount), which take few distinct values
+        cache = self.class_cache
+        classes = []
+        prices = []
+        for p in positions:
+            key = ((p.get("status") or "").strip().lower(), _to_int(p.get("amount", 0)))
+            match = cache.get(key, _MISSING)
+            if match is _MISSING:
+                match = self._class_of(*key)
+                if len(cache) < CLASS_CACHE_SIZE:
+                    cache[key] = match
+            classes.append(match)
+            prices.append(_to_int((p.get("price") or {}).get("amount", 0)))
+        return classes, prices
+
+    def evaluate(self, response):
+        """Return (reason, amount) for a PATA order response, like PATARules.evaluate."""
+        order_data = response.get("data", {})
+        classes, prices = self.classify(order_data.get("positions") or [])
+        for _, predicates, reason, amount in self.rules:
+            if all(predicate(response, order_data, classes) for predicate in predicates):
+                return reason, amount(classes, prices)
+        return self.default
+
+
+class RulesEngine:
+    """
+    Rule sets compiled from a definition {"rule_sets": {name: {...}}, "markets": {market: name}}.
+    A rule set may "extends" another one and override any of its top-level keys.
+    Markets without an entry use the "default" rule set.
+    """
+
+    def __init__(self, definition):
+        raw_sets = definition.get("rule_sets") or {}
+        if DEFAULT_RULE_SET not in raw_sets:
+            raise ValueError(f"Rules definition has no '{DEFAULT_RULE_SET}' rule set")
+        self.rule_sets = {name: CompiledRuleSet(name, self._resolve(raw_sets, name)) for name in raw_sets}
+        self.markets = {}
+        for market, name in (definition.get("markets") or {}).items():
+            if name not in self.rule_sets:
+                raise ValueError(f"Market {market} uses unknown rule set '{name}'")
+            self.markets[market.upper()] = self.rule_sets[name]
+
+    @staticmethod
+    def _resolve(raw_sets, name, seen=()):
+        if name in seen:
+            raise ValueError(f"Rule set '{name}' extends itself")
+        if name not in raw_sets:
+            raise ValueError(f"Unknown rule set '{name}'")
+        rule_set = dict(raw_sets[name])
+        parent = rule_set.pop("extends", None)
+        if parent is None:
+            return rule_set
+        return {**RulesEngine._resolve(raw_sets, parent, seen + (name,)), **rule_set}
+
+    def for_market(self, market):
+        return self.markets.get((market or "").upper(), self.rule_sets[DEFAULT_RULE_SET])
+
+    def evaluate(self, market, response):
+        return self.for_market(market).evaluate(response)
+
+
+def load_rules_definition(config=None):
+    """
+    Rules definition from config: inline `pata_rules`, else the file at `pata_rules_path`,
+    else the packaged constants/pata_rules.json.
+    """
+    config = config or {}
+    if config.get("pata_rules"):
+        return config["pata_rules"]
+    path = config.get("pata_rules_path") or DEFAULT_RULES_PATH
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+_shared_engine = None
+_shared_engine_lock = threading.Lock()
+
+
+def get_rules_engine(config=None):
+    """
+    Return the process-wide RulesEngine, compiled from `config` on first use.
+    The fraud keywords (config `fraud_keywords`) are set up at the same time, once per process,
+    so the markets deciding orders concurrently never see them change.
+    """
+    global _shared_engine
+    with _shared_engine_lock:
+        if _shared_engine is None:
+            PATARules.configure_fraud_keywords((config or {}).get("fraud_keywords"))
+            _shared_engine = RulesEngine(load_rules_definition(config))
+            versions = {name: rule_set.version for name, rule_set in _shared_engine.rule_sets.items()}
+            logger.info(f"Compiled PATA rule sets: {versions}")
+        return _shared_engine
+
+
+def reset_rules_engine():
+    global _shared_engine
+    with _shared_engine_lock:
+        _shared_engine = None
@@ -0,0 +1,116 @@
+import json
+import threading
+from collections import OrderedDict
+
+from constants.Constants import RUN_RETENTION
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Status fields of a run published to the job queue and returned by /bot-status
+STATUS_FIELDS = ("status", "message", "current_market", "running_markets", "market_stats", "not_processed",
+                 "zip_blob_name", "run_id", "mode", "plan_id", "plan_totals")
+
+
+class RunState:
+    """
+    Status of one run: the former global bot_status dict, with its own lock.
+    emit() passes progress events to the registry's listener (e.g. the job queue's event log),
+    until `cancel` is set: a cancelled run's job belongs to another worker, whose events those are.
+    """
+
+    def __init__(self, run_id, markets, mode="run", listener=None, cancel=None):
+        self.lock = threading.Lock()
+        self.listener = listener
+        self.cancel = cancel
+        self.status = {
+            "running": True,
+            "status": "running",
+            "message": "Bot started...",
+            "current_market": None,
+            "running_markets": [],
+            "market_stats": {},
+            "not_processed": [],
+            "actions_by_state": {},
+            "csv_paths": {},
+            "zip_blob_name": None,
+            "zip_path": None,
+            "run_id": run_id,
+            "mode": mode,
+            "plan_id": None,
+            "plan_totals": None,
+            "last_run_markets": markets or [],
+        }
+
+    @property
+    def run_id(self):
+        return self.status["run_id"]
+
+    @property
+    def markets(self):
+        return set(self.status["last_run_markets"])
+
+    def update(self, **fields):
+        with self.lock:
+            self.status.update(fields)
+
+    def emit(self, event, **data):
+        if self.listener is None or (self.cancel is not None and self.cancel.is_set()):
+            return
+        try:
+            self.listener(self.run_id, event, data)
+        except Exception as e:
+            logger.error(f"Run {self.run_id}: could not publish {event} event: {e}")
+
+    def snapshot(self):
+        """JSON-serializable copy of the STATUS_FIELDS."""
+        with self.lock:
+            return json.loads(json.dumps({field: self.status.get(field) for field in STATUS_FIELDS}, default=str))
+
+
+class RunRegistry:
+    """
+    Runs of this process keyed by run_id. Several runs can be active at once;
+    finished runs are kept for status reads, the oldest evicted beyond `max_finished`.
+    on_event(run_id, event, data), when set, receives the events of every run.
+    """
+
+    def __init__(self, max_finished=RUN_RETENTION, on_event=None):
+        self.max_finished = max_finished
+        self.on_event = on_event
+        self.lock = threading.Lock()
+        self.runs = OrderedDict()
+
+    def start(self, run_id, markets, mode="run", cancel=None):
+        run = RunState(run_id, markets, mode, listener=self.on_event, cancel=cancel)
+        with self.lock:
+            self.runs.pop(run_id, None)
+            self.runs[run_id] = run
+            self._evict_locked()
+        run.emit("run_started", markets=markets or [], mode=mode)
+        return run
+
+    def get(self, run_id):
+        with self.lock:
+            return self.runs.get(run_id)
+
+    def active(self):
+        with self.lock:
+            return [run for run in self.runs.values() if run.status["running"]]
+
+    def finish(self, run_id):
+        """Mark a run as no longer running (its status stays readable until evicted)."""
+        run = self.get(run_id)
+        if run is not None:
+            run.update(running=False)
+            snapshot = run.snapshot()
+            run.emit("run_finished", **{field: snapshot[field] for field in
+                                        ("status", "message", "zip_blob_name", "plan_id", "plan_totals")})
+        with self.lock:
+            self._evict_locked()
+
+    def _evict_locked(self):
+        finished = [run_id for run_id, run in self.runs.items() if not run.status["running"]]
+        for run_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.runs[run_id]
+            logger.info(f"Run {run_id} evicted from the run registry")
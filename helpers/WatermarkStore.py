@@ -0,0 +1,108 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from constants.Constants import STATE_DIR
+from helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def to_utc_iso(value):
+    """Normalize an Impact timestamp (ISO string, with Z or offset) to a UTC ISO string."""
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def _epoch_us(utc_iso):
+    return int(datetime.fromisoformat(utc_iso).timestamp() * 1_000_000)
+
+
+class WatermarkStore:
+    """
+    Persisted per-campaign watermark: the action date up to which every action
+    of the campaign was processed successfully. Stored in a SQLite file (WAL) so
+    concurrent runs and worker processes advance it atomically; watermarks of the
+    former watermarks.json file are imported on first open.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(STATE_DIR, "watermarks.sqlite")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS watermarks (
+                campaign_id TEXT PRIMARY KEY,
+                action_date TEXT NOT NULL,
+                action_us INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+        self._import_json(os.path.join(os.path.dirname(self.path), "watermarks.json"))
+
+    def _import_json(self, json_path):
+        if not os.path.exists(json_path):
+            return
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Could not read watermarks from {json_path}: {e}")
+            return
+        for campaign_id, entry in legacy.items():
+            if entry and entry.get("action_date"):
+                self.advance(campaign_id, entry["action_date"])
+        os.replace(json_path, json_path + ".imported")
+
+    def get(self, campaign_id):
+        """Return the watermark (UTC ISO string) of a campaign, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT action_date FROM watermarks WHERE campaign_id = ?", (str(campaign_id),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def advance(self, campaign_id, action_date):
+        """
+        Move a campaign's watermark forward to `action_date`; never moves it back.
+        Returns the stored watermark.
+        """
+        action_date = to_utc_iso(action_date)
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO watermarks (campaign_id, action_date, action_us, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(campaign_id) DO UPDATE SET action_date = excluded.action_date, "
+                "action_us = excluded.action_us, updated_at = excluded.updated_at "
+                "WHERE excluded.action_us > watermarks.action_us",
+                (str(campaign_id), action_date, _epoch_us(action_date), datetime.now(timezone.utc).isoformat()),
+            )
+            self.conn.commit()
+        if cursor.rowcount:
+            logger.info(f"Campaign {campaign_id}: watermark advanced to {action_date}")
+            return action_date
+        return self.get(campaign_id)
+
+    def close(self):
+        self.conn.close()
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_watermark_store():
+    """Return the process-wide WatermarkStore (STATE_DIR/watermarks.sqlite)."""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = WatermarkStore()
+        return _shared_store
@@ -3,16 +3,185 @@ from clients.PATAclient import PATAClient
 from helpers.logger import get_logger
 from utils.CommonUtils import common_utils
 from utils.OrderMiiUUID import OrderMiiUUID
-from helpers.PATARules import PATARules
+from helpers.WatermarkStore import get_watermark_store, to_utc_iso
+from constants.Constants import PATA_CONCURRENCY, PIPELINE_QUEUE_SIZE, PIPELINE_MAX_IN_FLIGHT, \
+    PIPELINE_DECIDE_WORKERS, IMPACT_WRITE_CONCURRENCY, PIPELINE_REPORT_EVERY, DATE_SHARD, \
+    PROGRESS_EVERY
+from helpers.ActionLedger import ActionLedger
+from helpers.CheckpointStore import CheckpointStore
+from helpers.OrderCache import get_order_cache
+from helpers.RulesEngine import get_rules_engine
+from helpers.DecisionMemo import get_decision_memo, order_fingerprint
+from helpers.Pipeline import Pipeline, Stage
+from helpers.PlanFile import read_plan
+from helpers.ActionStateTable import ActionStateTable
+from collections import namedtuple
+from datetime import datetime
+from concurrent.futures import Future
+import threading
 import os
 import json
 logger = get_logger(__name__)
 
+# Reasons that turn into an Impact modification (reverse for OTHER/ITEM_RETURNED, update for ORDER_UPDATE)
+WRITE_REASONS = ("OTHER", "ITEM_RETURNED", "ORDER_UPDATE")
+# Outcome state of a decision waiting for the end-of-market batch upload
+PENDING_BATCH = "Pending_Batch"
+# Outcome state of a decision waiting for the apply stage (single writes)
+PENDING_WRITE = "Pending_Write"
+
+# Result of one action: stats/actions_by_state key, Impact order id, net amount, reason text for the CSV,
+# and the not_processed entry (or None)
+Outcome = namedtuple("Outcome", "state order_id amount reason not_processed")
+
+
+class OrderLookups:
+    """
+    PATA lookups and decisions of one market run, keyed by order UUID.
+    Concurrent lookups of the same order share one request; once an order is decided
+    its later actions reuse the decision and are not looked up again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.decisions = {}
+        self.inflight = {}
+
+    def lookup(self, order_uuid, fetch):
+        """Return fetch()'s (order, error) for the order, or (None, None) when it is already decided."""
+        with self.lock:
+            if order_uuid in self.decisions:
+                return None, None
+            future = self.inflight.get(order_uuid)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inflight[order_uuid] = future
+        if owner:
+            future.set_result(fetch())
+        return future.result()
+
+    def done(self, order_uuid):
+        """Forget the fetched order once its action went through the decide stage."""
+        with self.lock:
+            self.inflight.pop(order_uuid, None)
+
+
 class main:
 
-    def process_single_market(self, campaign_id, market, start_date=None, end_date=None):
+    @staticmethod
+    def _map_fetch_errors(actions, market):
+        """
+        Re-raise Impact fetch errors coming out of the action stream as the
+        market-level errors run_bot_thread reports.
+        """
+        try:
+            yield from actions
+        except Exception as e:
+            error_msg = str(e)
+            if "401" in error_msg or "Unauthorized" in error_msg:
+                raise PermissionError(f"⚠️ Authorization failed for market {market}. Please check credentials.")
+            elif "timeout" in error_msg.lower():
+                raise TimeoutError(f"⚠️ Request timed out for market {market}.")
+            elif "404" in error_msg:
+                raise FileNotFoundError(f"Resource not found for market {market}.")
+            else:
+                raise RuntimeError(f"API error for market {market}")
+
+    @staticmethod
+    def _pata_concurrency(config, market):
+        """
+        Max parallel PATA lookups for a market: config `pata_concurrency_<market>`,
+        then `pata_concurrency`, then the PATA_CONCURRENCY default.
+        """
+        value = config.get(f"pata_concurrency_{market}", config.get("pata_concurrency", PATA_CONCURRENCY))
+        return max(1, int(value))
 
+    @staticmethod
+    def _order_uuid(market, action):
+        """Return (order_uuid_str, error) for an action's Oid."""
+        try:
+            return OrderMiiUUID(market, int(action.get("Oid"))).to_uuid_string(), None
+        except Exception as e:
+            return None, e
+
+    @staticmethod
+    def _retrieve_order(pata_client, market, order_uuid_str):
+        """Fetch one order from PATA; returns (order, error) so failures stay attached to it."""
+        try:
+            return pata_client.retrieve_order(market, order_uuid_str), None
+        except Exception as e:
+            return None, e
+
+    def _resolve_action(self, pata_client, market, action, lookups):
+        """
+        Resolve stage: (order_uuid_str, order, error) for one action.
+        Orders already decided in this run come back with order None.
+        """
+        order_uuid, error = self._order_uuid(market, action)
+        if error is not None:
+            return None, None, error
+        order, fetch_error = lookups.lookup(
+            order_uuid, lambda: self._retrieve_order(pata_client, market, order_uuid)
+        )
+        return order_uuid, order, fetch_error
 
+    @staticmethod
+    def _pipeline_settings(config, market, worker_share=None):
+        """
+        Queue size, in-flight cap and worker counts of the action pipeline (see constants.Constants).
+        With `worker_share` (markets running concurrently), resolve and apply workers are scaled down
+        together so the market uses at most that many of them.
+        """
+        settings = {
+            "queue_size": int(config.get("pipeline_queue_size", PIPELINE_QUEUE_SIZE)),
+            "max_in_flight": int(config.get("pipeline_max_in_flight", PIPELINE_MAX_IN_FLIGHT)),
+            "resolve_workers": main._pata_concurrency(config, market),
+            "decide_workers": max(1, int(config.get("pipeline_decide_workers", PIPELINE_DECIDE_WORKERS))),
+            "apply_workers": max(1, int(config.get(f"impact_write_concurrency_{market}",
+                                                   config.get("impact_write_concurrency", IMPACT_WRITE_CONCURRENCY)))),
+            "report_every": float(config.get("pipeline_report_every", PIPELINE_REPORT_EVERY)),
+        }
+        io_workers = settings["resolve_workers"] + settings["apply_workers"]
+        if worker_share and io_workers > worker_share:
+            settings["resolve_workers"] = max(1, settings["resolve_workers"] * worker_share // io_workers)
+            settings["apply_workers"] = max(1, worker_share - settings["resolve_workers"])
+        return settings
+
+    @classmethod
+    def _decide_order(cls, market, order, memo=None, order_key=None):
+        """
+        Decision for one order, reused from `memo` when the order's content is unchanged
+        since it was last decided.
+        """
+        if memo is None or order_key is None:
+            return cls._evaluate_order(market, order)
+        fingerprint = order_fingerprint(market, order, get_rules_engine().for_market(market).version)
+        decision = memo.get(market, order_key, fingerprint)
+        if decision is None:
+            decision = cls._evaluate_order(market, order)
+            memo.put(order_key, fingerprint, decision)
+        return decision
+
+    @staticmethod
+    def _evaluate_order(market, order):
+        """
+        Run the PATA rules and VAT conversion for one order.
+        Returns (reason, amount_without_vat); (None, None) when no modification is needed.
+        """
+        reason, amount = get_rules_engine().evaluate(market, order)
+        if amount is None:
+            return None, None
+        print(f"checking VAT for market: {market}")
+        print(f"amount with VAT:{amount}")
+
+        amount_without_vat = common_utils.exclude_VAT(amount,market)
+        print(f"amount after VAT:{amount_without_vat}")
+        return reason, amount_without_vat
+
+    @staticmethod
+    def _load_config():
+        """Load the app configuration from config.json, or from the impact_secret_json environment variable."""
         BASE_DIR = os.path.dirname(os.path.abspath(__file__))
         CONFIG_FILE_PATH = os.path.join(BASE_DIR, "config.json")
 
@@ -33,192 +202,414 @@ class main:
                 raise FileNotFoundError(
                     "No config.json found and impact_secret_json environment variable is not set."
                 )
+        return data
 
-        # Initialize clients
-        impact_client = ImpactClient(data, market=market)
-        pata_client = PATAClient()
+    @staticmethod
+    def _write_mode(config, market, write_mode=None):
+        """
+        "single" (one PUT/DELETE per action) or "batch" (batch uploads at the end of the market):
+        explicit argument, then config `impact_write_mode_<market>`, then `impact_write_mode`.
+        """
+        return write_mode or config.get(f"impact_write_mode_{market}", config.get("impact_write_mode", "single"))
 
-        # ✅ Fetch actions with robust error handling
-        try:
-            actions = impact_client.get_actions(campaign_id, start_date, end_date)
-        except Exception as e:
-            error_msg = str(e)
-            if "401" in error_msg or "Unauthorized" in error_msg:
-                raise PermissionError(f"⚠️ Authorization failed for market {market}. Please check credentials.")
-            elif "timeout" in error_msg.lower():
-                raise TimeoutError(f"⚠️ Request timed out for market {market}.")
-            elif "404" in error_msg:
-                raise FileNotFoundError(f"Resource not found for market {market}.")
+    @classmethod
+    def _apply_batch(cls, impact_client, market, pending_writes, table, not_processed_ids, ledger=None):
+        """
+        Submit the collected modifications as batch uploads and book every row
+        into the action state table from the job's per-row results.
+        Returns [(action_id, Outcome)].
+        """
+        results = impact_client.modify_actions_batch(pending_writes)
+        outcomes = []
+        for row in pending_writes:
+            succeeded, message = results.get(row["action_id"], (False, "No batch result"))
+            if succeeded:
+                outcome = Outcome(row["reason"], row["orderId"], row["amount"], row["reason"], None)
+                if ledger is not None:
+                    ledger.record(row["action_id"], row["reason"], row["amount"])
             else:
-                raise RuntimeError(f"API error for market {market}")
+                print(f"Batch modification failed for action {row['action_id']}: {message}")
+                outcome = Outcome("Not_Processed", row["orderId"], None, "Not Processed",
+                                  {"market": market, "action_id": row["orderId"], "error": message})
+            cls._book(table, row["action_id"], outcome, not_processed_ids)
+            outcomes.append((row["action_id"], outcome))
+        return outcomes
 
-        # Initialize statistics
-        stats = {
-            "total_actions": len(actions),
-            "OTHER": 0,
-            "ITEM_RETURNED": 0,
-            "ORDER_UPDATE": 0,
-            "Not_Modified": 0,
-            "Not_Processed": 0,
-            "NONE": 0
-        }
-        # Track action IDs for each state
-        actions_by_state = {
-            "OTHER": [],
-            "ITEM_RETURNED": [],
-            "ORDER_UPDATE": [],
-            "Not_Modified": [],
-            "Not_Processed": [],
-            "NONE": []
-        }
-        export_rows = []
-        not_processed_ids = []
-        for idx, action in enumerate(actions):
-            try:
-                order_id_impact = int(action.get("Oid"))
-                ad_id_impact = int(action.get("AdId"))
+    @staticmethod
+    def _next_watermark(table):
+        """
+        Latest action date that is safe to resume from: the newest action date seen,
+        or the oldest date of an action that ended up Not_Processed (so it is fetched again).
+        """
+        newest, oldest_failed = None, None
+        for record in table:
+            if not record.action_date:
+                continue
+            action_date = to_utc_iso(record.action_date)
+            if record.state == "Not_Processed":
+                if oldest_failed is None or action_date < oldest_failed:
+                    oldest_failed = action_date
+            elif newest is None or action_date > newest:
+                newest = action_date
+        return oldest_failed or newest
 
-                action_id = action.get("Id")
+    @staticmethod
+    def _report_progress(progress, table, every):
+        """Call progress(stats) each time `every` more actions have entered the table."""
+        if progress is not None and len(table) % every == 0:
+            progress(table.stats())
 
+    @staticmethod
+    def _book(table, action_id, outcome, not_processed_ids):
+        """Put an action's Outcome into the run's action state table / not_processed list."""
+        table.set(action_id, outcome.state, outcome.order_id, outcome.amount, outcome.reason)
+        if outcome.not_processed:
+            not_processed_ids.append(outcome.not_processed)
 
-                order_uuid_str = OrderMiiUUID(market, order_id_impact).to_uuid_string()
-                order = pata_client.retrieve_order(market, order_uuid_str)
+    def _decide_action(self, market, action, resolved, write_mode, ledger=None, decisions=None, memo=None):
+        """
+        Decide stage: the Outcome of one action from its resolved PATA order.
+        `decisions` maps order UUID -> (reason, amount_without_vat) for the run, so an order
+        shared by several actions is decided once and the decision is reused for each of them;
+        `memo` carries decisions of unchanged orders across runs.
+        Modifications to send come back as PENDING_WRITE (PENDING_BATCH in batch mode).
+        """
+        decisions = decisions if decisions is not None else {}
+        action_id = action.get("Id")
+        order_id_impact = action.get("Oid")
+        try:
+            order_id_impact = int(action.get("Oid"))
+            ad_id_impact = int(action.get("AdId"))
+
+            order_uuid_str, order, resolve_error = resolved
+            if resolve_error is not None:
+                raise resolve_error
+
+            if order_uuid_str not in decisions:
+                if not order:
+                    print(f"Order couldn't be retrieved from PATA /not processed {order_uuid_str}")
+                    return Outcome("Not_Processed", order_id_impact, None, "Failed to process order",
+                                   {"market": market, "action_id": action_id})
                 print(f"\nOrder details for {order_id_impact}, {order_uuid_str} ({market}):")
                 for key, value in order.items():
                     print(f"  {key}: {value}")
+                decisions[order_uuid_str] = self._decide_order(market, order, memo, order_uuid_str)
 
-                if not order:
-                    stats["Not_Processed"] += 1
-                    not_processed_ids.append({"market": market, "action_id": action_id})
-                    print(f"Order couldn't be retrieved from PATA /not processed {order_uuid_str}")
-                    # actions_by_state["Not_Processed"].append(order_uuid_str)
-                    actions_by_state["Not_Processed"].append({
-                        "orderId": order_id_impact,
-                        "amount": None,
-                        "reason": "Failed to process order"})
-                    continue
+            reason, amount_without_vat = decisions[order_uuid_str]
+            if amount_without_vat is None:
+                print(f"⚠️ Skipping action {action_id} for market {market}: amount is None")
+                return Outcome("Not_Modified", order_id_impact, None, "Not Modified", None)
 
-                reason, amount = PATARules.calculate_action_reason_and_amount(order)
-                if amount is None:
-                    print(f"⚠️ Skipping action {action_id} for market {market}: amount is None")
-                    stats["Not_Modified"] += 1
-                    # not_processed_ids.append({"market": market, "action_id": action_id, "reason": "amount_is_none"})
-                    continue
-                print(f"checking VAT for market: {market}")
-                print(f"amount with VAT:{amount}")
-
-                amount_without_vat = common_utils.exclude_VAT(amount,market)
-                print(f"amount after VAT:{amount_without_vat}")
-
-                export_rows.append({
-                    "orderId": order_id_impact,
-                    "amount": amount_without_vat,
-                    "reason": reason
-                })
-
-                if reason in ("OTHER", "ITEM_RETURNED"):
-                    result = impact_client.reverse_action(action_id, amount_without_vat, reason)
-                    print("✅ Returned from reverse_action")
-                    print(f"result: {result}")
-                    if result is None:
-                        stats["Not_Processed"] += 1
-                        not_processed_ids.append({"market": market, "action_id": order_id_impact})
-                        # actions_by_state["Not_Processed"].append(order_uuid_str)
-                        actions_by_state["Not_Processed"].append({
-                            "orderId": order_id_impact,
-                            "amount": None,
-                            "reason": "Not Processed"})
-                        print(f"Order couldn't be reversed  /not processed {order_uuid_str} {order_id_impact} {result}")
+            if reason not in WRITE_REASONS:
+                return Outcome("Not_Modified", order_id_impact, None, "Not Modified", None)
+
+            if ledger is not None and ledger.is_applied(action_id, reason, amount_without_vat):
+                # Identical modification already applied by an earlier run
+                print(f"Skipping action {action_id}: {reason} {amount_without_vat} already applied")
+                return Outcome("Already_Applied", order_id_impact, amount_without_vat, reason, None)
+
+            state = PENDING_BATCH if write_mode == "batch" else PENDING_WRITE
+            return Outcome(state, order_id_impact, amount_without_vat, reason, None)
+
+        except Exception as e:
+            print(f"❌ Exception while processing action {order_id_impact}: {e}")
+            print(f"Order couldn't be processed {order_id_impact} {order_id_impact} ")
+            return Outcome("Not_Processed", order_id_impact, None, "Not Processed",
+                           {"market": market, "action_id": action_id, "error": str(e)})
+
+    @staticmethod
+    def _apply_action(impact_client, market, action, outcome, ledger=None):
+        """Apply stage: send a PENDING_WRITE Outcome to Impact; every other Outcome passes through."""
+        if outcome.state != PENDING_WRITE:
+            return outcome
+        action_id = action.get("Id")
+        order_id_impact, amount_without_vat, reason = outcome.order_id, outcome.amount, outcome.reason
+        try:
+            if reason in ("OTHER", "ITEM_RETURNED"):
+                result = impact_client.reverse_action(action_id, amount_without_vat, reason)
+                print("✅ Returned from reverse_action")
+            else:
+                result = impact_client.update_action(action_id, amount_without_vat, reason)
+                print("✅ Returned from update_action")
+            print(f"result: {result}")
+
+            if result is None:
+                print(f"Order couldn't be modified  /not processed {order_id_impact} {result}")
+                return Outcome("Not_Processed", order_id_impact, None, "Not Processed",
+                               {"market": market, "action_id": order_id_impact})
+
+            if ledger is not None:
+                ledger.record(action_id, reason, amount_without_vat)
+            return Outcome(reason, order_id_impact, amount_without_vat, reason, None)
+
+        except Exception as e:
+            print(f"❌ Exception while processing action {order_id_impact}: {e}")
+            print(f"Order couldn't be processed {order_id_impact} {order_id_impact} ")
+            return Outcome("Not_Processed", order_id_impact, None, "Not Processed",
+                           {"market": market, "action_id": action_id, "error": str(e)})
+
+    def process_single_market(self, campaign_id, market, start_date=None, end_date=None, write_mode=None,
+                              incremental=False, watermark_store=None, run_id=None, resume=False,
+                              checkpoint_store=None, ledger=None, decision_memo=None, plan=None, worker_share=None,
+                              shard=None, progress=None, cancel=None):
+        """
+        Fetch, decide and apply the actions of one campaign.
+        With `plan` (a PlanWriter) nothing is written to Impact: the modifications the run would make
+        are written to the plan and counted as Planned, to be executed later with apply_plan_market.
+        worker_share caps the market's pipeline threads when several markets run at once.
+        shard ("day"/"week", default config date_shard) splits the window into date shards fetched in parallel;
+        their actions are merged, deduplicated by action ID, into the one market result.
+        progress(stats) is called every progress_every actions with the running per-state counters.
+        Setting cancel (a threading.Event) stops the pipeline: PipelineCancelled is raised and
+        nothing more is written to Impact.
+        A fetch error after some actions came in does not lose them: they are booked and checkpointed,
+        the error is reported as a Not_Processed entry (and as the result's "error"), the watermark stays
+        put and the partial result is returned. A fetch error before the first action is raised.
+        """
+        data = self._load_config()
+
+        # Initialize clients
+        impact_client = ImpactClient(data, market=market)
+        pata_client = PATAClient(session=impact_client.session, cache=get_order_cache(data))
+        rules = get_rules_engine(data)
+        print(f"PATA rule set for {market}: {rules.for_market(market).name} ({rules.for_market(market).version})")
+
+        # Per-action outcomes are checkpointed under run_id; resume skips the ones already completed
+        # A store opened here is closed here; checkpoints buffered before an error are flushed either way,
+        # so a resume skips everything that completed
+        own_checkpoints = checkpoint_store is None and run_id is not None
+        checkpoint_store = checkpoint_store or (CheckpointStore() if run_id else None)
+        # Modifications applied by earlier runs are skipped instead of being sent again
+        own_ledger = ledger is None
+        ledger = ledger or ActionLedger()
+        try:
+            completed = {}
+            if run_id and resume:
+                completed = {action_id: Outcome(*values)
+                             for action_id, values in checkpoint_store.completed(run_id, campaign_id).items()}
+            if completed:
+                logger.info(f"Resuming run {run_id} for {market}: {len(completed)} action(s) already completed")
+
+            # Decisions of orders whose content has not changed since the last run are reused
+            decision_memo = decision_memo or get_decision_memo(data)
+
+            # Incremental mode only fetches actions newer than the campaign's watermark
+            watermark_store = watermark_store or get_watermark_store()
+            watermark = watermark_store.get(campaign_id)
+            since = watermark if incremental else None
+            # A window starting after the watermark skips the actions in between, so only a window
+            # reaching back to it may move the watermark
+            window_start = impact_client.local_to_utc_from_campaign(campaign_id, start_date, end_date)[0]
+            reaches_watermark = watermark is None or \
+                datetime.fromisoformat(window_start) <= datetime.fromisoformat(watermark)
+
+            # ✅ Stream actions page by page; fetch errors surface while iterating
+            shard = shard or data.get("date_shard", DATE_SHARD)
+            if shard:
+                pages = impact_client.iter_sharded_action_pages(campaign_id, start_date, end_date, shard, since=since)
+            else:
+                pages = impact_client.iter_action_pages(campaign_id, start_date, end_date, since=since)
+            pages = self._map_fetch_errors(pages, market)
+            # Lookups and decisions per order UUID: an order shared by several actions is fetched and decided once
+            lookups = OrderLookups()
+
+            # Every action of the run, indexed by action ID and by state
+            table = ActionStateTable()
+            not_processed_ids = []
+            # A plan run collects its modifications like batch mode does, and writes them to the plan
+            write_mode = "batch" if plan is not None else self._write_mode(data, market, write_mode)
+
+            # fetch -> resolve (PATA) -> decide (rules, VAT) -> apply (Impact writes), each stage on its own
+            # workers behind a bounded queue; results come back in action order
+            def resolve(action):
+                if action.get("Id") in completed:
+                    return action, None
+                return action, self._resolve_action(pata_client, market, action, lookups)
+
+            def decide(item):
+                action, resolved = item
+                if resolved is None:
+                    # Resumed run: this action already finished before the restart
+                    return action, completed[action.get("Id")]
+                outcome = self._decide_action(market, action, resolved, write_mode, ledger, lookups.decisions,
+                                              decision_memo)
+                lookups.done(resolved[0])
+                return action, outcome
 
+            def apply(item):
+                action, outcome = item
+                return action, self._apply_action(impact_client, market, action, outcome, ledger)
+
+            settings = self._pipeline_settings(data, market, worker_share)
+            pipeline = Pipeline(
+                market,
+                (action for page in pages for action in page),
+                [
+                    Stage("resolve", resolve, settings["resolve_workers"], settings["queue_size"]),
+                    Stage("decide", decide, settings["decide_workers"], settings["queue_size"]),
+                    Stage("apply", apply, settings["apply_workers"], settings["queue_size"]),
+                ],
+                max_in_flight=settings["max_in_flight"],
+                report_every=settings["report_every"],
+                cancel=cancel,
+            )
+
+            # In batch mode decisions are collected here and submitted after the loop
+            pending_writes = []
+            progress_every = max(1, int(data.get("progress_every", PROGRESS_EVERY)))
+            fetch_error = None
+            try:
+                for action, outcome in pipeline:
+                    action_id = action.get("Id")
+                    table.add(action_id, action.get("Oid"), action.get("EventDate") or action.get("CreationDate"))
+                    self._report_progress(progress, table, progress_every)
+
+                    if action_id in completed:
+                        self._book(table, action_id, outcome, not_processed_ids)
                         continue
-                    else:
-                        stats[reason] += 1
-                        actions_by_state[reason].append({
-                            "orderId": order_id_impact,
-                            "amount": amount_without_vat,
-                            "reason": reason})
-
-
-                elif reason == "ORDER_UPDATE":
-                    result=impact_client.update_action(action_id, amount_without_vat, reason)
-                    print("✅ Returned from update_action")
-                    print(f"result: {result}")
-                    if result is None:
-                        stats["Not_Processed"] += 1
-                        not_processed_ids.append({"market": market, "action_id": order_id_impact})
-                        # actions_by_state["Not_Processed"].append(order_uuid_str)
-                        actions_by_state["Not_Processed"].append({
-                            "orderId": order_id_impact,
-                            "amount": None,
-                            "reason": "Not Processed"})
-                        print(f"Order couldn't be updated  /not processed {order_uuid_str} {order_id_impact} {result}")
+
+                    if outcome.state == PENDING_BATCH and plan is not None:
+                        plan.add(market, campaign_id, action_id, outcome.order_id, outcome.reason, outcome.amount)
+                        self._book(table, action_id, outcome._replace(state="Planned"), not_processed_ids)
                         continue
-                    else:
-                        stats[reason] += 1
-                        # actions_by_state[reason].append(order_id_impact)
-                        actions_by_state[reason].append({
-                            "orderId": order_id_impact,
-                            "amount": amount_without_vat,
-                            "reason": reason})
 
+                    if outcome.state == PENDING_BATCH:
+                        pending_writes.append({
+                            "action_id": action_id,
+                            "orderId": outcome.order_id,
+                            "amount": outcome.amount,
+                            "reason": outcome.reason})
+                        continue
 
-                else:
-                    if reason in stats:
-                        stats[reason] += 1
-                        # actions_by_state[reason].append(order_id_impact)
-                        actions_by_state[reason].append({
-                            "orderId": order_id_impact,
-                            "amount": amount_without_vat,
-                            "reason": reason})
+                    self._book(table, action_id, outcome, not_processed_ids)
+                    if run_id:
+                        checkpoint_store.record(run_id, campaign_id, action_id, outcome)
+            except Exception as e:
+                if e is not pipeline.source_error or not pipeline.fetched:
+                    raise
+                # The action stream broke off mid-window: finish what came in, the rest is fetched again next run
+                fetch_error = e
+                logger.error(f"Fetching actions for {market} failed after {pipeline.fetched} action(s): {e}")
+                not_processed_ids.append({"market": market, "action_id": "N/A", "error": str(e)})
 
+            if pending_writes:
+                batch_outcomes = self._apply_batch(impact_client, market, pending_writes, table, not_processed_ids,
+                                                   ledger)
+                if run_id:
+                    for action_id, outcome in batch_outcomes:
+                        checkpoint_store.record(run_id, campaign_id, action_id, outcome)
+            if run_id:
+                checkpoint_store.flush()
 
-            except Exception as e:
-                print(f"❌ Exception while processing action {order_id_impact}: {e}")
-                stats["Not_Processed"] += 1
-                not_processed_ids.append({"market": market, "action_id": action.get("Id"), "error": str(e)})
-                actions_by_state["Not_Processed"].append({
-                    "orderId": order_id_impact,
-                    "amount": None,
-                    "reason": "Not Processed"})
-                # actions_by_state["Not_Processed"].append(order_uuid_str)
-                print(f"Order couldn't be processed {order_id_impact} {order_id_impact} ")
-
-        # Calculate Not_Modified
-        stats["Not_Modified"] = stats["total_actions"] - (
-                stats["Not_Processed"] + stats["OTHER"] + stats["ITEM_RETURNED"] + stats["ORDER_UPDATE"]
-        )
-        print(f"not modified: {stats["Not_Modified"]}")
-        all_processed_ids = (
-                actions_by_state["OTHER"] +
-                actions_by_state["ITEM_RETURNED"] +
-                actions_by_state["ORDER_UPDATE"] +
-                actions_by_state["Not_Processed"]
-        )
-        for action in actions:
-            action_id = action.get("Id")
-            # order_id = action.get("AdId")
-            order_id = action.get("Oid")
-
-            if action_id not in all_processed_ids:
-                actions_by_state["Not_Modified"].append({
-                    "orderId": order_id,
-                    "amount": None,
-                    "reason": "Not Modified"})
-
-        print("\n=== Action IDs by state ===")
-        for state, records in actions_by_state.items():
-            for record in records:
-                order_id = record.get("orderId")
-                amount = record.get("amount")
-                print(f"{order_id}, {amount}, {state}")
-
-
-        print(actions_by_state)
-        print(not_processed_ids)
-        return {
-            "stats": stats,
-            "not_processed": not_processed_ids,
-            "actions_by_state": actions_by_state
-        }
+            # Actions without an outcome are Not_Modified; stats and the per-state lists come from the table indexes
+            table.finalize()
+            stats = table.stats()
+            actions_by_state = table.actions_by_state()
+            print(f"not modified: {stats["Not_Modified"]}")
+
+            # A plan run changes nothing, so the next run must see the same actions again;
+            # after a fetch error the actions beyond it were never seen
+            advance = plan is None and fetch_error is None and reaches_watermark
+            next_watermark = self._next_watermark(table) if advance else None
+            if next_watermark:
+                watermark_store.advance(campaign_id, next_watermark)
+
+            print("\n=== Action IDs by state ===")
+            for state, records in actions_by_state.items():
+                for record in records:
+                    order_id = record.get("orderId")
+                    amount = record.get("amount")
+                    print(f"{order_id}, {amount}, {state}")
+
+
+            decision_memo.flush()
+            changed_orders = decision_memo.take_changed(market)
+            print(f"Decision memo: {decision_memo.hits} reused / {decision_memo.misses} evaluated so far, "
+                  f"{len(changed_orders)} changed order(s) in {market}")
+
+            print(actions_by_state)
+            print(not_processed_ids)
+            return {
+                "stats": stats,
+                "not_processed": not_processed_ids,
+                "actions_by_state": actions_by_state,
+                "changed_orders": changed_orders,
+                "pipeline": pipeline.metrics(),
+                "error": str(fetch_error) if fetch_error is not None else None,
+            }
+        finally:
+            if own_checkpoints:
+                checkpoint_store.close()
+            elif checkpoint_store is not None:
+                checkpoint_store.flush()
+            if own_ledger:
+                ledger.close()
+
+
+
+    def apply_plan_market(self, plan_path, market, write_mode=None, ledger=None, worker_share=None,
+                          progress=None, cancel=None):
+        """
+        Execute the modifications of one market from a plan file written by a plan run.
+        Writes run on impact_write_concurrency workers paced by the Impact rate limiter
+        (or as batch uploads in batch write mode); modifications already in the ledger are skipped.
+        progress(stats) and cancel are handled like in process_single_market.
+        """
+        data = self._load_config()
+        impact_client = ImpactClient(data, market=market)
+        own_ledger = ledger is None
+        ledger = ledger or ActionLedger()
+        try:
+            write_mode = self._write_mode(data, market, write_mode)
+
+            table = ActionStateTable()
+            not_processed_ids = []
+
+            def apply(row):
+                action_id, reason, amount = row["action_id"], row["reason"], row["amount"]
+                if ledger.is_applied(action_id, reason, amount):
+                    print(f"Skipping action {action_id}: {reason} {amount} already applied")
+                    return row, Outcome("Already_Applied", row["order_id"], amount, reason, None)
+                state = PENDING_BATCH if write_mode == "batch" else PENDING_WRITE
+                outcome = Outcome(state, row["order_id"], amount, reason, None)
+                return row, self._apply_action(impact_client, market, {"Id": action_id}, outcome, ledger)
+
+            settings = self._pipeline_settings(data, market, worker_share)
+            pipeline = Pipeline(
+                f"{market}-apply",
+                read_plan(plan_path, market),
+                [Stage("apply", apply, settings["apply_workers"], settings["queue_size"])],
+                max_in_flight=settings["max_in_flight"],
+                report_every=settings["report_every"],
+                source_name="plan",
+                cancel=cancel,
+            )
+
+            pending_writes = []
+            progress_every = max(1, int(data.get("progress_every", PROGRESS_EVERY)))
+            for row, outcome in pipeline:
+                table.add(row["action_id"], row["order_id"])
+                self._report_progress(progress, table, progress_every)
+                if outcome.state == PENDING_BATCH:
+                    pending_writes.append({
+                        "action_id": row["action_id"],
+                        "orderId": outcome.order_id,
+                        "amount": outcome.amount,
+                        "reason": outcome.reason})
+                    continue
+                self._book(table, row["action_id"], outcome, not_processed_ids)
 
+            if pending_writes:
+                self._apply_batch(impact_client, market, pending_writes, table, not_processed_ids, ledger)
 
+            stats = table.stats()
+            print(f"Plan applied for {market}: {stats}")
+            return {
+                "stats": stats,
+                "not_processed": not_processed_ids,
+                "actions_by_state": table.actions_by_state(),
+                "pipeline": pipeline.metrics()
+            }
+        finally:
+            if own_ledger:
+                ledger.close()
@@ -0,0 +1,23 @@
+from helpers.ActionLedger import ActionLedger
+
+
+def test_only_identical_modifications_count_as_applied(tmp_path):
+    path = str(tmp_path / "ledger.sqlite")
+    ActionLedger(path).record("A1", "ORDER_UPDATE", 31.2)
+
+    ledger = ActionLedger(path)
+
+    assert ledger.is_applied("A1", "ORDER_UPDATE", 31.2)
+    assert ledger.is_applied("A1", "ORDER_UPDATE", 31.200001)
+    assert not ledger.is_applied("A1", "ORDER_UPDATE", 30.0)
+    assert not ledger.is_applied("A1", "ITEM_RETURNED", 31.2)
+    assert not ledger.is_applied("A2", "ORDER_UPDATE", 31.2)
+
+
+def test_newer_modification_replaces_older_one(tmp_path):
+    ledger = ActionLedger(str(tmp_path / "ledger.sqlite"))
+    ledger.record("A1", "ORDER_UPDATE", 31.2)
+    ledger.record("A1", "ITEM_RETURNED", 0)
+
+    assert ledger.is_applied("A1", "ITEM_RETURNED", 0)
+    assert not ledger.is_applied("A1", "ORDER_UPDATE", 31.2)
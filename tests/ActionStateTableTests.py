@@ -0,0 +1,39 @@
+from helpers.ActionStateTable import ActionStateTable, ActionRecord
+
+
+def test_set_moves_actions_between_state_indexes():
+    table = ActionStateTable()
+    table.add("A1", 1)
+    table.add("A2", 2)
+    table.set("A1", "Not_Processed", 1, None, "Not Processed")
+    table.set("A1", "ITEM_RETURNED", 1, 0.0, "ITEM_RETURNED")
+    table.finalize()
+
+    assert table.count("Not_Processed") == 0
+    assert [r.action_id for r in table.records("ITEM_RETURNED")] == ["A1"]
+    assert [r.action_id for r in table.records("Not_Modified")] == ["A2"]
+    stats = table.stats()
+    assert stats["total_actions"] == 2 and stats["ITEM_RETURNED"] == 1 and stats["Not_Modified"] == 1
+
+
+def test_records_read_like_actions_by_state_entries():
+    table = ActionStateTable()
+    table.set("A1", "ORDER_UPDATE", 7, 31.2, "ORDER_UPDATE")
+    record = table.actions_by_state()["ORDER_UPDATE"][0]
+
+    assert record.get("orderId") == 7 and record["amount"] == 31.2 and record.get("missing") is None
+    assert record.to_dict() == {"orderId": 7, "amount": 31.2, "reason": "ORDER_UPDATE"}
+
+
+def test_records_use_slots():
+    assert not hasattr(ActionRecord("A1", 1), "__dict__")
+
+
+def test_finalize_is_linear_on_large_markets():
+    table = ActionStateTable()
+    for i in range(50000):
+        table.add(f"A{i}", i)
+        if i % 2:
+            table.set(f"A{i}", "OTHER", i, 0.0, "OTHER")
+    table.finalize()
+    assert table.count("Not_Modified") == 25000 and table.count("OTHER") == 25000
@@ -0,0 +1,144 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from clients.AsyncHttpSession import AsyncHttpSession, close_shared_async_session
+from clients.AsyncImpactClient import AsyncImpactClient
+from clients.AsyncPATAClient import AsyncPATAClient
+
+CONFIG = {"account_SID_DK": "test_sid", "token_DK": "test_token"}
+
+
+def run_with_server(routes, scenario):
+    """Start a local aiohttp server for `routes`, point both clients at it and run `scenario(base_url)`."""
+    async def runner():
+        app = web.Application()
+        app.add_routes(routes)
+        server = TestServer(app)
+        await server.start_server()
+        base_url = str(server.make_url("/"))
+        try:
+            with patch("clients.ImpactClient.BASE_URL", base_url), \
+                    patch("clients.AsyncImpactClient.BASE_URL", base_url), \
+                    patch("clients.AsyncPATAClient.PATA_BASE_URL", base_url):
+                return await scenario(base_url)
+        finally:
+            await close_shared_async_session()
+            await server.close()
+
+    return asyncio.run(runner())
+
+
+def test_get_actions_gathers_pages_in_order():
+    pages = {1: [{"Id": "A1"}, {"Id": "A2"}], 2: [{"Id": "A3"}, {"Id": "A4"}], 3: [{"Id": "A5"}]}
+
+    async def actions(request):
+        page = int(request.query["PageNumber"])
+        if page == 2:
+            await asyncio.sleep(0.05)  # answer out of order
+        return web.json_response({"Actions": pages[page], "@numpages": "3"})
+
+    async def scenario(base_url):
+        client = AsyncImpactClient(CONFIG, "DK")
+        return await client.get_actions(30761, "2025-09-01", "2025-09-02", page_size=2)
+
+    result = run_with_server([web.get("/test_sid/Actions", actions)], scenario)
+
+    assert [a["Id"] for a in result] == ["A1", "A2", "A3", "A4", "A5"]
+
+
+def test_get_actions_error_raises():
+    async def actions(request):
+        return web.Response(status=401, text="Unauthorized")
+
+    async def scenario(base_url):
+        client = AsyncImpactClient(CONFIG, "DK")
+        with pytest.raises(ValueError):
+            await client.get_actions(30761, "2025-09-01", "2025-09-02")
+
+    run_with_server([web.get("/test_sid/Actions", actions)], scenario)
+
+
+def test_iter_action_pages_streams_pages_in_order():
+    pages = {1: [{"Id": "A1"}, {"Id": "A2"}], 2: [{"Id": "A3"}, {"Id": "A4"}], 3: [{"Id": "A5"}]}
+
+    async def actions(request):
+        return web.json_response({"Actions": pages[int(request.query["PageNumber"])], "@numpages": "3"})
+
+    async def scenario(base_url):
+        client = AsyncImpactClient(CONFIG, "DK")
+        page_ids = [[a["Id"] for a in page]
+                    async for page in client.iter_action_pages(30761, "2025-09-01", "2025-09-02", page_size=2)]
+        action_ids = [a["Id"] async for a in client.iter_actions(30761, "2025-09-01", "2025-09-02", page_size=2)]
+        return page_ids, action_ids, hasattr(client, "session")
+
+    page_ids, action_ids, has_sync_session = run_with_server([web.get("/test_sid/Actions", actions)], scenario)
+
+    assert page_ids == [["A1", "A2"], ["A3", "A4"], ["A5"]]
+    assert action_ids == ["A1", "A2", "A3", "A4", "A5"]
+    assert not has_sync_session
+
+
+def test_update_and_reverse_action():
+    received = []
+
+    async def write(request):
+        form = await request.post()
+        received.append((request.method, form["ActionId"], form["Amount"], form["Reason"]))
+        if form["ActionId"] == "BAD":
+            return web.Response(status=400, text="bad")
+        return web.json_response({"Status": "OK"})
+
+    async def scenario(base_url):
+        client = AsyncImpactClient(CONFIG, "DK")
+        return await asyncio.gather(
+            client.update_action("A1", 12.5, "ORDER_UPDATE"),
+            client.reverse_action("A2", 0, "ITEM_RETURNED"),
+            client.reverse_action("BAD", 0, "OTHER"),
+        )
+
+    routes = [web.put("/test_sid/Actions", write), web.delete("/test_sid/Actions", write)]
+    updated, reversed_, failed = run_with_server(routes, scenario)
+
+    assert updated == {"Status": "OK"} and reversed_ == {"Status": "OK"}
+    assert failed is None
+    assert ("PUT", "A1", "12.5", "ORDER_UPDATE") in received
+
+
+def test_only_reads_are_retried_on_retry_statuses():
+    calls = []
+
+    async def flaky(request):
+        calls.append(request.method)
+        return web.Response(status=502, text="bad gateway")
+
+    async def scenario(base_url):
+        session = AsyncHttpSession(max_retries=2, backoff_factor=0)
+        try:
+            put = await session.request("PUT", base_url + "flaky")
+            get = await session.request("GET", base_url + "flaky")
+        finally:
+            await session.close()
+        return put[0], get[0]
+
+    assert run_with_server([web.put("/flaky", flaky), web.get("/flaky", flaky)], scenario) == (502, 502)
+    assert calls == ["PUT", "GET", "GET", "GET"]
+
+
+def test_retrieve_order():
+    async def order(request):
+        if request.match_info["uuid"] == "missing":
+            return web.Response(status=404, text="not found")
+        return web.json_response({"data": {"orderId": request.match_info["uuid"]}})
+
+    async def scenario(base_url):
+        client = AsyncPATAClient()
+        return await asyncio.gather(client.retrieve_order("DK", "abc"), client.retrieve_order("DK", "missing"))
+
+    found, missing = run_with_server([web.get("/dk/order/{uuid}", order)], scenario)
+
+    assert found == {"data": {"orderId": "abc"}}
+    assert missing is None
@@ -0,0 +1,32 @@
+from helpers.CheckpointStore import CheckpointStore
+from main import Outcome
+
+
+def test_completed_skips_not_processed_and_survives_reopen(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    store = CheckpointStore(path, flush_every=2)
+    store.record("run-1", 30761, "A1", Outcome("ITEM_RETURNED", 101, 0.0, "ITEM_RETURNED", None))
+    store.record("run-1", 30761, "A2", Outcome("Not_Processed", 102, None, "Not Processed",
+                                               {"market": "DK", "action_id": "A2"}))
+    store.record("run-1", 30761, "A3", Outcome("Not_Modified", 103, None, "Not Modified", None))
+    store.close()
+
+    reopened = CheckpointStore(path)
+    completed = reopened.completed("run-1", 30761)
+
+    assert set(completed) == {"A1", "A3"}
+    assert completed["A1"] == ("ITEM_RETURNED", 101, 0.0, "ITEM_RETURNED", None)
+    assert reopened.completed("run-2", 30761) == {}
+    assert reopened.completed("run-1", 30894) == {}
+
+
+def test_last_unfinished_run(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite"))
+    store.start_run("run-1", {"markets": ["DK"]})
+    store.start_run("run-2", {"markets": ["UK"], "start_date": "2025-09-01"})
+    store.finish_run("run-1")
+
+    assert store.last_unfinished_run() == ("run-2", {"markets": ["UK"], "start_date": "2025-09-01"})
+    assert store.last_unfinished_run(skip=["run-2"]) is None
+    store.finish_run("run-2", "error")
+    assert store.last_unfinished_run() is None
@@ -0,0 +1,54 @@
+from helpers.DecisionMemo import DecisionMemo, order_fingerprint
+
+ORDER = {
+    "data": {
+        "orderId": 1,
+        "voucher": {"code": None},
+        "positions": [{"status": "sent", "amount": 1, "price": {"amount": 3900}}],
+        "history": [{"type": "internal note", "message": "ok"}, {"type": "email", "message": "hi"}],
+        "customer": {"name": "A"},
+    }
+}
+
+
+def with_data(**changes):
+    return {"data": {**ORDER["data"], **changes}}
+
+
+def test_fingerprint_ignores_fields_the_rules_do_not_read():
+    assert order_fingerprint("DK", ORDER, "v1") == order_fingerprint("DK", with_data(customer={"name": "B"}), "v1")
+    assert order_fingerprint("DK", ORDER, "v1") == order_fingerprint(
+        "DK", with_data(history=[{"type": "internal note", "message": "ok"}]), "v1")
+
+
+def test_fingerprint_changes_with_rule_inputs():
+    base = order_fingerprint("DK", ORDER, "v1")
+    assert order_fingerprint("SE", ORDER, "v1") != base
+    assert order_fingerprint("DK", ORDER, "v2") != base
+    assert order_fingerprint("DK", with_data(voucher={"code": "X"}), "v1") != base
+    assert order_fingerprint("DK", with_data(positions=[{"status": "sent", "amount": 0}]), "v1") != base
+    assert order_fingerprint("DK", with_data(history=[{"type": "internal note", "message": "fraud risk"}]), "v1") != base
+
+
+def test_memo_hit_and_changed_orders():
+    memo = DecisionMemo()
+    assert memo.get("DK", "o1", "f1") is None
+    memo.put("o1", "f1", ("ORDER_UPDATE", 31.2))
+
+    assert memo.get("DK", "o1", "f1") == ("ORDER_UPDATE", 31.2)
+    assert memo.get("DK", "o1", "f2") is None
+    assert memo.take_changed("DK") == ["o1"]
+    assert memo.take_changed("DK") == []
+
+
+def test_memo_is_bounded_and_persists(tmp_path):
+    path = str(tmp_path / "decisions.sqlite")
+    memo = DecisionMemo(max_entries=2, disk_path=path)
+    for i in range(3):
+        memo.put(f"o{i}", "f", (None, None))
+    memo.flush()
+    assert list(memo.entries) == ["o1", "o2"]
+
+    reopened = DecisionMemo(disk_path=path)
+    assert reopened.get("DK", "o0", "f") == (None, None)
+    assert reopened.hits == 1
@@ -0,0 +1,52 @@
+import pytest
+
+from clients import HttpSession
+from clients.ImpactClient import ImpactClient
+from clients.PATAclient import PATAClient
+
+
+@pytest.fixture(autouse=True)
+def fresh_shared_session():
+    HttpSession.reset_shared_session()
+    yield
+    HttpSession.reset_shared_session()
+
+
+def test_shared_session_is_reused_across_clients_and_markets():
+    config = {"account_SID_DK": "sid_dk", "token_DK": "tok_dk",
+              "account_SID_UK": "sid_uk", "token_UK": "tok_uk"}
+
+    dk_client = ImpactClient(config, "DK")
+    uk_client = ImpactClient(config, "UK")
+    pata_client = PATAClient()
+
+    assert dk_client.session is uk_client.session
+    assert pata_client.session is dk_client.session
+
+
+def test_pool_settings_are_read_from_config():
+    config = {"http_pool_maxsize": 64, "http_max_retries": 5}
+
+    session = HttpSession.get_shared_session(config)
+    adapter = session.get_adapter("https://api.impact.com")
+
+    assert adapter._pool_maxsize == 64
+    assert adapter.max_retries.total == 5
+    assert 503 in adapter.max_retries.status_forcelist
+
+
+def test_explicit_session_overrides_shared_one():
+    session = HttpSession.create_session(pool_maxsize=2)
+
+    client = PATAClient(session=session)
+
+    assert client.session is session
+
+
+def test_writes_are_only_retried_when_the_connection_failed():
+    retry = HttpSession.create_session().get_adapter("https://api.impact.com").max_retries
+
+    assert retry.is_retry("GET", 502)
+    assert not retry.is_retry("PUT", 502) and not retry.is_retry("DELETE", 503)
+    assert not retry._is_method_retryable("PUT")
+    assert retry.connect > 0
@@ -1,7 +1,12 @@
 import pytest
 import datetime
+import threading
+import time
+import io
+import json
 from unittest.mock import patch, MagicMock
 
+from clients.ImpactActions import ImpactAction
 from clients.ImpactClient import ImpactClient
 
 
@@ -33,7 +38,7 @@ def make_response(status=200, json_data=None):
 
 # ---- Tests ----
 
-@patch("clients.ImpactClient.requests.get")
+@patch("requests.Session.get")
 def test_get_actions_success(mock_get, client):
     # First page returns 2 actions
     mock_get.side_effect = [
@@ -48,7 +53,7 @@ def test_get_actions_success(mock_get, client):
     assert mock_get.call_count == 2
 
 
-@patch("clients.ImpactClient.requests.get")
+@patch("requests.Session.get")
 def test_get_actions_http_error(mock_get, client):
     mock_get.return_value = make_response(status=500)
 
@@ -58,7 +63,7 @@ def test_get_actions_http_error(mock_get, client):
     assert mock_get.called
 
 
-@patch("clients.ImpactClient.requests.get")
+@patch("requests.Session.get")
 def test_retrieve_action_success(mock_get, client):
     mock_get.return_value = make_response(json_data={"Id": "A1", "Status": "APPROVED"})
 
@@ -68,7 +73,7 @@ def test_retrieve_action_success(mock_get, client):
     mock_get.assert_called_once()
 
 
-@patch("clients.ImpactClient.requests.get")
+@patch("requests.Session.get")
 def test_retrieve_action_failure(mock_get, client):
     mock_get.return_value = make_response(status=404)
 
@@ -77,7 +82,7 @@ def test_retrieve_action_failure(mock_get, client):
     assert result is None
 
 
-@patch("clients.ImpactClient.requests.put")
+@patch("requests.Session.put")
 def test_update_action_success(mock_put, client):
     mock_put.return_value = make_response(json_data={"Id": "A1", "Updated": True})
 
@@ -87,7 +92,7 @@ def test_update_action_success(mock_put, client):
     mock_put.assert_called_once()
 
 
-@patch("clients.ImpactClient.requests.put")
+@patch("requests.Session.put")
 def test_update_action_failure(mock_put, client):
     mock_put.return_value = make_response(status=400)
 
@@ -96,7 +101,7 @@ def test_update_action_failure(mock_put, client):
     assert result is None
 
 
-@patch("clients.ImpactClient.requests.delete")
+@patch("requests.Session.delete")
 def test_reverse_action_success(mock_delete, client):
     mock_delete.return_value = make_response(json_data={"Id": "A1", "Reversed": True})
 
@@ -106,10 +111,249 @@ def test_reverse_action_success(mock_delete, client):
     mock_delete.assert_called_once()
 
 
-@patch("clients.ImpactClient.requests.delete")
+@patch("requests.Session.delete")
 def test_reverse_action_failure(mock_delete, client):
     mock_delete.return_value = make_response(status=403)
 
     result = client.reverse_action("A1", 50, "Return")
 
     assert result is None
+
+
+def _paged_get(pages, num_pages=None):
+    """Fake Session.get that answers by PageNumber, with optional @numpages metadata"""
+    def fake_get(url, params=None, **kwargs):
+        page = params["PageNumber"]
+        body = {"Actions": pages[page - 1]}
+        if num_pages is not None:
+            body["@numpages"] = str(num_pages)
+        return make_response(json_data=body)
+    return fake_get
+
+
+@patch("requests.Session.get")
+def test_get_actions_fans_out_remaining_pages_in_order(mock_get, client):
+    pages = [[{"Id": "A1"}, {"Id": "A2"}], [{"Id": "A3"}, {"Id": "A4"}], [{"Id": "A5"}]]
+    mock_get.side_effect = _paged_get(pages, num_pages=3)
+
+    actions = client.get_actions(30761, "2025-09-01", "2025-09-02", page_size=2, max_workers=2)
+
+    assert [a["Id"] for a in actions] == ["A1", "A2", "A3", "A4", "A5"]
+    assert mock_get.call_count == 3
+
+
+@patch("requests.Session.get")
+def test_get_actions_without_metadata_walks_serially(mock_get, client):
+    pages = [[{"Id": "A1"}, {"Id": "A2"}], [{"Id": "A3"}]]
+    mock_get.side_effect = _paged_get(pages)
+
+    actions = client.get_actions(30761, "2025-09-01", "2025-09-02", page_size=2)
+
+    assert [a["Id"] for a in actions] == ["A1", "A2", "A3"]
+    assert mock_get.call_count == 2
+
+
+@patch("requests.Session.get")
+def test_get_actions_page_error_raises(mock_get, client):
+    mock_get.return_value = make_response(status=500)
+
+    with pytest.raises(ValueError):
+        client.get_actions(30761, "2025-09-01", "2025-09-02")
+
+
+@patch("requests.Session.get")
+def test_iter_action_pages_prefetches_and_keeps_order(mock_get, client):
+    pages = [[{"Id": "A1"}, {"Id": "A2"}], [{"Id": "A3"}, {"Id": "A4"}], [{"Id": "A5"}]]
+    mock_get.side_effect = _paged_get(pages, num_pages=3)
+
+    result = list(client.iter_action_pages(30761, "2025-09-01", "2025-09-02", page_size=2))
+
+    assert result == pages
+    assert mock_get.call_count == 3
+
+
+def test_iter_action_pages_keeps_a_bounded_number_of_pages_in_flight(client):
+    pages = [[{"Id": f"A{n}"}] for n in range(1, 8)]
+    lock = threading.Lock()
+    in_flight, peak = [0], [0]
+
+    def fetch_page(url, params, page_number):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        return {"Actions": pages[page_number - 1], "@numpages": str(len(pages))}
+
+    with patch.object(client, "fetch_actions_page", side_effect=fetch_page) as fetch:
+        result = list(client.iter_action_pages(30761, "2025-09-01", "2025-09-02", page_size=1, max_workers=3))
+
+    assert result == pages
+    assert fetch.call_count == 7
+    assert 1 < peak[0] <= 3
+
+
+@patch("requests.Session.get")
+def test_iter_actions_without_prefetch_stops_on_short_page(mock_get, client):
+    pages = [[{"Id": "A1"}, {"Id": "A2"}], [{"Id": "A3"}]]
+    mock_get.side_effect = _paged_get(pages)
+
+    actions = client.iter_actions(30761, "2025-09-01", "2025-09-02", page_size=2, prefetch=False)
+
+    assert next(actions)["Id"] == "A1"
+    assert mock_get.call_count == 1  # nothing fetched ahead of the consumer
+    assert [a["Id"] for a in actions] == ["A2", "A3"]
+    assert mock_get.call_count == 2
+
+
+@patch("clients.ImpactClient.time_module.sleep")
+@patch("requests.Session.get")
+@patch("requests.Session.post")
+def test_modify_actions_batch_maps_row_results(mock_post, mock_get, mock_sleep, client):
+    mock_post.return_value = make_response(json_data={"JobId": "J1", "Status": "QUEUED"})
+    results_csv = MagicMock(status_code=200, text="ActionId,Status,Message\nA1,SUCCESS,\nA2,FAILED,Locked action\n")
+    mock_get.side_effect = [
+        make_response(json_data={"Status": "RUNNING"}),
+        make_response(json_data={"Status": "COMPLETED"}),
+        results_csv,
+    ]
+    rows = [
+        {"action_id": "A1", "amount": 10.0, "reason": "ORDER_UPDATE"},
+        {"action_id": "A2", "amount": 0, "reason": "ITEM_RETURNED"},
+        {"action_id": "A3", "amount": 0, "reason": "OTHER"},
+    ]
+
+    results = client.modify_actions_batch(rows)
+
+    assert results["A1"] == (True, "")
+    assert results["A2"] == (False, "Locked action")
+    assert results["A3"][0] is False
+    uploaded = mock_post.call_args.kwargs["files"]["File"][1].decode()
+    assert uploaded.splitlines()[0] == "ActionId,Amount,Reason"
+    assert "A1,10.0,ORDER_UPDATE" in uploaded
+
+
+@patch("requests.Session.post")
+def test_modify_actions_batch_failed_upload_fails_all_rows(mock_post, client):
+    mock_post.return_value = make_response(status=400)
+    rows = [{"action_id": "A1", "amount": 0, "reason": "OTHER"}, {"action_id": "A2", "amount": 0, "reason": "OTHER"}]
+
+    results = client.modify_actions_batch(rows, batch_size=1)
+
+    assert all(not ok for ok, _ in results.values())
+    assert mock_post.call_count == 2
+
+
+def test_build_actions_request_starts_from_later_watermark(client):
+    _, params = client.build_actions_request(30761, "2025-09-01", "2025-09-30", since="2025-09-12T08:30:00+00:00")
+    assert params["ActionDateStart"] == "2025-09-12T08:30:00Z"
+
+    _, params = client.build_actions_request(30761, "2025-09-01", "2025-09-30", since="2025-08-01T00:00:00+00:00")
+    assert params["ActionDateStart"] == "2025-08-31T22:00:00Z"
+
+
+@patch("requests.Session.get")
+def test_fetch_actions_page_projects_actions_to_slim_records(mock_get, client):
+    mock_get.return_value = make_response(json_data={
+        "@numpages": "1",
+        "@total": "1",
+        "Actions": [{"Id": "A1", "Oid": "42", "AdId": "7", "State": "PENDING", "Uri": "/x", "CustomerArea": "DK"}],
+    })
+
+    page = client.fetch_actions_page("url", {"CampaignId": 1}, 1)
+
+    action = page["Actions"][0]
+    assert isinstance(action, ImpactAction)
+    assert not hasattr(action, "__dict__")
+    assert action["Id"] == "A1" and action.get("Oid") == "42"
+    assert action.get("Uri") is None and action.get("CustomerArea", "-") == "-"
+    assert page["@numpages"] == "1"
+
+
+@patch("requests.Session.get")
+def test_fetch_actions_page_streaming_parses_the_raw_body(mock_get, client):
+    body = {"@page": "2", "@numpages": "3", "Actions": [
+        {"Id": "A1", "Oid": "42", "Amount": "10.5", "Extra": {"Nested": [1, 2]}},
+        {"Id": "A2", "Oid": "43", "Amount": "0"},
+    ]}
+    response = make_response()
+    response.raw = io.BytesIO(json.dumps(body).encode())
+    mock_get.return_value = response
+    client.streaming = True
+
+    page = client.fetch_actions_page("url", {"CampaignId": 1}, 2)
+
+    assert mock_get.call_args.kwargs["stream"] is True
+    response.json.assert_not_called()
+    response.close.assert_called_once()
+    assert page["Actions"] == [{"Id": "A1", "Oid": "42", "Amount": "10.5"}, {"Id": "A2", "Oid": "43", "Amount": "0"}]
+    assert client.page_count(page) == 3
+
+
+@patch("requests.Session.get")
+def test_fetch_actions_page_without_projection_keeps_raw_dicts(mock_get, client):
+    mock_get.return_value = make_response(json_data={"Actions": [{"Id": "A1", "Uri": "/x"}]})
+    client.projection = False
+
+    page = client.fetch_actions_page("url", {"CampaignId": 1}, 1)
+
+    assert page["Actions"] == [{"Id": "A1", "Uri": "/x"}]
+    assert type(page["Actions"][0]) is dict
+
+
+def test_date_shards_split_the_window_into_days_and_weeks():
+    assert ImpactClient.date_shards("2025-03-29", "2025-03-31", "day") == [
+        ("2025-03-29", "2025-03-29"), ("2025-03-30", "2025-03-30"), ("2025-03-31", "2025-03-31")]
+    assert ImpactClient.date_shards("2025-01-01", "2025-01-17", "week") == [
+        ("2025-01-01", "2025-01-07"), ("2025-01-08", "2025-01-14"), ("2025-01-15", "2025-01-17")]
+    with pytest.raises(ValueError):
+        ImpactClient.date_shards("2025-01-01", "2025-01-17", "month")
+
+
+def test_day_shards_meet_at_local_midnight_across_dst(client):
+    # Copenhagen switches to summer time on 2025-03-30 (a 23h day) and back on 2025-10-26 (a 25h day)
+    for start, end in (("2025-03-29", "2025-03-31"), ("2025-10-25", "2025-10-27")):
+        windows = [client.local_to_utc_from_campaign(30761, s, e)
+                   for s, e in ImpactClient.date_shards(start, end, "day")]
+        whole = client.local_to_utc_from_campaign(30761, start, end)
+
+        assert windows[0][0] == whole[0] and windows[-1][1] == whole[1]
+        for (_, previous_end), (next_start, _) in zip(windows, windows[1:]):
+            gap = datetime.datetime.fromisoformat(next_start) - datetime.datetime.fromisoformat(previous_end)
+            assert gap == datetime.timedelta(microseconds=1)
+
+
+@patch("requests.Session.get")
+def test_sharded_pages_are_merged_in_shard_order_without_duplicates(mock_get, client):
+    by_day = {
+        "2025-09-01T": [{"Id": "A1"}, {"Id": "A2"}],
+        "2025-09-02T": [{"Id": "A2"}, {"Id": "A3"}],  # A2 also returned for the neighbouring shard
+        "2025-09-03T": [{"Id": "A4"}],
+    }
+
+    def fake_get(url, params=None, **kwargs):
+        day = next(d for d in by_day if params["ActionDateEnd"].startswith(d))
+        return make_response(json_data={"@numpages": "1", "Actions": by_day[day]})
+    mock_get.side_effect = fake_get
+
+    pages = list(client.iter_sharded_action_pages(30761, "2025-09-01", "2025-09-03", "day", max_workers=3))
+
+    assert [[a["Id"] for a in page] for page in pages] == [["A1", "A2"], ["A3"], ["A4"]]
+
+
+@patch("requests.Session.get")
+def test_failed_shard_is_retried_on_its_own(mock_get, client):
+    calls = []
+
+    def fake_get(url, params=None, **kwargs):
+        calls.append(params["ActionDateEnd"][:10])
+        if params["ActionDateEnd"].startswith("2025-09-02") and calls.count("2025-09-02") == 1:
+            return make_response(status=500)
+        return make_response(json_data={"@numpages": "1", "Actions": [{"Id": params["ActionDateEnd"][:10]}]})
+    mock_get.side_effect = fake_get
+
+    pages = list(client.iter_sharded_action_pages(30761, "2025-09-01", "2025-09-03", "day", max_workers=1))
+
+    assert [page[0]["Id"] for page in pages] == ["2025-09-01", "2025-09-02", "2025-09-03"]
+    assert sorted(calls) == ["2025-09-01", "2025-09-02", "2025-09-02", "2025-09-03"]
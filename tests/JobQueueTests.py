@@ -0,0 +1,218 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.worker import JobWorker
+from helpers.JobQueue import SQLiteJobQueue, MarketsBusyError, QUEUED, RUNNING, FINISHED, ERROR
+from helpers.RunRegistry import RunRegistry
+
+
+def test_jobs_are_claimed_once_in_queue_order(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    queue = SQLiteJobQueue(path)
+    for n in range(20):
+        queue.enqueue("run", {"run_id": f"run-{n}", "markets": [f"M{n}"]}, job_id=f"run-{n}")
+
+    # Several processes' worth of connections claiming at once
+    queues = [SQLiteJobQueue(path) for _ in range(4)]
+    claimed, lock = [], threading.Lock()
+
+    def work(q, worker_id):
+        while (job := q.claim(worker_id)) is not None:
+            with lock:
+                claimed.append(job["job_id"])
+
+    threads = [threading.Thread(target=work, args=(q, f"w{i}")) for i, q in enumerate(queues)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(f"run-{n}" for n in range(20))
+    assert queue.active() and all(job["state"] == RUNNING for job in queue.active())
+
+
+def test_status_is_published_and_completed(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite"))
+    queue.enqueue("run", {"markets": ["DK"]}, job_id="run-1")
+    assert queue.latest()["state"] == QUEUED
+
+    job = queue.claim("w1")
+    assert job["params"] == {"markets": ["DK"]} and job["attempts"] == 1
+    assert queue.heartbeat("run-1", "w1", {"status": "running", "market_stats": {"DK": {"total_actions": 3}}})
+    assert not queue.heartbeat("run-1", "w2", {"status": "hijacked"})
+    assert queue.get("run-1")["status"]["market_stats"] == {"DK": {"total_actions": 3}}
+
+    queue.complete("run-1", "w1", FINISHED, {"status": "finished"})
+    assert queue.get("run-1")["state"] == FINISHED
+    assert queue.get("run-1")["status"] == {"status": "finished"}
+    assert queue.active() == []
+
+
+def test_expired_lease_is_requeued(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite"), lease_seconds=0)
+    queue.enqueue("run", {}, job_id="run-1")
+    queue.claim("dead-worker")
+    time.sleep(0.01)
+
+    assert queue.requeue_expired() == ["run-1"]
+    job = queue.claim("w2")
+    assert job["job_id"] == "run-1" and job["attempts"] == 2
+
+
+def test_worker_runs_job_and_resumes_reclaimed_runs(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite"))
+    calls = []
+
+    def fake_run(**params):
+        calls.append(params)
+        if params["run_id"] == "run-2":
+            raise RuntimeError("boom")
+
+    statuses = {"run-1": "finished", "run-2": "error"}
+    snapshot = lambda run_id: {"status": statuses[run_id], "run_id": run_id}
+    worker = JobWorker(queue, worker_id="w1", heartbeat_seconds=0.01)
+
+    queue.enqueue("run", {"run_id": "run-1", "markets": ["DK"], "resume": False}, job_id="run-1")
+    queue.enqueue("run", {"run_id": "run-2", "markets": ["SE"], "resume": False}, job_id="run-2")
+    queue.lease_seconds = 0
+    queue.claim("dead-worker")  # run-1 was taken by a worker that died
+    with patch.object(JobWorker, "_runners", return_value=({"run": fake_run}, snapshot, RunRegistry())):
+        time.sleep(0.01)
+        assert worker.run_once() and worker.run_once()
+        assert not worker.run_once()
+
+    assert [c["run_id"] for c in calls] == ["run-1", "run-2"]
+    assert calls[0]["resume"] is True and calls[1]["resume"] is False
+    assert queue.get("run-1")["state"] == FINISHED
+    assert queue.get("run-2")["state"] == ERROR
+
+
+def test_worker_cancels_the_run_when_another_worker_took_the_job(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite"))
+    cancelled = []
+
+    def fake_run(cancel, **params):
+        # Lease runs out and a second worker takes the job over
+        queue.lease_seconds = -1
+        while queue.claim("w2") is None:
+            queue.requeue_expired()
+            time.sleep(0.01)
+        queue.lease_seconds = 120
+        cancelled.append(cancel.wait(2))
+
+    snapshot = lambda run_id: {"status": "finished", "run_id": run_id}
+    worker = JobWorker(queue, worker_id="w1", heartbeat_seconds=0.01)
+    queue.enqueue("run", {"run_id": "run-1", "markets": ["DK"]}, job_id="run-1")
+    with patch.object(JobWorker, "_runners", return_value=({"run": fake_run}, snapshot, RunRegistry())):
+        assert worker.run_once()
+
+    assert cancelled == [True]
+    job = queue.get("run-1")
+    assert job["state"] == RUNNING and job["worker"] == "w2"
+    assert not queue.complete("run-1", "w1", FINISHED)
+
+
+def test_heartbeat_publishes_a_compact_status_only_when_it_changed(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite"))
+    published = []
+    heartbeat = queue.heartbeat
+
+    def record(job_id, worker_id, status=None):
+        published.append(status)
+        return heartbeat(job_id, worker_id, status)
+
+    queue.heartbeat = record
+    status = {"status": "running", "run_id": "run-1", "not_processed": [{"action_id": str(n)} for n in range(5)]}
+    fake_run = lambda cancel, **params: time.sleep(0.1)
+    worker = JobWorker(queue, worker_id="w1", heartbeat_seconds=0.01, heartbeat_not_processed=2)
+    queue.enqueue("run", {"run_id": "run-1", "markets": ["DK"]}, job_id="run-1")
+    with patch.object(JobWorker, "_runners", return_value=({"run": fake_run}, lambda run_id: status, RunRegistry())):
+        assert worker.run_once()
+
+    sent = [s for s in published if s is not None]
+    assert len(published) > 1 and len(sent) == 1
+    assert sent[0]["not_processed"] == [{"action_id": "3"}, {"action_id": "4"}]
+    assert len(queue.get("run-1")["status"]["not_processed"]) == 5
+
+
+def test_runs_for_disjoint_markets_are_active_together(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite"))
+    queue.enqueue("run", {"markets": ["DK", "SE"]}, job_id="run-1")
+    queue.enqueue("apply_plan", {"markets": ["NO"]}, job_id="apply-p1")
+
+    with pytest.raises(MarketsBusyError) as busy:
+        queue.enqueue("run", {"markets": ["SE", "FI"]}, job_id="run-2")
+    assert busy.value.jobs == ["run-1"] and busy.value.markets == {"SE"}
+    with pytest.raises(MarketsBusyError):
+        queue.enqueue("run", {"markets": []}, job_id="run-all")  # no markets = all of them
+
+    queue.claim("w1")
+    queue.complete("run-1", "w1", FINISHED)
+    queue.enqueue("run", {"markets": ["SE", "FI"]}, job_id="run-2")
+    assert [job["job_id"] for job in queue.active()] == ["apply-p1", "run-2"]
+
+
+def test_active_job_is_not_queued_again(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite"))
+    queue.enqueue("run", {"markets": ["DK"]}, job_id="run-1")
+    queue.claim("w1")
+
+    with pytest.raises(MarketsBusyError) as busy:
+        queue.enqueue("run", {"markets": ["DK"], "resume": True}, job_id="run-1")
+    assert busy.value.jobs == ["run-1"]
+    assert queue.get("run-1")["state"] == RUNNING and queue.heartbeat("run-1", "w1")
+
+    queue.complete("run-1", "w1", ERROR)
+    queue.enqueue("run", {"markets": ["DK"], "resume": True}, job_id="run-1")
+    assert queue.get("run-1")["state"] == QUEUED
+
+
+def test_finished_jobs_beyond_retention_are_pruned(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite"), retention=2)
+    for n in range(4):
+        queue.enqueue("run", {"markets": [f"M{n}"]}, job_id=f"run-{n}")
+    for n in range(3):
+        job = queue.claim("w1")
+        queue.complete(job["job_id"], "w1", FINISHED)
+
+    assert queue.get("run-0") is None
+    assert queue.get("run-1")["state"] == queue.get("run-2")["state"] == FINISHED
+    assert queue.get("run-3")["state"] == QUEUED
+
+
+def test_run_events_are_logged_in_order_per_job(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite"))
+    queue.enqueue("run", {"markets": ["DK"]}, job_id="run-1")
+    runs = RunRegistry(on_event=queue.publish_event)
+
+    run = runs.start("run-1", ["DK"])
+    run.emit("market_started", market="DK")
+    run.emit("progress", market="DK", stats={"total_actions": 250})
+    run.update(status="finished", message="done")
+    runs.finish("run-1")
+
+    events = queue.events("run-1")
+    assert [event for _, event, _ in events] == ["run_started", "market_started", "progress", "run_finished"]
+    assert events[2][2] == {"market": "DK", "stats": {"total_actions": 250}}
+    assert events[3][2]["status"] == "finished"
+    assert [event for _, event, _ in queue.events("run-1", after=events[1][0])] == ["progress", "run_finished"]
+
+    # Re-queuing the run (resume) starts a new event log
+    queue.claim("w1")
+    queue.complete("run-1", "w1", FINISHED)
+    queue.enqueue("run", {"markets": ["DK"]}, job_id="run-1")
+    assert queue.events("run-1") == []
+
+
+def test_backend_missing_a_method_fails_on_creation():
+    from helpers.JobQueue import JobQueue
+
+    class Partial(JobQueue):
+        def enqueue(self, kind, params, job_id=None):
+            return job_id
+
+    with pytest.raises(TypeError):
+        Partial()
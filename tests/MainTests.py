@@ -0,0 +1,324 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers.ActionStateTable import ActionStateTable
+from main import main, Outcome, OrderLookups
+
+
+def test_pata_concurrency_prefers_market_specific_config():
+    config = {"pata_concurrency": 4, "pata_concurrency_DK": 2}
+
+    assert main._pata_concurrency(config, "DK") == 2
+    assert main._pata_concurrency(config, "UK") == 4
+    assert main._pata_concurrency({}, "UK") >= 1
+
+
+def test_resolve_action_shares_concurrent_lookups_and_attaches_errors():
+    pata_client = MagicMock()
+
+    def slow(market, order_uuid):
+        time.sleep(0.05)
+        return {"data": {"uuid": order_uuid}}
+
+    pata_client.retrieve_order.side_effect = slow
+    lookups = OrderLookups()
+    actions = [{"Id": "A1", "Oid": "10"}, {"Id": "A2", "Oid": "10"}, {"Id": "A3", "Oid": "bad"}]
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        resolved = list(pool.map(lambda action: main()._resolve_action(pata_client, "DK", action, lookups), actions))
+
+    assert pata_client.retrieve_order.call_count == 1
+    uuid_1, order_1, error_1 = resolved[0]
+    assert order_1["data"]["uuid"] == uuid_1 and error_1 is None
+    assert resolved[1] == resolved[0]
+    assert isinstance(resolved[2][2], ValueError)
+
+    # Decided orders are not looked up again
+    lookups.decisions[uuid_1] = ("ITEM_RETURNED", 0.0)
+    lookups.done(uuid_1)
+    assert main()._resolve_action(pata_client, "DK", actions[0], lookups) == (uuid_1, None, None)
+    assert pata_client.retrieve_order.call_count == 1
+
+
+def test_write_mode_resolution():
+    config = {"impact_write_mode": "batch", "impact_write_mode_UK": "single"}
+
+    assert main._write_mode(config, "DK") == "batch"
+    assert main._write_mode(config, "UK") == "single"
+    assert main._write_mode({}, "DK") == "single"
+    assert main._write_mode(config, "DK", "single") == "single"
+
+
+def test_apply_batch_books_results_into_states():
+    impact_client = MagicMock()
+    impact_client.modify_actions_batch.return_value = {"A1": (True, ""), "A2": (False, "Locked")}
+    pending = [
+        {"action_id": "A1", "orderId": 1, "amount": 8.0, "reason": "ORDER_UPDATE"},
+        {"action_id": "A2", "orderId": 2, "amount": 0, "reason": "ITEM_RETURNED"},
+    ]
+    table = ActionStateTable()
+    not_processed = []
+
+    main._apply_batch(impact_client, "DK", pending, table, not_processed)
+
+    assert table.count("ORDER_UPDATE") == 1 and table.count("ITEM_RETURNED") == 0 and table.count("Not_Processed") == 1
+    assert [r.to_dict() for r in table.records("ORDER_UPDATE")] == [{"orderId": 1, "amount": 8.0, "reason": "ORDER_UPDATE"}]
+    assert not_processed == [{"market": "DK", "action_id": 2, "error": "Locked"}]
+
+
+def test_next_watermark_stops_at_oldest_failed_action():
+    table = ActionStateTable()
+    table.add("A1", "1", "2025-09-01T10:00:00Z")
+    table.add("A2", "2", "2025-09-03T10:00:00Z")
+    table.add("A3", "3", "2025-09-05T10:00:00Z")
+
+    assert main._next_watermark(table) == "2025-09-05T10:00:00+00:00"
+    table.set("A2", "Not_Processed", 2, None, "Not Processed")
+    assert main._next_watermark(table) == "2025-09-03T10:00:00+00:00"
+
+    undated = ActionStateTable()
+    undated.add("A1", "1")
+    assert main._next_watermark(undated) is None
+
+
+# ---- process_single_market with fake clients ----
+
+import json
+from unittest.mock import patch
+
+from clients.ImpactClient import ImpactClient
+from helpers.ActionLedger import ActionLedger
+from helpers.CheckpointStore import CheckpointStore
+from helpers.DecisionMemo import DecisionMemo
+from helpers.PlanFile import PlanWriter, read_plan
+from utils.OrderMiiUUID import OrderMiiUUID
+from helpers.WatermarkStore import WatermarkStore
+
+SENT = {"data": {"positions": [{"status": "sent", "amount": 1, "price": {"amount": 10000}}]}}
+RETURNED = {"data": {"positions": [{"status": "rejected", "amount": 1, "price": {"amount": 10000}}]}}
+
+
+def run_market(monkeypatch, tmp_path, actions, orders, pages=None, start_date="2025-09-01", **kwargs):
+    """
+    Run process_single_market for DK (start_date..2025-09-30) against fake Impact/PATA clients;
+    returns (result, impact_client). pages: optional generator function replacing the single page of `actions`.
+    """
+    monkeypatch.setenv("impact_secret_json", json.dumps({"account_SID_DK": "sid", "token_DK": "tok"}))
+    impact_client = MagicMock()
+    impact_client.iter_action_pages.side_effect = lambda *args, **kw: pages() if pages else iter([actions])
+    impact_client.local_to_utc_from_campaign.side_effect = \
+        lambda *args: ImpactClient.local_to_utc_from_campaign(impact_client, *args)
+    impact_client.reverse_action.return_value = {"Status": "OK"}
+    impact_client.update_action.return_value = {"Status": "OK"}
+    pata_client = MagicMock()
+    pata_client.retrieve_order.side_effect = lambda market, uuid: orders[int(uuid.rsplit("-", 1)[1], 16)]
+
+    kwargs.setdefault("watermark_store", WatermarkStore(str(tmp_path / "watermarks.sqlite")))
+    kwargs.setdefault("ledger", ActionLedger(str(tmp_path / "ledger.sqlite")))
+    kwargs.setdefault("decision_memo", DecisionMemo())
+    impact_client.pata_client = pata_client  # exposed for assertions
+    with patch("main.ImpactClient", return_value=impact_client), patch("main.PATAClient", return_value=pata_client):
+        result = main().process_single_market(30761, "DK", start_date, "2025-09-30", **kwargs)
+    return result, impact_client
+
+
+def test_resume_skips_actions_completed_before_restart(monkeypatch, tmp_path):
+    actions = [{"Id": "A1", "Oid": "1", "AdId": "5"}, {"Id": "A2", "Oid": "2", "AdId": "5"}]
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite"))
+    store.record("run-1", 30761, "A1", Outcome("ITEM_RETURNED", 1, 0.0, "ITEM_RETURNED", None))
+
+    result, impact_client = run_market(monkeypatch, tmp_path, actions, {1: RETURNED, 2: RETURNED},
+                                       run_id="run-1", resume=True, checkpoint_store=store)
+
+    assert result["stats"]["ITEM_RETURNED"] == 2
+    impact_client.reverse_action.assert_called_once_with("A2", 0.0, "ITEM_RETURNED")
+    assert set(store.completed("run-1", 30761)) == {"A1", "A2"}
+
+
+def test_fetch_error_mid_stream_returns_partial_result(monkeypatch, tmp_path):
+    actions = [{"Id": "A1", "Oid": "1", "AdId": "5", "EventDate": "2025-09-02T10:00:00Z"},
+               {"Id": "A2", "Oid": "2", "AdId": "5", "EventDate": "2025-09-03T10:00:00Z"}]
+
+    def pages():
+        yield actions
+        raise ValueError("Error 500: Internal Server Error")
+
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite"), flush_every=100)
+    watermarks = WatermarkStore(str(tmp_path / "watermarks.sqlite"))
+    result, impact_client = run_market(monkeypatch, tmp_path, actions, {1: RETURNED, 2: RETURNED}, pages=pages,
+                                       run_id="run-1", checkpoint_store=store, watermark_store=watermarks,
+                                       incremental=True)
+
+    assert result["stats"]["ITEM_RETURNED"] == 2
+    assert result["error"] == "API error for market DK"
+    assert result["not_processed"] == [{"market": "DK", "action_id": "N/A", "error": "API error for market DK"}]
+    assert impact_client.reverse_action.call_count == 2
+    assert set(CheckpointStore(str(tmp_path / "checkpoints.sqlite")).completed("run-1", 30761)) == {"A1", "A2"}
+    assert watermarks.get(30761) is None
+
+
+def test_checkpoints_are_flushed_when_a_market_fails(monkeypatch, tmp_path):
+    actions = [{"Id": "A1", "Oid": "1", "AdId": "5"}, {"Id": "A2", "Oid": "2", "AdId": "5"}]
+    path = str(tmp_path / "checkpoints.sqlite")
+    book = main._book
+
+    def failing_book(table, action_id, outcome, not_processed_ids):
+        if action_id == "A2":
+            raise RuntimeError("boom")
+        book(table, action_id, outcome, not_processed_ids)
+
+    monkeypatch.setattr(main, "_book", staticmethod(failing_book))
+    with pytest.raises(RuntimeError):
+        run_market(monkeypatch, tmp_path, actions, {1: RETURNED, 2: RETURNED}, run_id="run-1",
+                   checkpoint_store=CheckpointStore(path, flush_every=100))
+
+    assert set(CheckpointStore(path).completed("run-1", 30761)) == {"A1"}
+
+
+def test_ledger_opened_for_a_market_is_closed(monkeypatch, tmp_path):
+    actions = [{"Id": "A1", "Oid": "1", "AdId": "5"}]
+    ledger = MagicMock()
+    ledger.is_applied.return_value = False
+    with patch("main.ActionLedger", return_value=ledger):
+        run_market(monkeypatch, tmp_path, actions, {1: RETURNED}, ledger=None)
+
+    ledger.close.assert_called_once()
+
+
+def test_fetch_error_before_any_action_is_raised(monkeypatch, tmp_path):
+    def pages():
+        raise ValueError("Error 401: Unauthorized")
+        yield
+
+    with pytest.raises(PermissionError):
+        run_market(monkeypatch, tmp_path, [], {}, pages=pages)
+
+
+def test_watermark_advances_only_from_a_window_reaching_back_to_it(monkeypatch, tmp_path):
+    actions = [{"Id": "A1", "Oid": "1", "AdId": "5", "EventDate": "2025-09-25T10:00:00Z"}]
+    watermarks = WatermarkStore(str(tmp_path / "watermarks.sqlite"))
+    watermarks.advance(30761, "2025-09-05T10:00:00Z")
+
+    # 2025-09-20.. leaves 09-05..09-20 unfetched: the watermark must not jump over it
+    run_market(monkeypatch, tmp_path, actions, {1: RETURNED}, start_date="2025-09-20", watermark_store=watermarks)
+    assert watermarks.get(30761) == "2025-09-05T10:00:00+00:00"
+
+    run_market(monkeypatch, tmp_path, actions, {1: RETURNED}, watermark_store=watermarks)
+    assert watermarks.get(30761) == "2025-09-25T10:00:00+00:00"
+
+
+def test_rerun_skips_modifications_already_in_ledger(monkeypatch, tmp_path):
+    actions = [{"Id": "A1", "Oid": "1", "AdId": "5"}, {"Id": "A2", "Oid": "2", "AdId": "5"}]
+    ledger = ActionLedger(str(tmp_path / "ledger.sqlite"))
+    ledger.record("A1", "ITEM_RETURNED", 0.0)
+    ledger.record("A2", "ORDER_UPDATE", 40.0)  # same action, different modification -> sent again
+
+    result, impact_client = run_market(monkeypatch, tmp_path, actions, {1: RETURNED, 2: RETURNED}, ledger=ledger)
+
+    assert result["stats"]["Already_Applied"] == 1
+    assert result["stats"]["ITEM_RETURNED"] == 1
+    impact_client.reverse_action.assert_called_once_with("A2", 0.0, "ITEM_RETURNED")
+    assert ledger.is_applied("A2", "ITEM_RETURNED", 0)
+
+
+def test_actions_of_the_same_order_share_one_lookup_and_decision(monkeypatch, tmp_path):
+    actions = [
+        {"Id": "A1", "Oid": "1", "AdId": "5"},
+        {"Id": "A2", "Oid": "1", "AdId": "6"},
+        {"Id": "A3", "Oid": "2", "AdId": "5"},
+        {"Id": "A4", "Oid": "1", "AdId": "7"},
+    ]
+
+    with patch.object(main, "_decide_order", wraps=main._decide_order) as rules:
+        result, impact_client = run_market(monkeypatch, tmp_path, actions, {1: RETURNED, 2: SENT})
+
+    assert rules.call_count == 2
+    assert impact_client.pata_client.retrieve_order.call_count == 2
+    assert result["stats"]["ITEM_RETURNED"] == 3
+    # Writes run concurrently in the apply stage, so their order is not fixed
+    assert sorted(c.args[0] for c in impact_client.reverse_action.call_args_list) == ["A1", "A2", "A4"]
+
+
+def test_unchanged_orders_reuse_memoized_decisions(monkeypatch, tmp_path):
+    actions = [{"Id": "A1", "Oid": "1", "AdId": "5"}, {"Id": "A2", "Oid": "2", "AdId": "5"}]
+    memo = DecisionMemo(disk_path=str(tmp_path / "decisions.sqlite"))
+    run_market(monkeypatch, tmp_path, actions, {1: RETURNED, 2: SENT}, decision_memo=memo)
+    memo.flush()
+
+    # Next run: fresh process (empty LRU), order 2 got returned in the meantime
+    memo = DecisionMemo(disk_path=str(tmp_path / "decisions.sqlite"))
+    with patch.object(main, "_evaluate_order", wraps=main._evaluate_order) as evaluate:
+        result, _ = run_market(monkeypatch, tmp_path, actions, {1: RETURNED, 2: RETURNED},
+                               decision_memo=memo, ledger=ActionLedger(str(tmp_path / "ledger2.sqlite")))
+
+    assert evaluate.call_count == 1
+    assert memo.hits == 1
+    assert result["changed_orders"] == [OrderMiiUUID("DK", 2).to_uuid_string()]
+    assert result["stats"]["ITEM_RETURNED"] == 2
+
+
+def test_pipeline_keeps_action_order_and_reports_stage_metrics(monkeypatch, tmp_path):
+    actions = [{"Id": f"A{i}", "Oid": str(i), "AdId": "5"} for i in range(1, 41)]
+    orders = {i: RETURNED if i % 2 else SENT for i in range(1, 41)}
+
+    result, impact_client = run_market(monkeypatch, tmp_path, actions, orders)
+
+    assert result["stats"]["total_actions"] == 40
+    assert result["stats"]["ITEM_RETURNED"] == 20
+    assert [entry["orderId"] for entry in result["actions_by_state"]["ITEM_RETURNED"]] == list(range(1, 41, 2))
+    metrics = result["pipeline"]
+    assert list(metrics) == ["fetch", "resolve", "decide", "apply"]
+    assert all(stage["processed"] == 40 for stage in metrics.values())
+
+
+def test_plan_run_writes_nothing_and_apply_executes_the_plan(monkeypatch, tmp_path):
+    actions = [{"Id": "A1", "Oid": "1", "AdId": "5"}, {"Id": "A2", "Oid": "2", "AdId": "5"},
+               {"Id": "A3", "Oid": "3", "AdId": "5"}]
+    path = str(tmp_path / "plan.jsonl")
+    plan = PlanWriter(path)
+    watermark_store = WatermarkStore(str(tmp_path / "watermarks.sqlite"))
+
+    result, impact_client = run_market(monkeypatch, tmp_path, actions, {1: RETURNED, 2: SENT, 3: RETURNED},
+                                       plan=plan, incremental=True, watermark_store=watermark_store)
+    plan.close()
+
+    assert result["stats"]["Planned"] == 2 and result["stats"]["Not_Modified"] == 1
+    impact_client.reverse_action.assert_not_called()
+    assert watermark_store.get(30761) is None
+    assert [row["action_id"] for row in read_plan(path)] == ["A1", "A3"]
+
+    ledger = ActionLedger(str(tmp_path / "ledger.sqlite"))
+    ledger.record("A3", "ITEM_RETURNED", 0.0)
+    with patch("main.ImpactClient", return_value=impact_client):
+        applied = main().apply_plan_market(path, "DK", ledger=ledger)
+
+    impact_client.reverse_action.assert_called_once_with("A1", 0.0, "ITEM_RETURNED")
+    assert applied["stats"]["ITEM_RETURNED"] == 1 and applied["stats"]["Already_Applied"] == 1
+    assert ledger.is_applied("A1", "ITEM_RETURNED", 0.0)
+
+
+def test_not_modified_lists_only_actions_without_a_modification(monkeypatch, tmp_path):
+    actions = [{"Id": "A1", "Oid": "1", "AdId": "5"}, {"Id": "A2", "Oid": "2", "AdId": "5"},
+               {"Id": "A3", "Oid": "bad", "AdId": "5"}]
+
+    result, _ = run_market(monkeypatch, tmp_path, actions, {1: RETURNED, 2: SENT})
+
+    assert result["stats"]["Not_Modified"] == 1
+    assert [r["orderId"] for r in result["actions_by_state"]["Not_Modified"]] == [2]
+    assert result["stats"]["total_actions"] == sum(
+        len(records) for records in result["actions_by_state"].values())
+
+
+def test_progress_reports_running_counters(monkeypatch, tmp_path):
+    actions = [{"Id": f"A{n}", "Oid": str(n), "AdId": "5"} for n in range(1, 6)]
+    monkeypatch.setattr(main, "_load_config", staticmethod(lambda: {"progress_every": 2}))
+    reports = []
+
+    run_market(monkeypatch, tmp_path, actions, {n: RETURNED for n in range(1, 6)}, progress=reports.append)
+
+    assert [stats["total_actions"] for stats in reports] == [2, 4]
+    assert reports[-1]["ITEM_RETURNED"] >= 3
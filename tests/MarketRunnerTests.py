@@ -0,0 +1,59 @@
+import threading
+import time
+
+from helpers.MarketRunner import run_markets, market_workers, worker_share
+from main import main
+
+
+def test_markets_run_concurrently_up_to_the_worker_limit():
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def process(market):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return market.lower()
+
+    started = time.monotonic()
+    results = run_markets(["DK", "SE", "NO", "FI", "NL", "DE"], process, workers=3)
+
+    assert results == {"DK": "dk", "SE": "se", "NO": "no", "FI": "fi", "NL": "nl", "DE": "de"}
+    assert peak[0] == 3
+    assert time.monotonic() - started < 0.25  # two rounds of 0.05s, not six
+
+
+def test_failing_market_does_not_stop_the_others():
+    published, errors, started = {}, {}, []
+
+    def process(market):
+        if market == "SE":
+            raise ValueError("PATA down")
+        return {"stats": market}
+
+    results = run_markets(
+        ["DK", "SE", "NO"], process, workers=2,
+        on_start=started.append,
+        on_result=published.__setitem__,
+        on_error=lambda market, e: errors.__setitem__(market, str(e)),
+    )
+
+    assert sorted(started) == ["DK", "NO", "SE"]
+    assert published == results == {"DK": {"stats": "DK"}, "NO": {"stats": "NO"}}
+    assert errors == {"SE": "PATA down"}
+
+
+def test_worker_budget_is_split_between_concurrent_markets():
+    assert market_workers({"market_workers": 6}, 11) == 6
+    assert market_workers({"market_workers": 6}, 2) == 2
+    assert worker_share({"worker_budget": 48}, 4) == 12
+
+    settings = main._pipeline_settings({"pata_concurrency": 8, "impact_write_concurrency": 4}, "DK", worker_share=6)
+    assert settings["resolve_workers"] + settings["apply_workers"] == 6
+    assert settings["resolve_workers"] == 4 and settings["apply_workers"] == 2
+
+    unchanged = main._pipeline_settings({"pata_concurrency": 8, "impact_write_concurrency": 4}, "DK", worker_share=48)
+    assert (unchanged["resolve_workers"], unchanged["apply_workers"]) == (8, 4)
@@ -0,0 +1,71 @@
+from unittest.mock import patch, MagicMock
+
+from clients.PATAclient import PATAClient
+from helpers.OrderCache import OrderCache
+
+
+def order(*statuses):
+    return {"data": {"positions": [{"status": status, "amount": 1} for status in statuses]}}
+
+
+def test_ttl_depends_on_position_states():
+    cache = OrderCache(ttl_pending=1, ttl_default=2, ttl_terminal=3)
+
+    assert cache.ttl_for(order("sent", "pending")) == 1
+    assert cache.ttl_for(order("accepted", "sent")) == 2
+    assert cache.ttl_for(order("rejected", "sent", "returned")) == 3
+    assert cache.ttl_for({"data": {}}) == 2
+
+
+def test_lru_evicts_least_recently_used():
+    cache = OrderCache(max_entries=2)
+    cache.put("a", order("sent"))
+    cache.put("b", order("sent"))
+    cache.get("a")
+    cache.put("c", order("sent"))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_expired_entries_are_not_served():
+    cache = OrderCache(ttl_pending=10)
+    with patch("helpers.OrderCache.time.time", return_value=1000):
+        cache.put("a", order("pending"))
+    with patch("helpers.OrderCache.time.time", return_value=1005):
+        assert cache.get("a") is not None
+    with patch("helpers.OrderCache.time.time", return_value=1011):
+        assert cache.get("a") is None
+
+
+def test_disk_tier_survives_a_new_process(tmp_path):
+    path = str(tmp_path / "orders.sqlite")
+    OrderCache(disk_path=path).put("a", order("rejected"))
+
+    cache = OrderCache(disk_path=path)
+
+    assert cache.get("a") == order("rejected")
+    assert "a" in cache.entries  # promoted into memory
+
+
+def test_pata_client_serves_repeat_lookups_from_cache():
+    session = MagicMock()
+    session.get.return_value = MagicMock(status_code=200, json=MagicMock(return_value=order("sent")))
+    client = PATAClient(session=session, cache=OrderCache())
+
+    first = client.retrieve_order("DK", "uuid-1")
+    second = client.retrieve_order("DK", "uuid-1")
+
+    assert first == second == order("sent")
+    session.get.assert_called_once()
+
+
+def test_pata_client_does_not_cache_failures():
+    session = MagicMock()
+    session.get.return_value = MagicMock(status_code=404, text="missing")
+    client = PATAClient(session=session, cache=OrderCache())
+
+    assert client.retrieve_order("DK", "uuid-1") is None
+    assert client.retrieve_order("DK", "uuid-1") is None
+    assert session.get.call_count == 2
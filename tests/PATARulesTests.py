@@ -1,5 +1,6 @@
 import pytest
 from helpers import PATARules
+from benchmarks.OrderFactory import random_orders
 
 
 # -----------------------------
@@ -178,3 +179,83 @@ def test_calculate_handles_missing_data_key():
     response = {}  # no "data" key
     reason, cost = PATARules.PATARules.calculate_action_reason_and_amount(response)
     assert reason == "OTHER" and cost == 0
+
+
+# -----------------------------
+# Tests for evaluate / evaluate_many
+# -----------------------------
+def test_classify_positions_single_pass():
+    positions = [
+        make_position("pending", 1, 1000),
+        make_position("rejected", 1, 2000),
+        make_position("sent", 0, 3000),
+        make_position("sent", 1, 4000),
+        make_position("returned", 1),
+    ]
+    classes, prices = PATARules.PATARules.classify_positions(positions)
+    assert list(classes) == [
+        PATARules.POSITION_PENDING,
+        PATARules.POSITION_RETURNED_OR_REJECTED,
+        PATARules.POSITION_RETURNED_OR_REJECTED,
+        PATARules.POSITION_KEPT,
+        PATARules.POSITION_KEPT,
+    ]
+    assert list(prices) == [1000, 2000, 3000, 4000, 0]
+
+
+def test_evaluate_many_returns_aligned_columns():
+    responses = [
+        {"data": {"voucher": {"code": "V123"}, "positions": []}},
+        {"data": {"positions": [make_position("sent", 0, 1000), make_position("sent", 1, 5000)]}},
+        {"data": {"positions": [make_position("sent", 1, 5000)]}},
+    ]
+    reasons, amounts = PATARules.PATARules.evaluate_many(responses)
+    assert reasons == ["OTHER", "ORDER_UPDATE", None]
+    assert amounts == [0, 50, None]
+
+
+def test_evaluate_many_matches_calculate_on_random_orders(capsys):
+    orders = random_orders(3000, seed=13)
+    expected = [PATARules.PATARules.calculate_action_reason_and_amount(order) for order in orders]
+    capsys.readouterr()
+
+    reasons, amounts = PATARules.PATARules.evaluate_many(orders)
+
+    assert list(zip(reasons, amounts)) == expected
+    assert capsys.readouterr().out == ""
+
+
+# -----------------------------
+# Tests for detect_fraud
+# -----------------------------
+def nested_loop_fraud(response, keywords):
+    for note in (response.get("data") or {}).get("history") or []:
+        if (note.get("type") or "").lower() == "internal note":
+            message = (note.get("message") or "").lower()
+            if any(keyword in message for keyword in keywords):
+                return True
+    return False
+
+
+def test_detect_fraud_matches_keyword_scan_on_random_orders(capsys):
+    for order in random_orders(2000, seed=14):
+        assert PATARules.PATARules.detect_fraud(order) is nested_loop_fraud(
+            order, PATARules.PATARules.DEFAULT_FRAUD_KEYWORDS
+        )
+    assert "not detected" not in capsys.readouterr().out
+
+
+def test_detect_fraud_ignores_other_note_types():
+    response = {"data": {"history": [{"type": "customer note", "message": "Fraud risk"}]}}
+    assert PATARules.PATARules.detect_fraud(response) is False
+
+
+def test_configure_fraud_keywords():
+    response = {"data": {"history": [{"type": "internal note", "message": "Chargeback opened"}]}}
+    try:
+        PATARules.PATARules.configure_fraud_keywords(["Chargeback", ""])
+        assert PATARules.PATARules.detect_fraud(response) is True
+        assert PATARules.PATARules.evaluate(response) == ("OTHER", 0)
+    finally:
+        PATARules.PATARules.configure_fraud_keywords()
+    assert PATARules.PATARules.detect_fraud(response) is False
@@ -0,0 +1,83 @@
+import random
+import threading
+import time
+
+import pytest
+
+from helpers.Pipeline import Pipeline, PipelineCancelled, Stage
+
+
+def test_results_come_back_in_source_order():
+    def jitter(x):
+        time.sleep(random.random() / 500)
+        return x * 2
+
+    pipeline = Pipeline("t", range(200), [Stage("a", jitter, 8, 4), Stage("b", lambda x: x + 1, 3, 4)])
+
+    assert list(pipeline) == [x * 2 + 1 for x in range(200)]
+    metrics = pipeline.metrics()
+    assert metrics["fetch"]["processed"] == 200
+    assert metrics["a"]["processed"] == metrics["b"]["processed"] == 200
+    assert metrics["a"]["max_queue_depth"] <= 4
+
+
+def test_in_flight_items_are_bounded():
+    in_flight = []
+    lock = threading.Lock()
+    current = [0]
+
+    def source():
+        for x in range(100):
+            with lock:
+                current[0] += 1
+                in_flight.append(current[0])
+            yield x
+
+    pipeline = Pipeline("t", source(), [Stage("a", lambda x: x, 4, 2)], max_in_flight=5)
+    for _ in pipeline:
+        time.sleep(0.001)
+        with lock:
+            current[0] -= 1
+
+    assert max(in_flight) <= 6
+
+
+def test_source_error_surfaces_after_earlier_items():
+    def source():
+        yield 1
+        yield 2
+        raise PermissionError("unauthorized")
+
+    seen = []
+    with pytest.raises(PermissionError):
+        for item in Pipeline("t", source(), [Stage("a", lambda x: x, 2)]):
+            seen.append(item)
+    assert seen == [1, 2]
+
+
+def test_stage_error_stops_the_pipeline():
+    def boom(x):
+        if x == 3:
+            raise RuntimeError("stage failed")
+        return x
+
+    with pytest.raises(RuntimeError):
+        list(Pipeline("t", range(1000), [Stage("a", boom, 2, 2)]))
+
+
+def test_cancel_event_stops_the_pipeline():
+    cancel = threading.Event()
+    processed = []
+
+    def work(x):
+        processed.append(x)
+        return x
+
+    seen = []
+    with pytest.raises(PipelineCancelled):
+        for item in Pipeline("t", range(10000), [Stage("a", work, 2, 2)], max_in_flight=4, cancel=cancel):
+            seen.append(item)
+            if item == 10:
+                cancel.set()
+    assert seen[-1] == 10
+    assert len(processed) < 100
@@ -0,0 +1,31 @@
+import pytest
+
+from helpers.PlanFile import PlanWriter, read_plan, plan_summary
+
+
+def test_plan_round_trip_with_totals(tmp_path):
+    path = str(tmp_path / "plan.jsonl")
+    plan = PlanWriter(path, {"markets": ["DK", "SE"]})
+    plan.add("DK", 30761, "A1", 1, "ORDER_UPDATE", 31.2)
+    plan.add("DK", 30761, "A2", 2, "ORDER_UPDATE", 8.0)
+    plan.add("SE", 30762, "A3", 3, "ITEM_RETURNED", 0.0)
+    plan.close()
+
+    assert [row["action_id"] for row in read_plan(path)] == ["A1", "A2", "A3"]
+    assert [row["action_id"] for row in read_plan(path, "SE")] == ["A3"]
+    summary = plan_summary(path)
+    assert summary["params"] == {"markets": ["DK", "SE"]}
+    assert summary["totals"] == {
+        "DK": {"ORDER_UPDATE": {"count": 2, "amount": 39.2}},
+        "SE": {"ITEM_RETURNED": {"count": 1, "amount": 0.0}},
+    }
+
+
+def test_unfinished_plan_is_rejected(tmp_path):
+    path = str(tmp_path / "plan.jsonl")
+    plan = PlanWriter(path)
+    plan.add("DK", 30761, "A1", 1, "ITEM_RETURNED", 0.0)
+    plan.file.flush()
+
+    with pytest.raises(ValueError):
+        plan_summary(path)
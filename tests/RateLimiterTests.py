@@ -0,0 +1,81 @@
+import asyncio
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from clients.ImpactClient import ImpactClient
+from helpers.RateLimiter import TokenBucket, RateLimiter, parse_retry_after, READ, WRITE
+
+
+def test_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=10, capacity=2)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.02)
+
+
+def test_throttle_blocks_and_halves_rate_then_recovers():
+    bucket = TokenBucket(rate=10, capacity=10)
+
+    bucket.throttled(retry_after=3)
+
+    assert bucket.rate == 5
+    assert bucket.reserve() == pytest.approx(3, abs=0.05)
+    for _ in range(20):
+        bucket.succeeded()
+    assert bucket.rate == 10
+
+
+def test_buckets_are_separate_per_account_and_kind():
+    limiter = RateLimiter({"impact_read_rate": 4, "impact_write_rate": 1})
+
+    assert limiter.bucket("sid_dk", READ) is not limiter.bucket("sid_uk", READ)
+    assert limiter.bucket("sid_dk", READ) is not limiter.bucket("sid_dk", WRITE)
+    assert limiter.bucket("sid_dk", WRITE).rate == 1
+
+
+@pytest.mark.parametrize("value,expected", [("7", 7), ("0.5", 0.5), (None, 5), ("garbage", 5)])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value, default=5) == expected
+
+
+def make_response(status=200, json_data=None, headers=None):
+    mock_resp = MagicMock()
+    mock_resp.status_code = status
+    mock_resp.json.return_value = json_data or {}
+    mock_resp.headers = headers or {}
+    mock_resp.text = "error"
+    return mock_resp
+
+
+@patch("helpers.RateLimiter.time.sleep")
+@patch("requests.Session.put")
+def test_update_action_waits_out_429_instead_of_failing(mock_put, mock_sleep):
+    limiter = RateLimiter()
+    client = ImpactClient({"account_SID_DK": "sid", "token_DK": "tok"}, "DK", rate_limiter=limiter)
+    mock_put.side_effect = [
+        make_response(status=429, headers={"Retry-After": "2"}),
+        make_response(json_data={"Status": "OK"}),
+    ]
+
+    result = client.update_action("A1", 10, "ORDER_UPDATE")
+
+    assert result == {"Status": "OK"}
+    assert mock_put.call_count == 2
+    assert mock_sleep.call_args[0][0] == pytest.approx(2, abs=0.05)
+    assert limiter.bucket("sid", WRITE).rate < limiter.bucket("sid", READ).rate
+
+
+def test_acquire_async_waits_for_token():
+    limiter = RateLimiter({"impact_read_rate": 1})
+    limiter.bucket("sid", READ).tokens = 0
+
+    with patch("helpers.RateLimiter.asyncio.sleep") as mock_sleep:
+        async def sleep(delay):
+            return None
+        mock_sleep.side_effect = sleep
+        asyncio.run(limiter.acquire_async("sid", READ))
+
+    assert mock_sleep.call_args[0][0] == pytest.approx(1, abs=0.05)
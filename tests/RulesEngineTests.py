@@ -0,0 +1,96 @@
+import pytest
+
+from helpers.PATARules import PATARules
+from helpers.RulesEngine import RulesEngine, get_rules_engine, load_rules_definition, reset_rules_engine
+from benchmarks.OrderFactory import random_orders
+from tests.PATARulesTests import make_position
+
+
+@pytest.fixture
+def engine():
+    return RulesEngine(load_rules_definition())
+
+
+# Same scenarios as tests/PATARulesTests.py
+CASES = [
+    {"data": {"voucher": {"code": "V123"}, "positions": []}},
+    {"data": {"positions": [make_position("pending", 1)]}},
+    {"data": {"positions": [make_position("pending", 1), make_position("sent", 1, 50000)]}},
+    {"data": {"positions": [make_position("pending", 1), make_position("sent", 0, 50000)]}},
+    {"data": {"positions": [make_position("pending", 1), make_position("rejected", 1, 50000)]}},
+    {"data": {"positions": [make_position("rejected", 1)]}},
+    {"data": {"positions": [make_position("accepted", 0)]}},
+    {"data": {"positions": [make_position("sent", 0)]}},
+    {"data": {"positions": [make_position("rejected", 1, 15100), make_position("accepted", 0, 36000),
+                            make_position("sent", 0, 20000)]}},
+    {"data": {"positions": [make_position("accepted", 0, 53000), make_position("sent", 1, 3900)]}},
+    {"data": {"positions": [make_position("accepted", 1), make_position("sent", 1)]}},
+    {"data": {"positions": []}},
+    {},
+    {"data": {"history": [{"type": "internal note", "message": "Do not refund"}],
+              "positions": [make_position("sent", 1, 1000)]}},
+]
+
+
+@pytest.mark.parametrize("response", CASES)
+def test_default_rule_set_matches_calculate(engine, response, capsys):
+    assert engine.evaluate("DK", response) == PATARules.calculate_action_reason_and_amount(response)
+
+
+def test_default_rule_set_matches_calculate_on_random_orders(engine, capsys):
+    for order in random_orders(3000, seed=15):
+        assert engine.evaluate("SE", order) == PATARules.calculate_action_reason_and_amount(order)
+
+
+def test_market_rule_set_extends_default(engine):
+    definition = load_rules_definition()
+    default_rules = definition["rule_sets"]["default"]["rules"]
+    # NO: pending positions are kept (never refunded) instead of counted as returned
+    definition["rule_sets"]["no_pending_refund"] = {
+        "extends": "default",
+        "rules": [r for r in default_rules if r["name"] not in ("fully_returned", "partial_return")] + [
+            {"name": "fully_returned", "when": {"all_positions": ["returned"]}, "reason": "ITEM_RETURNED", "amount": "zero"},
+            {"name": "partial_return", "when": {"any_position": ["returned"]}, "reason": "ORDER_UPDATE",
+             "amount": {"price_total_excluding": ["returned"]}},
+        ],
+    }
+    definition["markets"] = {"no": "no_pending_refund"}
+    custom = RulesEngine(definition)
+
+    response = {"data": {"positions": [make_position("pending", 1, 2000), make_position("sent", 0, 5000)]}}
+    assert custom.evaluate("DK", response) == ("ITEM_RETURNED", 0)
+    assert custom.evaluate("NO", response) == ("ORDER_UPDATE", 20)
+    assert custom.for_market("NO").version != custom.for_market("DK").version
+
+
+@pytest.mark.parametrize("bad_rule", [
+    {"when": {"unknown": True}, "reason": "OTHER", "amount": "zero"},
+    {"when": {"any_position": ["missing"]}, "reason": "OTHER", "amount": "zero"},
+    {"when": {}, "reason": "OTHER", "amount": "half"},
+])
+def test_invalid_definitions_fail_at_compile_time(bad_rule):
+    definition = load_rules_definition()
+    definition["rule_sets"]["default"]["rules"] = [bad_rule]
+    with pytest.raises(ValueError):
+        RulesEngine(definition)
+
+
+def test_get_rules_engine_prefers_inline_config():
+    reset_rules_engine()
+    try:
+        inline = {"rule_sets": {"default": {"rules": [{"when": {}, "reason": "OTHER", "amount": "zero"}]}}}
+        assert get_rules_engine({"pata_rules": inline}).evaluate("DK", {}) == ("OTHER", 0)
+        assert get_rules_engine() is get_rules_engine({"pata_rules": {}})
+    finally:
+        reset_rules_engine()
+
+
+def test_get_rules_engine_sets_fraud_keywords_once():
+    reset_rules_engine()
+    try:
+        get_rules_engine({"fraud_keywords": ["chargeback"]})
+        get_rules_engine({"fraud_keywords": ["other phrase"]})
+        assert PATARules.FRAUD_KEYWORDS == ["chargeback"]
+    finally:
+        reset_rules_engine()
+        PATARules.configure_fraud_keywords()
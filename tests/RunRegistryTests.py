@@ -0,0 +1,45 @@
+import threading
+
+from helpers.RunRegistry import RunRegistry, STATUS_FIELDS
+
+
+def test_runs_have_separate_status():
+    runs = RunRegistry()
+    dk = runs.start("run-1", ["DK"])
+    se = runs.start("run-2", ["SE"], mode="plan")
+
+    dk.update(message="Processing market(s): DK...")
+    with se.lock:
+        se.status["market_stats"]["SE"] = {"total_actions": 4}
+
+    assert runs.get("run-1").snapshot()["message"] == "Processing market(s): DK..."
+    assert runs.get("run-1").snapshot()["market_stats"] == {}
+    assert runs.get("run-2").snapshot()["market_stats"] == {"SE": {"total_actions": 4}}
+    assert set(runs.get("run-2").snapshot()) == set(STATUS_FIELDS)
+    assert [run.run_id for run in runs.active()] == ["run-1", "run-2"]
+
+
+def test_oldest_finished_runs_are_evicted():
+    runs = RunRegistry(max_finished=2)
+    for n in range(4):
+        runs.start(f"run-{n}", [f"M{n}"])
+    runs.start("running", ["DK"])
+    for n in range(4):
+        runs.finish(f"run-{n}")
+
+    assert runs.get("run-0") is None and runs.get("run-1") is None
+    assert runs.get("run-2") is not None and runs.get("run-3") is not None
+    assert [run.run_id for run in runs.active()] == ["running"]
+
+
+def test_cancelled_run_publishes_no_more_events():
+    events = []
+    cancel = threading.Event()
+    runs = RunRegistry(on_event=lambda run_id, event, data: events.append(event))
+    run = runs.start("run-1", ["DK"], cancel=cancel)
+    run.emit("progress", market="DK")
+    cancel.set()
+    run.emit("market_finished", market="DK")
+    runs.finish("run-1")
+
+    assert events == ["run_started", "progress"]
@@ -0,0 +1,49 @@
+import json
+import threading
+
+from helpers.WatermarkStore import WatermarkStore, to_utc_iso
+
+
+def test_watermark_round_trips_and_never_moves_back(tmp_path):
+    store = WatermarkStore(str(tmp_path / "watermarks.sqlite"))
+
+    assert store.get(30761) is None
+    store.advance(30761, "2025-09-10T10:00:00-04:00")
+    assert store.advance(30761, "2025-09-01T00:00:00Z") == "2025-09-10T14:00:00+00:00"
+
+    reopened = WatermarkStore(str(tmp_path / "watermarks.sqlite"))
+    assert reopened.get(30761) == "2025-09-10T14:00:00+00:00"
+    assert reopened.get(30894) is None
+
+
+def test_concurrent_stores_advance_without_losing_updates(tmp_path):
+    path = str(tmp_path / "watermarks.sqlite")
+    stores = [WatermarkStore(path) for _ in range(2)]
+    errors = []
+
+    def advance(store, campaign_id):
+        try:
+            for second in range(300):
+                store.advance(campaign_id, f"2025-09-01T00:{second // 60:02d}:{second % 60:02d}Z")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=advance, args=(store, cid)) for store, cid in zip(stores, (30761, 30894))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert stores[0].get(30761) == stores[1].get(30894) == "2025-09-01T00:04:59+00:00"
+
+
+def test_watermarks_json_is_imported(tmp_path):
+    (tmp_path / "watermarks.json").write_text(json.dumps({"30761": {"action_date": "2025-09-10T14:00:00+00:00"}}))
+
+    assert WatermarkStore(str(tmp_path / "watermarks.sqlite")).get(30761) == "2025-09-10T14:00:00+00:00"
+
+
+def test_to_utc_iso_normalizes_offsets():
+    assert to_utc_iso("2025-09-01T00:30:00+02:00") == "2025-08-31T22:30:00+00:00"
+    assert to_utc_iso("2025-09-01T00:30:00Z") == "2025-09-01T00:30:00+00:00"
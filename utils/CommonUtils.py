@@ -105,7 +105,7 @@ class common_utils:
         return float(net_cost.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
 
     @staticmethod
-    def create_market_csv(market, actions_by_state,allowed_states,target_state):
+    def create_market_csv(market, actions_by_state,allowed_states,target_state, output_dir="/tmp"):
         rows = []
 
         for state, items in actions_by_state.items():
@@ -141,8 +141,8 @@ class common_utils:
         writer.writerows(rows)
 
         filename = f"{market}_{target_state}_results.csv"
-        tmp_dir = "/tmp"
-        file_path = os.path.join(tmp_dir, filename)
+        os.makedirs(output_dir, exist_ok=True)
+        file_path = os.path.join(output_dir, filename)
         # output_dir = os.path.join(os.getcwd(), "output")
         # os.makedirs(output_dir, exist_ok=True)
         # file_path = os.path.join(output_dir, filename)